@@ -0,0 +1,108 @@
+"""
+Deterministic synthetic journals for benchmarking.
+
+Writes `n` entries in the journal.db schema (FTS index, rollups and all)
+to a SQLite file. The same (n, seed) always yields the same file
+contents, so timings from different runs are comparable.
+
+    python benchmarks/generate.py 100k /tmp/journal-100k.db
+    python benchmarks/generate.py 1m /tmp/journal-1m.db --seed 7
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from journal.db import connect, TABLE, ROLLUP_TABLE, ROLLUP_SQL  # noqa: E402
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+ANALYSED_FRACTION = 0.8
+CHUNK = 50_000
+
+WORDS = """
+today work meeting coffee morning evening friend family dinner lunch walk run
+gym rain sun weather train bus city park garden book read write code project
+deadline manager team call email plan idea trip weekend holiday movie music
+song kids dog cat cook bread tea sleep tired happy sad anxious calm excited
+grateful stressed proud lonely bored busy quiet long short great good bad
+better worse new old first last little big early late home office beach hill
+""".split()
+MOOD_WORDS = {1: "awful", 2: "terrible", 3: "sad", 4: "tired", 5: "fine",
+              6: "okay", 7: "good", 8: "happy", 9: "great", 10: "amazing"}
+START = datetime(2015, 1, 1, 7, 0, tzinfo=timezone(timedelta(hours=1)))
+
+
+def parse_size(value: str) -> int:
+    return SIZES.get(value.lower()) or int(value)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 16))
+    return " ".join(words).capitalize() + "."
+
+
+def entries(n: int, seed: int = 0):
+    """Yield (timestamp, text, summary, mood) tuples, oldest first."""
+    rng = random.Random(seed)
+    moment = START
+    for _ in range(n):
+        # ~30 minutes apart on average (100k entries span ~6 years), never
+        # two in the same microsecond.
+        moment += timedelta(seconds=rng.randint(60, 3_600), microseconds=rng.randint(1, 999_999))
+        mood = max(1, min(10, round(rng.gauss(6, 2))))
+        text = " ".join(_sentence(rng) for _ in range(max(1, int(rng.lognormvariate(1.0, 0.6)))))
+        text += f" Feeling {MOOD_WORDS[mood]}."
+        if rng.random() < ANALYSED_FRACTION:
+            summary = f"A {MOOD_WORDS[mood]} day: {text[:60]}"
+        else:
+            summary, mood = None, None
+        yield moment.isoformat(), text, summary, mood
+
+
+def generate(path: str | Path, n: int, seed: int = 0, progress=None) -> Path:
+    """Create (or overwrite) a journal with `n` synthetic entries at `path`."""
+    path = Path(path)
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    db = connect(path)
+    rows, done = [], 0
+    with db:
+        for row in entries(n, seed):
+            rows.append(row)
+            if len(rows) >= CHUNK:
+                db.executemany(f"INSERT INTO {TABLE} (timestamp, text, summary, mood) "
+                               "VALUES (?, ?, ?, ?)", rows)
+                done += len(rows)
+                rows.clear()
+                if progress:
+                    progress(done, n)
+        db.executemany(f"INSERT INTO {TABLE} (timestamp, text, summary, mood) "
+                       "VALUES (?, ?, ?, ?)", rows)
+        db.execute(f"DELETE FROM {ROLLUP_TABLE}")
+        db.execute(ROLLUP_SQL + " GROUP BY substr(timestamp, 1, 10)")
+    db.execute("ANALYZE")
+    db.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic journal database")
+    parser.add_argument("size", help="Entry count: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("path", help="Output .db file (overwritten)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    n = parse_size(args.size)
+    started = time.perf_counter()
+    generate(args.path, n, args.seed,
+             progress=lambda done, total: print(f"{done}/{total}", end="\r", flush=True))
+    print(f"{n} entries written to {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+CLI startup benchmark.
+
+Runs `python -X importtime main.py write …` against a throwaway HOME,
+reports wall-clock time and the slowest imports, and exits non-zero if
+startup exceeds the budget.
+
+    python benchmarks/importtime.py              # default 100 ms budget
+    python benchmarks/importtime.py --budget 80 --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+COMMANDS = {
+    "write": ["write", "benchmark entry"],
+    "list": ["list"],
+    "help": ["--help"],
+}
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, str]]:
+    """(cumulative µs, module) for top-level imports, slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("   "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)
+
+
+def run(args: list[str], home: str, importtime: bool = False) -> tuple[float, str]:
+    env = {**os.environ, "HOME": home}
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + \
+          [str(ROOT / "main.py")] + args
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+    return (time.perf_counter() - started) * 1000, proc.stderr
+
+
+def _bare_interpreter_ms() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup / import-time benchmark")
+    parser.add_argument("--command", choices=sorted(COMMANDS), default="write")
+    parser.add_argument("--budget", type=float, default=100.0,
+                        help="Max median wall-clock ms (default 100)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to show")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        run(COMMANDS[args.command], home)  # warm-up: creates the DB, fills caches
+        timings = [run(COMMANDS[args.command], home)[0] for _ in range(args.runs)]
+        _, stderr = run(COMMANDS[args.command], home, importtime=True)
+
+    baseline = statistics.median(_bare_interpreter_ms() for _ in range(args.runs))
+    median = statistics.median(timings)
+    print(f"journal {args.command}: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(timings):.1f}, max {max(timings):.1f}; budget {args.budget:.0f} ms)")
+    print(f"bare interpreter: {baseline:.1f} ms -> journal overhead {median - baseline:.1f} ms")
+    print("Slowest top-level imports (cumulative):")
+    for micros, name in parse_importtime(stderr)[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    if median > args.budget:
+        print("FAIL: over budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Hot-path benchmark suite.
+
+Generates (and caches) a deterministic synthetic journal of the chosen
+size, points a throwaway HOME at a copy of it and times the storage,
+import/export (Markdown and Parquet/Arrow snapshots), ingestion, stats,
+CLI, dashboard-data and analysis paths. AI calls
+go to an in-process stub provider, so no network is involved.
+
+    python benchmarks/run.py --size 100k --json before.json
+    python benchmarks/run.py --size 100k --json after.json --compare before.json
+    python benchmarks/run.py --compare before.json after.json   # no run
+    python benchmarks/run.py --size 1k --only export
+
+Results are medians over --repeat runs. --compare flags a benchmark as
+a regression when its median is more than --threshold slower (and by
+more than --min-delta-ms, to ignore noise on tiny timings); the exit
+status is 1 if anything regressed.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from generate import entries as synthetic_entries, generate, parse_size  # noqa: E402
+from journal import ai  # noqa: E402
+
+GENERATOR_VERSION = 1   # bump when generate.py output changes
+CACHE_DIR = Path.home() / ".cache" / "journal-benchmarks"
+ANALYSE_SAMPLE = 2_000  # entries pushed through the stub analyser
+INGEST_SAMPLE = 2_000   # entries written by the ingestion benchmarks
+
+BENCHES = {}
+
+
+def bench(name: str, max_entries: int | None = None):
+    """
+    Register a benchmark. The function receives the suite context and
+    returns run() (timed; returns rows processed) or (setup, run) where
+    setup() runs untimed before every repetition.
+    """
+    def register(fn):
+        BENCHES[name] = (fn, max_entries)
+        return fn
+    return register
+
+
+# ---------- Stub analyser ---------------------------------------------------
+
+class StubProvider(ai.Provider):
+    """Canned analysis, optionally with a fake per-call latency."""
+    name = "stub"
+    cacheable = False
+    latency = 0.0
+
+    def version(self) -> str:
+        return "stub"
+
+    def analyse(self, text: str):
+        if self.latency:
+            time.sleep(self.latency)
+        return text[:80], 1 + len(text) % 10, True
+
+
+ai.PROVIDERS["stub"] = (__name__, "StubProvider")
+
+
+def _switch_db(path: Path) -> None:
+    """Point journal.db and the cached connections at another file."""
+    from journal import shards
+    shards.switch(path)
+
+
+# ---------- Benchmarks ------------------------------------------------------
+
+@bench("storage.list_entries")
+def _list_entries(ctx):
+    from journal import storage
+    return lambda: len(storage.list_entries())
+
+
+@bench("utils.sparkline")
+def _sparkline(ctx):
+    import random
+    from journal import utils
+
+    rng = random.Random(0)
+    values = [rng.uniform(1, 10) for _ in range(ctx["entries"])]
+    return lambda: (utils.sparkline(values), len(values))[1]
+
+
+@bench("export.export_markdown")
+def _export_markdown(ctx):
+    from journal import export
+    out = ctx["work"] / "export.md"
+    return lambda: (export.export_markdown(out), ctx["entries"])[1]
+
+
+@bench("export.export_pdf", max_entries=10_000)
+def _export_pdf(ctx):
+    from journal import export
+    md = export.export_markdown(ctx["work"] / "for-pdf.md")
+    return lambda: (export.export_pdf(ctx["work"] / "export.pdf", md), ctx["entries"])[1]
+
+
+@bench("import_md.import_markdown")
+def _import_markdown(ctx):
+    from journal import export, import_md
+    md = export.export_markdown(ctx["work"] / "for-import.md")
+
+    def run():
+        try:
+            return import_md.import_markdown(md).added
+        finally:
+            _switch_db(ctx["db"])
+
+    return _fresh_target(ctx, "import-target.db"), run
+
+
+def _fresh_target(ctx, name: str):
+    """setup() that points storage at an empty journal before each run."""
+    target = ctx["work"] / name
+
+    def setup():
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            Path(f"{target}{suffix}").unlink(missing_ok=True)
+        _switch_db(target)
+    return setup
+
+
+def _ingest(ctx, name: str, write):
+    texts = [text for _, text, _, _ in synthetic_entries(INGEST_SAMPLE, ctx["seed"])]
+
+    def run():
+        try:
+            write(texts)
+            return len(texts)
+        finally:
+            _switch_db(ctx["db"])
+    return _fresh_target(ctx, name), run
+
+
+@bench("snapshot.export (parquet)")
+def _snapshot_parquet(ctx):
+    from journal import snapshot
+    out = ctx["work"] / "export.parquet"
+    return lambda: (snapshot.export_snapshot(out), ctx["entries"])[1]
+
+
+@bench("snapshot.export (arrow)")
+def _snapshot_arrow(ctx):
+    from journal import snapshot
+    out = ctx["work"] / "export.arrow"
+    return lambda: (snapshot.export_snapshot(out), ctx["entries"])[1]
+
+
+@bench("snapshot.import_snapshot")
+def _import_snapshot(ctx):
+    from journal import snapshot
+    path = snapshot.export_snapshot(ctx["work"] / "for-import.parquet")
+
+    def run():
+        try:
+            return snapshot.import_snapshot(path).added
+        finally:
+            _switch_db(ctx["db"])
+
+    return _fresh_target(ctx, "snapshot-target.db"), run
+
+
+@bench("dashboard.SnapshotFrame (arrow, mmap)")
+def _snapshot_frame(ctx):
+    from journal import frames, snapshot
+    path = snapshot.export_snapshot(ctx["work"] / "for-frame.arrow")
+
+    def run():
+        frame = frames.SnapshotFrame(path)
+        frame.refresh()
+        return len(frame.df)
+    return run
+
+
+SHARDS = 4  # journals the fan-out benchmarks spread over
+
+
+def _shards(ctx) -> list[str]:
+    """SHARDS copies of the journal, as named journals in a scratch dir."""
+    from journal import db
+
+    db.JOURNALS_DIR = ctx["work"] / "journals"
+    db.JOURNALS_DIR.mkdir(exist_ok=True)
+    names = [f"shard{i}" for i in range(SHARDS)]
+    for name in names:
+        if not db.journal_path(name).exists():
+            shutil.copyfile(ctx["db"], db.journal_path(name))
+    return names
+
+
+@bench("shards.stats (fan-out)")
+def _shard_stats(ctx):
+    from journal import shards
+    names = _shards(ctx)
+    return lambda: (shards.stats("month", names=names), ctx["entries"] * len(names))[1]
+
+
+@bench("shards.search (fan-out)")
+def _shard_search(ctx):
+    from journal import shards
+    names = _shards(ctx)
+    return lambda: (shards.search("walk cat", names=names), ctx["entries"] * len(names))[1]
+
+
+@bench("storage.add_entry (single)")
+def _add_single(ctx):
+    from journal import storage
+    return _ingest(ctx, "ingest-single.db", lambda texts: [storage.add_entry(t) for t in texts])
+
+
+@bench("storage.add_entries (batched)")
+def _add_batched(ctx):
+    from journal import storage
+    return _ingest(ctx, "ingest-batched.db", storage.add_entries)
+
+
+@bench("storage.EntryWriter")
+def _add_buffered(ctx):
+    from journal import storage
+
+    def write(texts):
+        with storage.EntryWriter() as writer:
+            for text in texts:
+                writer.add(text)
+    return _ingest(ctx, "ingest-writer.db", write)
+
+
+@bench("dashboard.fetch_df (cold)")
+def _fetch_cold(ctx):
+    from journal import frames
+
+    def run():
+        frame = frames.EntryFrame()
+        frame.refresh()
+        return len(frame.df)
+    return run
+
+
+@bench("dashboard.fetch_df (warm)")
+def _fetch_warm(ctx):
+    from journal import frames
+    frame = frames.EntryFrame()
+    frame.refresh()
+
+    def run():
+        frame.refresh()
+        return len(frame.df)
+    return run
+
+
+SYNC_EDITS = 100  # entries edited between two syncs in the change-feed benchmark
+
+
+@bench("storage.changes_since (100 edits)")
+def _changes_since(ctx):
+    import random
+    from journal import storage
+
+    ids = random.Random(ctx["seed"]).sample(range(1, ctx["entries"] + 1),
+                                            min(SYNC_EDITS, ctx["entries"]))
+    cursor = [0]
+
+    def setup():
+        cursor[0] = storage.last_change()
+        for entry_id in ids:
+            storage.update_text(entry_id, storage.get_entry(entry_id)["text"] + ".")
+
+    return setup, lambda: len(storage.changes_since(cursor[0])["changes"])
+
+
+@bench("batch.analyse_entries (stub)")
+def _analyse(ctx):
+    from journal import batch, storage
+    StubProvider.latency = ctx["stub_latency"]
+    ai.set_provider("stub")
+    sample = list(storage.query_entries(columns=["id", "text"], limit=ANALYSE_SAMPLE))
+    return lambda: batch.analyse_entries(sample, concurrency=4).analysed
+
+
+def _cli(*args):
+    def run():
+        subprocess.run([sys.executable, str(ROOT / "main.py"), *args], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return 1
+    return run
+
+
+@bench("cli.stats")
+def _cli_stats(ctx):
+    return _cli("stats", "--by", "month")
+
+
+@bench("cli.list", max_entries=10_000)  # prints every entry
+def _cli_list(ctx):
+    return _cli("list")
+
+
+# ---------- Runner ----------------------------------------------------------
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                              capture_output=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def journal_db(entries: int, seed: int) -> Path:
+    """Cached generated journal for (entries, seed)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = CACHE_DIR / f"journal-{entries}-s{seed}-v{GENERATOR_VERSION}.db"
+    if not path.exists():
+        print(f"Generating {entries} entries (cached in {path})…")
+        partial = path.with_suffix(".partial")
+        generate(partial, entries, seed)
+        partial.rename(path)
+    return path
+
+
+def run_suite(entries: int, repeat: int, only: list[str], seed: int,
+              stub_latency: float) -> dict:
+    source = journal_db(entries, seed)
+    results = {}
+    real_home = os.environ.get("HOME")
+    with tempfile.TemporaryDirectory() as home:
+        home = Path(home)
+        db_path = home / ".ai_chat_journal.db"
+        shutil.copyfile(source, db_path)
+        os.environ["HOME"] = str(home)  # for the CLI subprocesses
+        _switch_db(db_path)
+        ctx = {"entries": entries, "db": db_path, "work": home, "seed": seed,
+               "stub_latency": stub_latency}
+
+        for name, (factory, max_entries) in BENCHES.items():
+            if only and not any(fnmatch.fnmatch(name, f"*{pat}*") for pat in only):
+                continue
+            if max_entries is not None and entries > max_entries:
+                results[name] = {"skipped": f"only run up to {max_entries} entries"}
+                print(f"{name:34} skipped (> {max_entries} entries)")
+                continue
+            try:
+                prepared = factory(ctx)
+                setup, run = prepared if isinstance(prepared, tuple) else (None, prepared)
+                samples, rows = [], 0
+                for _ in range(repeat):
+                    if setup:
+                        setup()
+                    started = time.perf_counter()
+                    rows = run()
+                    samples.append(time.perf_counter() - started)
+            except Exception as exc:  # missing optional deps (WeasyPrint, …)
+                results[name] = {"skipped": f"{type(exc).__name__}: {exc}"[:200]}
+                print(f"{name:34} skipped ({results[name]['skipped']})")
+                continue
+            median = statistics.median(samples)
+            results[name] = {
+                "median_s": median, "min_s": min(samples), "max_s": max(samples),
+                "samples": samples, "rows": rows,
+                "rows_per_s": rows / median if median else None,
+            }
+            rate = f"{rows / median:12,.0f} rows/s" if median and rows > 1 else ""
+            print(f"{name:34} {median * 1000:10.1f} ms  {rate}")
+        if real_home is not None:
+            os.environ["HOME"] = real_home
+        _switch_db(Path.home() / ".ai_chat_journal.db")
+    return results
+
+
+def compare(base: dict, new: dict, threshold: float, min_delta_ms: float) -> int:
+    """Print a comparison table; return the number of regressions."""
+    regressions = 0
+    print(f"\n{'benchmark':34} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        a, b = base["results"].get(name, {}), new["results"].get(name, {})
+        if "median_s" not in a or "median_s" not in b:
+            print(f"{name:34} {'—':>10} {'—':>10}   (missing or skipped)")
+            continue
+        old_ms, new_ms = a["median_s"] * 1000, b["median_s"] * 1000
+        change = new_ms / old_ms - 1 if old_ms else 0.0
+        flag = ""
+        if change > threshold and new_ms - old_ms > min_delta_ms:
+            flag, regressions = "  REGRESSION", regressions + 1
+        elif change < -threshold and old_ms - new_ms > min_delta_ms:
+            flag = "  faster"
+        print(f"{name:34} {old_ms:10.1f} {new_ms:10.1f} {change:+8.1%}{flag}")
+    if base.get("meta", {}).get("entries") != new.get("meta", {}).get("entries"):
+        print("note: runs used different journal sizes")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal hot-path benchmarks")
+    parser.add_argument("--size", default="1k", help="1k, 10k, 100k, 1m or a number (default 1k)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", default=[], help="Substrings of benchmark names")
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="Seconds the stub analyser sleeps per entry (default 0)")
+    parser.add_argument("--json", metavar="FILE", help="Write results to FILE")
+    parser.add_argument("--compare", nargs="+", metavar="FILE",
+                        help="BASE: compare this run against BASE; BASE NEW: compare two files")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default 0.10)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        base, new = (json.loads(Path(p).read_text()) for p in args.compare)
+        sys.exit(1 if compare(base, new, args.threshold, args.min_delta_ms) else 0)
+
+    entries = parse_size(args.size)
+    report = {
+        "meta": {
+            "entries": entries, "seed": args.seed, "repeat": args.repeat,
+            "commit": _git_commit(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "created": datetime.now().astimezone().isoformat(timespec="seconds"),
+        },
+        "results": run_suite(entries, args.repeat, args.only, args.seed, args.stub_latency),
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.json}")
+    if args.compare:
+        base = json.loads(Path(args.compare[0]).read_text())
+        sys.exit(1 if compare(base, report, args.threshold, args.min_delta_ms) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,14 @@
 Streamlit dashboard for AI Chat Journal
 Run with:
     streamlit run dashboard.py
+
+To browse a Parquet/Arrow snapshot (`journal export --format arrow`)
+instead of the live database, memory-mapped:
+    JOURNAL_SNAPSHOT=backup.arrow streamlit run dashboard.py
 """
 from __future__ import annotations
 
+import os
 from datetime import datetime
 from pathlib import Path
 
@@ -12,8 +17,7 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 
-from journal.db import get_db, TABLE
-from journal import storage, ai, export
+from journal import storage, export, jobs, embed, frames
 
 # ---------- Custom CSS & fonts ----------
 st.markdown(
@@ -43,39 +47,55 @@ st.markdown(
 
 # ---------- Helpers ---------------------------------------------------------
 
-@st.cache_resource(show_spinner=False)
-def _get_table():
-    """Return sqlite-utils Table handle (cached)."""
-    db = get_db()
-    return db[TABLE]
+PAGE_SIZE = 20
+SNAPSHOT = os.environ.get("JOURNAL_SNAPSHOT")
 
 
-def fetch_df() -> pd.DataFrame:
-    """Load all entries into a DataFrame sorted by timestamp."""
-    rows = list(_get_table().rows)
-    if not rows:
-        return pd.DataFrame(
-            columns=["id", "timestamp", "text", "summary", "mood"]
-        )
-    df = pd.DataFrame(rows)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    return df.sort_values("timestamp")
-
-
-def analyze_missing(df: pd.DataFrame):
-    """Run AI on rows with no summary/mood."""
-    missing = df[df["summary"].isna()]
-    if missing.empty:
-        st.toast("Nothing to analyze ✨", icon="✅")
-        return
-    progress = st.progress(0, text="Analyzing entries…")
-    for idx, row in enumerate(missing.itertuples(index=False), start=1):
-        summary, mood = ai.analyse(row.text)
-        storage.update_entry(row.id, summary, mood)
-        progress.progress(idx / len(missing))
-    progress.empty()
-    st.toast("Analysis complete!", icon="🤖")
-    st.rerun()
+@st.cache_resource(max_entries=8)
+def entry_frame(start=None, end=None, unanalyzed: bool = False):
+    """One shared EntryFrame per filter combination (filtering happens in SQL)."""
+    if SNAPSHOT:
+        return frames.SnapshotFrame(SNAPSHOT, start, end, unanalyzed)
+    return frames.EntryFrame(start, end, unanalyzed)
+
+
+def fetch_df(start=None, end=None, unanalyzed: bool = False) -> pd.DataFrame:
+    """Matching entries, newest first; reruns only read rows changed since the last one."""
+    frame = entry_frame(start, end, unanalyzed)
+    frame.refresh()
+    return frame.df
+
+
+def analyze_missing():
+    """Queue every row with no summary/mood for the background worker."""
+    queued = jobs.enqueue_unanalyzed()
+    if queued:
+        st.toast(f"Queued {queued} entries for analysis", icon="🤖")
+    else:
+        st.toast("Nothing new to queue ✨", icon="✅")
+
+
+@st.fragment(run_every=5)
+def job_status():
+    """Queue counters, polled every few seconds without rerunning the page."""
+    counts = jobs.status_counts()
+    st.caption(f"Analysis queue — {counts['queued']} queued · {counts['running']} running · "
+               f"{counts['dead']} failed")
+    if counts["queued"] and not counts["running"]:
+        st.caption("Start `python main.py worker` to process queued entries.")
+
+@st.cache_resource(max_entries=1)
+def similarity_index(version: str, generation: int):
+    """Vector index, rebuilt only when the stored embeddings change."""
+    return embed.build_index()
+
+
+def similar_entries(entry_id: int, k: int = 5) -> list[dict]:
+    if embed.pending_count():
+        with st.spinner("Embedding new entries…"):
+            embed.refresh()
+    index = similarity_index(embed.get_embedder().version(), embed.generation())
+    return embed.similar(entry_id, k=k, index=index)
 
 # ---------- Layout ---------------------------------------------------------
 
@@ -84,13 +104,14 @@ st.title("📓 AI Chat Journal Dashboard")
 
 # Sidebar — filters & actions
 st.sidebar.header("Filters & Actions")
-
-df_all = fetch_df()
-
-# Date range widget
-if not df_all.empty:
-    date_min = df_all["timestamp"].min().date()
-    date_max = df_all["timestamp"].max().date()
+if SNAPSHOT:
+    st.sidebar.caption(f"Entries from snapshot `{SNAPSHOT}`; edits go to the live journal.")
+
+# Date range widget (bounds come straight from the timestamp index)
+oldest, newest = storage.timestamp_bounds()
+if oldest:
+    date_min = datetime.fromisoformat(oldest).date()
+    date_max = datetime.fromisoformat(newest).date()
 else:
     date_min = date_max = datetime.today().date()
 
@@ -99,11 +120,13 @@ start_date, end_date = st.sidebar.date_input(
     min_value=date_min, max_value=date_max
 )
 
-search_term = st.sidebar.text_input("Text search")
+search_term = st.sidebar.text_input("Text search", help="Searches entries and AI summaries")
 show_missing = st.sidebar.checkbox("Show only unanalyzed")
 
 if st.sidebar.button("✨ Analyze missing", type="primary"):
-    analyze_missing(df_all)
+    analyze_missing()
+with st.sidebar:
+    job_status()
 
 # Export buttons
 if st.sidebar.button("🗄️ Export MD + PDF", type="primary"):
@@ -125,13 +148,14 @@ with st.sidebar.expander("➕ Add new entry"):
 
 # ---------- Data filtering ----------
 
-mask = (df_all["timestamp"].dt.date.between(start_date, end_date))
+df = fetch_df(start_date, end_date, unanalyzed=show_missing)
 if search_term:
-    mask &= df_all["text"].str.contains(search_term, case=False, na=False)
-if show_missing:
-    mask &= df_all["summary"].isna()
-
-df = df_all[mask]
+    # Ranked full-text search (FTS5) under the same filters; best matches first
+    hits = storage.search(search_term, limit=500, start=start_date, end=end_date,
+                          unanalyzed=show_missing)
+    hit_ids = [hit["id"] for hit in hits]
+    rank = {entry_id: i for i, entry_id in enumerate(hit_ids)}
+    df = df[df["id"].isin(rank)].sort_values("id", key=lambda ids: ids.map(rank))
 
 # ---------- Main: mood chart + entries ----------
 
@@ -139,19 +163,36 @@ left, right = st.columns([1, 2])
 
 with left:
     st.subheader("Mood over time")
-    if df["mood"].dropna().empty:
+    # Daily averages come pre-aggregated from the rollup table
+    trend = pd.DataFrame(storage.mood_rollup("day", start_date, end_date))
+    trend = trend.dropna(subset=["avg"]) if not trend.empty else trend
+    if trend.empty:
         st.info("No mood data in this range.")
     else:
         chart = (
-            alt.Chart(df.dropna(subset=["mood"]))
+            alt.Chart(trend)
             .mark_line(point=True, color="#14B8A6")   # teal accent
             .encode(
-                x="timestamp:T",
-                y=alt.Y("mood:Q", scale=alt.Scale(domain=[0, 10])),
+                x=alt.X("period:T", title="day"),
+                y=alt.Y("avg:Q", title="mood", scale=alt.Scale(domain=[0, 10])),
+                tooltip=["period", "entries", "avg", "min", "max"],
             )
         )
         st.altair_chart(chart, use_container_width=True)
 
+    similar_id = st.session_state.get("similar_id")
+    if similar_id is not None:
+        st.subheader(f"Similar to entry #{similar_id}")
+        hits = similar_entries(similar_id)
+        if not hits:
+            st.info("No other entries to compare with.")
+        for hit in hits:
+            st.markdown(f"**#{hit['id']}** {hit['timestamp'][:16]} · similarity {hit['score']:.2f}  \n"
+                        f"{hit['text'][:200]}")
+        if st.button("✖️ Close", key="close-similar"):
+            st.session_state.pop("similar_id", None)
+            st.rerun()
+
 with right:
     st.subheader("Entries")
     if df.empty:
@@ -164,7 +205,11 @@ with right:
             unsafe_allow_html=True,
         )
     else:
-        for row in df.itertuples(index=False):
+        pages = (len(df) - 1) // PAGE_SIZE + 1
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) \
+            if pages > 1 else 1
+        st.caption(f"{len(df)} entries")
+        for row in df.iloc[(page - 1) * PAGE_SIZE: page * PAGE_SIZE].itertuples(index=False):
             editing = st.session_state.get("edit_id") == row.id
 
             if editing:
@@ -195,7 +240,11 @@ with right:
                     """,
                     unsafe_allow_html=True,
                 )
-                if st.button("✏️ Edit", key=f"edit-{row.id}"):
+                colA, colB = st.columns([1, 1])
+                if colA.button("✏️ Edit", key=f"edit-{row.id}"):
                     st.session_state["edit_id"] = row.id
                     st.session_state["edit_text"] = row.text
+                    st.rerun()
+                if colB.button("🔎 Similar", key=f"similar-{row.id}"):
+                    st.session_state["similar_id"] = int(row.id)
                     st.rerun()
\ No newline at end of file
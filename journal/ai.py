@@ -1,22 +1,22 @@
 """
 journal.ai
 -----------
-Single responsibility: talk to the OpenAI API and return
-(summary, mood_score) tuples. Keeps all external-service logic
-in one place, so the rest of the app stays testable/offline.
+Single responsibility: turn journal text into (summary, mood_score)
+tuples. The work is done by a pluggable provider – the OpenAI API
+(journal.ai_openai) or a fast offline scorer (journal.ai_local) – picked
+with set_provider() or the JOURNAL_AI_PROVIDER env var. Prompts, reply
+parsing, packing and caching live here and are shared by every backend.
 """
+import hashlib
+import importlib
 import json
-from typing import Tuple
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Tuple
 
-from dotenv import load_dotenv
-from openai import OpenAI, RateLimitError, APIConnectionError
-from tenacity import retry, wait_exponential, stop_after_attempt
-
-# Load variables from .env (OPENAI_API_KEY) into the process environment
-load_dotenv()
-
-# Initialising once is more efficient than constructing per call
-client = OpenAI()  # uses the OPENAI_API_KEY env var automatically
+from journal import cache, trace
+from journal.ratelimit import TokenBucket
 
 SYSTEM_PROMPT = (
     "You are an assistant that analyses a personal journal entry.\n"
@@ -25,32 +25,339 @@ SYSTEM_PROMPT = (
     "Respond with JSON ONLY."
 )
 
-@retry(
-    retry=lambda exc: isinstance(exc, (RateLimitError, APIConnectionError)),
-    wait=wait_exponential(min=1, max=20),
-    stop=stop_after_attempt(3),
+PACKED_PROMPT = (
+    "You are an assistant that analyses personal journal entries.\n"
+    "The user sends a JSON array of objects with keys 'id' and 'text'.\n"
+    "Return a JSON array with one object per entry, in any order, with keys "
+    "'id' (copied from the input), 'summary' (2–3 sentences) and 'mood' "
+    "(an integer 1–10 where 1 is very negative and 10 is very positive).\n"
+    "Respond with JSON ONLY."
+)
+
+REDUCE_PROMPT = (
+    "You are an assistant that analyses a long personal journal entry.\n"
+    "The user sends summaries of consecutive parts of the entry, in order.\n"
+    "Return JSON with keys 'summary' (2–3 sentences about the whole entry) and "
+    "'mood' (an integer 1–10 where 1 is very negative and 10 is very positive).\n"
+    "Respond with JSON ONLY."
 )
-def analyse(text: str) -> Tuple[str, int]:
-    """
-    Send `text` to OpenAI and return (summary, mood_score).
-    Retries on transient network / rate-limit errors.
-    """
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": text},
-        ],
-        temperature=0.5,
-    )
-    raw = response.choices[0].message.content.strip()
-
-    # The model should reply with JSON. Parse defensively.
+
+# Prompt tokens per packed request (entries only; the system prompt and
+# reply are on top). Keeps requests well inside the model's context.
+PACK_TOKEN_BUDGET = 2000
+
+# Entries longer than CHUNK_TOKENS are analysed in chunks of at most
+# that size, summarised concurrently and reduced into one result (see
+# analyse_long). Chunks end at content-defined paragraph/sentence
+# boundaries once they reach CHUNK_MIN_TOKENS, so an edit only changes
+# the chunk it falls in and the other chunk results come from the cache.
+CHUNK_TOKENS = 1500
+CHUNK_MIN_TOKENS = 500
+CHUNK_BOUNDARY_ODDS = 4    # ~1 in 4 units past the minimum ends a chunk
+CHUNK_CONCURRENCY = 4
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Shared throttle for bulk runs (see journal.batch). None = unthrottled.
+limiter: TokenBucket | None = None
+
+
+def parse_reply(raw: str) -> Tuple[str, int, bool]:
+    """
+    Parse the model's JSON reply defensively.
+    Returns (summary, mood, ok) where ok=False means we fell back.
+    """
     try:
         data = json.loads(raw)
-        summary = data["summary"]
-        mood = int(data["mood"])
+        return data["summary"], int(data["mood"]), True
     except Exception:
-        summary = raw  # fallback: treat the whole reply as summary
-        mood = 5       # neutral baseline
-    return summary, mood
\ No newline at end of file
+        # fallback: treat the whole reply as summary, neutral mood
+        return raw, 5, False
+
+
+class Provider:
+    """
+    Interface every analysis backend implements.
+
+    `analyse` returns (summary, mood, ok) where ok=False means the result
+    is a fallback and must not be cached. `analyse_packed` may return
+    None when the backend has no multi-entry mode.
+    """
+    name = "base"
+    model: str | None = None  # recorded with each analysis (default: name)
+    cacheable = True   # worth a SQLite lookup per call?
+    # For `reanalyze` estimates: USD per 1K (prompt, completion) tokens
+    # and typical seconds per request.
+    price_per_1k = (0.0, 0.0)
+    seconds_per_request = 0.0
+
+    def version(self) -> str:
+        """Fingerprint of whatever shapes the output (model, prompt, …)."""
+        raise NotImplementedError
+
+    def analyse(self, text: str) -> Tuple[str, int, bool]:
+        raise NotImplementedError
+
+    def analyse_packed(self, entries: list[dict]) -> dict[int, Tuple[str, int]] | None:
+        return None
+
+    def reduce(self, summaries: list[str]) -> Tuple[str, int, bool]:
+        """Combine summaries of consecutive parts of one entry."""
+        return self.analyse("\n\n".join(summaries))
+
+
+# name -> (module, class); modules are only imported when selected, so
+# the local backend works without the OpenAI SDK installed.
+PROVIDERS = {
+    "openai": ("journal.ai_openai", "OpenAIProvider"),
+    "local": ("journal.ai_local", "LocalProvider"),
+}
+DEFAULT_PROVIDER = os.environ.get("JOURNAL_AI_PROVIDER", "openai")
+
+_active = DEFAULT_PROVIDER
+_instances: dict[str, Provider] = {}
+
+
+def set_provider(name: str) -> None:
+    """Select the backend used by analyse/analyse_many from now on."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown provider {name!r}; choose from {', '.join(PROVIDERS)}")
+    global _active
+    _active = name
+
+
+def get_provider(name: str | None = None) -> Provider:
+    name = name or _active
+    if name not in _instances:
+        module, cls = PROVIDERS[name]
+        _instances[name] = getattr(importlib.import_module(module), cls)()
+    return _instances[name]
+
+
+def fingerprint(provider: str | None = None) -> tuple[str, str]:
+    """(model, version) of a provider, stored with every analysis it makes."""
+    backend = get_provider(provider)
+    return backend.model or backend.name, backend.version()
+
+
+def analyse(text: str, provider: str | None = None) -> Tuple[str, int]:
+    """
+    Return (summary, mood_score) for `text` using the selected provider.
+    Identical text under the same provider version is served from the
+    cache; long text is analysed in chunks (see analyse_long).
+    """
+    summary, mood, _ = analyse_checked(text, provider)
+    return summary, mood
+
+
+@trace.traced("ai.analyse")
+def analyse_checked(text: str, provider: str | None = None) -> Tuple[str, int, bool]:
+    """
+    Like analyse(), plus `ok`: False when the reply was malformed and the
+    result is a fallback (raw reply as summary, mood 5). Callers that
+    store results pass it on so the entry stays stale (see
+    storage.update_entries).
+    """
+    return _analyse(get_provider(provider), text)
+
+
+def _cached(backend: Provider, key_text: str, compute) -> Tuple[str, int, bool]:
+    """compute() -> (summary, mood, ok), memoised under key_text."""
+    if not backend.cacheable:
+        return compute()
+    version = backend.version()
+    hit = cache.get(version, key_text)
+    if hit is not None:
+        trace.count("ai.cache_hits")
+        return hit[0], hit[1], True
+
+    trace.count("ai.cache_misses")
+    summary, mood, ok = compute()
+    if ok:  # don't pin a malformed reply in the cache
+        cache.put(version, key_text, summary, mood)
+    return summary, mood, ok
+
+
+def _analyse(backend: Provider, text: str) -> Tuple[str, int, bool]:
+    if estimate_tokens(text) > CHUNK_TOKENS:
+        return _cached(backend, text, lambda: analyse_long(text, backend))
+    return _cached(backend, text, lambda: backend.analyse(text))
+
+
+# ---------- Long entries ------------------------------------------------------
+
+def _units(text: str) -> Iterator[str]:
+    """Paragraphs; sentences of oversized paragraphs; words of oversized sentences."""
+    for paragraph in re.split(r"\n\s*\n", text):
+        if not paragraph.strip():
+            continue
+        if estimate_tokens(paragraph) <= CHUNK_TOKENS:
+            yield paragraph.strip()
+            continue
+        for sentence in SENTENCE_RE.split(paragraph):
+            if estimate_tokens(sentence) <= CHUNK_TOKENS:
+                yield sentence.strip()
+                continue
+            words, piece = sentence.split(), []
+            for word in words:
+                piece.append(word)
+                if estimate_tokens(" ".join(piece)) >= CHUNK_TOKENS:
+                    yield " ".join(piece)
+                    piece = []
+            if piece:
+                yield " ".join(piece)
+
+
+def _ends_chunk(unit: str) -> bool:
+    digest = hashlib.blake2b(unit.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % CHUNK_BOUNDARY_ODDS == 0
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS,
+               min_tokens: int = CHUNK_MIN_TOKENS) -> list[str]:
+    """
+    Split `text` into chunks of at most ~`max_tokens` tokens along
+    paragraph, then sentence, then word boundaries. Whether a chunk ends
+    after a unit depends on the unit's own content, not its position,
+    so editing one part of a long entry leaves the other chunks as they
+    were.
+    """
+    chunks, current, tokens = [], [], 0
+    for unit in _units(text):
+        cost = estimate_tokens(unit)
+        if current and tokens + cost > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, tokens = [], 0
+        current.append(unit)
+        tokens += cost
+        if tokens >= min_tokens and _ends_chunk(unit):
+            chunks.append("\n\n".join(current))
+            current, tokens = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _map(fn, items: list) -> list:
+    if len(items) == 1:
+        return [fn(items[0])]
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+        return list(pool.map(fn, items))
+
+
+@trace.traced("ai.analyse_long")
+def analyse_long(text: str, backend: Provider) -> Tuple[str, int, bool]:
+    """
+    Hierarchical analysis of a long entry: summarise each chunk (cached
+    per chunk, CHUNK_CONCURRENCY at a time), then reduce the summaries
+    - in rounds, while they don't fit one request - into one summary.
+    The mood is the chunks' moods averaged by length, so a failed chunk
+    costs its share instead of dragging everything to the fallback 5.
+    ok=False if any step fell back.
+    """
+    chunks = chunk_text(text)
+    trace.count("ai.chunks", len(chunks))
+    parts = _map(lambda chunk: _cached(backend, chunk, lambda: backend.analyse(chunk)), chunks)
+
+    weights = [estimate_tokens(chunk) for chunk, part in zip(chunks, parts) if part[2]]
+    moods = [part[1] for part in parts if part[2]]
+    mood = round(sum(w * m for w, m in zip(weights, moods)) / sum(weights)) if moods else 5
+    ok = all(part[2] for part in parts)
+
+    summaries = [part[0] for part in parts]
+    while len(summaries) > 1:
+        groups = list(pack(({"text": s} for s in summaries), len(summaries), CHUNK_TOKENS))
+        if len(groups) == len(summaries) > 1:  # every summary too big to pair up
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        else:
+            groups = [[item["text"] for item in group] for group in groups]
+        # Keyed by the reduce prompt too, so changing it invalidates these.
+        reduced = _map(lambda group: _cached(
+            backend, REDUCE_PROMPT + "\x00" + "\n\n".join(group), lambda: backend.reduce(group)),
+            groups)
+        summaries = [r[0] for r in reduced]
+        ok = ok and all(r[2] for r in reduced)
+    return summaries[0], mood, ok
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def pack(entries: Iterable[dict], batch_size: int,
+         token_budget: int = PACK_TOKEN_BUDGET) -> Iterator[list[dict]]:
+    """
+    Group entries (dicts with `id` and `text`) into packs of at most
+    `batch_size` entries and roughly `token_budget` prompt tokens.
+    An entry bigger than the budget on its own still gets a pack.
+    """
+    current, tokens = [], 0
+    for entry in entries:
+        cost = estimate_tokens(entry["text"])
+        if current and (len(current) >= batch_size or tokens + cost > token_budget):
+            yield current
+            current, tokens = [], 0
+        current.append(entry)
+        tokens += cost
+    if current:
+        yield current
+
+
+def parse_packed(raw: str) -> dict[int, Tuple[str, int]]:
+    """Pull every well-formed {id, summary, mood} item out of a packed reply."""
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return {}
+    if isinstance(data, dict):  # some replies wrap the array in an object
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+    results = {}
+    for item in data if isinstance(data, list) else []:
+        try:
+            results[int(item["id"])] = (str(item["summary"]), int(item["mood"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
+
+
+def analyse_many(entries: list[dict],
+                 provider: str | None = None) -> dict[int, Tuple[str, int, bool]]:
+    """
+    Analyse several entries, in a single request when the provider
+    supports packing.
+
+    Cached entries are answered locally; the rest go out together.
+    Anything missing or malformed in the packed reply falls back to a
+    per-entry `analyse_checked()` call. Returns {entry_id: (summary,
+    mood, ok)}, `ok` as in analyse_checked().
+    """
+    backend = get_provider(provider)
+    if not backend.cacheable:
+        return {e["id"]: analyse_checked(e["text"], provider) for e in entries}
+
+    version = backend.version()
+    results, todo, hits = {}, [], 0
+    for entry in entries:
+        if estimate_tokens(entry["text"]) > CHUNK_TOKENS:  # chunked on its own
+            results[entry["id"]] = analyse_checked(entry["text"], provider)
+            continue
+        hit = cache.get(version, entry["text"])
+        if hit is not None:
+            results[entry["id"]] = (*hit, True)
+            hits += 1
+        else:
+            todo.append(entry)
+
+    trace.count("ai.cache_hits", hits)
+    trace.count("ai.cache_misses", len(todo))
+    with trace.span("ai.analyse_packed", rows=len(todo)):
+        packed = backend.analyse_packed(todo) if len(todo) > 1 else None
+    for entry in todo:
+        if packed and entry["id"] in packed:
+            summary, mood = packed[entry["id"]]
+            cache.put(version, entry["text"], summary, mood)
+            results[entry["id"]] = (summary, mood, True)
+        else:
+            results[entry["id"]] = analyse_checked(entry["text"], provider)
+    return results
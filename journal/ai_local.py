@@ -0,0 +1,114 @@
+"""
+journal.ai_local
+----------------
+Offline analysis backend: a lexicon sentiment scorer for mood and a
+frequency-based extractive summariser. Pure Python, no network, no
+model files – thousands of entries per second on one core, so bulk
+backfills can run offline and the remote model can re-score later.
+"""
+import re
+from collections import Counter
+from typing import Tuple
+
+from journal import ai
+
+VERSION = "local-lexicon-1"  # bump when the lexicon or scoring changes
+
+# Word -> valence (-3 … +3), in the spirit of AFINN.
+LEXICON = {
+    # positive
+    "amazing": 3, "awesome": 3, "brilliant": 3, "ecstatic": 3, "excellent": 3,
+    "fantastic": 3, "thrilled": 3, "wonderful": 3, "love": 3, "loved": 3,
+    "joy": 3, "joyful": 3, "delighted": 3, "perfect": 3, "incredible": 3,
+    "great": 2, "happy": 2, "glad": 2, "excited": 2, "proud": 2, "grateful": 2,
+    "thankful": 2, "fun": 2, "enjoyed": 2, "enjoy": 2, "beautiful": 2,
+    "relaxed": 2, "peaceful": 2, "calm": 2, "hopeful": 2, "laughed": 2,
+    "success": 2, "successful": 2, "win": 2, "won": 2, "accomplished": 2,
+    "confident": 2, "energized": 2, "inspired": 2, "motivated": 2, "lovely": 2,
+    "good": 1, "nice": 1, "fine": 1, "better": 1, "ok": 1, "okay": 1,
+    "productive": 1, "rested": 1, "pleasant": 1, "interesting": 1, "like": 1,
+    "liked": 1, "smile": 1, "smiled": 1, "helpful": 1, "progress": 1,
+    "improved": 1, "relief": 1, "relieved": 1, "content": 1, "cozy": 1,
+    # negative
+    "awful": -3, "terrible": -3, "horrible": -3, "miserable": -3,
+    "devastated": -3, "hate": -3, "hated": -3, "depressed": -3, "hopeless": -3,
+    "panic": -3, "furious": -3, "worst": -3, "disaster": -3, "heartbroken": -3,
+    "sad": -2, "angry": -2, "upset": -2, "anxious": -2, "anxiety": -2,
+    "stressed": -2, "stress": -2, "lonely": -2, "hurt": -2, "afraid": -2,
+    "scared": -2, "worried": -2, "worry": -2, "exhausted": -2, "frustrated": -2,
+    "frustrating": -2, "annoyed": -2, "cried": -2, "crying": -2, "fail": -2,
+    "failed": -2, "failure": -2, "sick": -2, "pain": -2, "guilty": -2,
+    "ashamed": -2, "overwhelmed": -2, "disappointed": -2, "lost": -2,
+    "bad": -1, "tired": -1, "bored": -1, "boring": -1, "meh": -1, "down": -1,
+    "difficult": -1, "hard": -1, "problem": -1, "problems": -1, "late": -1,
+    "rain": -1, "nervous": -1, "confused": -1, "sore": -1, "busy": -1,
+    "awkward": -1, "mistake": -1, "argument": -1, "argued": -1, "slow": -1,
+}
+NEGATORS = {"not", "no", "never", "n't", "hardly", "without", "isn't", "wasn't",
+            "don't", "didn't", "can't", "couldn't", "won't", "nothing"}
+INTENSIFIERS = {"very": 1.5, "really": 1.5, "so": 1.3, "extremely": 2.0,
+                "super": 1.5, "incredibly": 1.8, "quite": 1.2, "slightly": 0.5,
+                "bit": 0.6, "somewhat": 0.7}
+STOPWORDS = set("""
+a an and are as at be been but by for from had has have he her his i if in
+into is it its me my of on or our she so that the their them then there they
+this to too was we were what when which who will with you your just got get
+""".split())
+
+WORD_RE = re.compile(r"[a-z']+")
+SENTENCE_RE = ai.SENTENCE_RE
+
+
+def mood_score(text: str) -> int:
+    """
+    Lexicon sentiment mapped onto the 1–10 mood scale (5 = neutral).
+    Negators within three words flip a term; intensifiers scale it.
+    """
+    words = WORD_RE.findall(text.lower())
+    total, hits = 0.0, 0
+    for i, word in enumerate(words):
+        valence = LEXICON.get(word)
+        if valence is None:
+            continue
+        window = words[max(0, i - 3):i]
+        if any(w in NEGATORS or w.endswith("n't") for w in window):
+            valence = -valence * 0.75
+        if i and words[i - 1] in INTENSIFIERS:
+            valence *= INTENSIFIERS[words[i - 1]]
+        total += valence
+        hits += 1
+    if not hits:
+        return 5
+    # Average valence (-3…3) squashed so a handful of strong words can
+    # reach the ends of the scale without a single word dominating.
+    avg = total / (hits + 1)
+    return max(1, min(10, round(5.5 + avg * 1.5)))
+
+
+def summarise(text: str, max_sentences: int = 2) -> str:
+    """Pick the most content-heavy sentences, kept in original order."""
+    sentences = [s.strip() for s in SENTENCE_RE.split(text.strip()) if s.strip()]
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+    freq = Counter(w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS)
+
+    def weight(sentence: str) -> float:
+        words = [w for w in WORD_RE.findall(sentence.lower()) if w not in STOPWORDS]
+        return sum(freq[w] for w in words) / (len(words) + 1) if words else 0.0
+
+    best = sorted(range(len(sentences)), key=lambda i: weight(sentences[i]),
+                  reverse=True)[:max_sentences]
+    return " ".join(sentences[i] for i in sorted(best))
+
+
+class LocalProvider(ai.Provider):
+    name = "local"
+    model = "local-lexicon"
+    cacheable = False  # scoring is cheaper than a cache round-trip
+    seconds_per_request = 0.0002
+
+    def version(self) -> str:
+        return VERSION
+
+    def analyse(self, text: str) -> Tuple[str, int, bool]:
+        return summarise(text), mood_score(text), True
@@ -0,0 +1,150 @@
+"""
+journal.ai_openai
+-----------------
+OpenAI chat-completions backend for journal.ai. Imported lazily, so the
+SDK and .env are only needed when this provider is actually used.
+"""
+import json
+from typing import Tuple
+
+from dotenv import load_dotenv
+from openai import OpenAI, RateLimitError, APIConnectionError
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    wait_exponential,
+    stop_after_attempt,
+)
+
+from journal import ai, cache, embed, trace
+
+# Load variables from .env (OPENAI_API_KEY) into the process environment
+load_dotenv()
+
+MODEL = "gpt-3.5-turbo"
+TEMPERATURE = 0.5
+
+_client: OpenAI | None = None
+
+
+def get_client() -> OpenAI:
+    """Shared client, created on first use."""
+    global _client
+    if _client is None:
+        # max_retries=0: retries live in the tenacity decorator below, so
+        # 429s reach _before_sleep and can pause the shared limiter.
+        _client = OpenAI(max_retries=0)  # uses the OPENAI_API_KEY env var
+    return _client
+
+
+def _retry_after(exc: BaseException) -> float:
+    """Seconds the server asked us to wait, or 0 if it didn't say."""
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+def _before_sleep(state) -> None:
+    """On a 429, pause the shared limiter so every worker backs off."""
+    exc = state.outcome.exception()
+    trace.count("openai.retries")
+    if isinstance(exc, RateLimitError):
+        trace.count("openai.rate_limited")
+    if ai.limiter is not None and isinstance(exc, RateLimitError):
+        ai.limiter.pause(max(state.next_action.sleep, _retry_after(exc)))
+
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError)),
+    wait=wait_exponential(min=1, max=20),
+    stop=stop_after_attempt(3),
+    before_sleep=_before_sleep,
+)
+def complete(system: str, user: str) -> str:
+    """
+    One chat completion; returns the raw reply text.
+    Retries on transient network / rate-limit errors.
+    """
+    if ai.limiter is not None:
+        with trace.span("ratelimit.wait"):
+            ai.limiter.acquire()
+    with trace.span("openai.chat", model=MODEL):  # one span per attempt
+        response = get_client().chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=TEMPERATURE,
+        )
+    _count_tokens(response)
+    return response.choices[0].message.content.strip()
+
+
+def _count_tokens(response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        trace.count("openai.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        trace.count("openai.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+class OpenAIProvider(ai.Provider):
+    name = "openai"
+    model = MODEL
+    price_per_1k = (0.0005, 0.0015)  # gpt-3.5-turbo list prices
+    seconds_per_request = 1.5
+
+    def version(self) -> str:
+        """Changes whenever the model, prompts, chunking or temperature do."""
+        shape = "\n".join([ai.SYSTEM_PROMPT, ai.PACKED_PROMPT, ai.REDUCE_PROMPT,
+                           f"chunks: {ai.CHUNK_TOKENS} {ai.CHUNK_MIN_TOKENS} "
+                           f"{ai.CHUNK_BOUNDARY_ODDS}"])
+        return cache.version_hash(MODEL, shape, TEMPERATURE)
+
+    def analyse(self, text: str) -> Tuple[str, int, bool]:
+        return ai.parse_reply(complete(ai.SYSTEM_PROMPT, text))
+
+    def analyse_packed(self, entries: list[dict]) -> dict[int, Tuple[str, int]]:
+        payload = json.dumps([{"id": e["id"], "text": e["text"]} for e in entries],
+                             ensure_ascii=False)
+        return ai.parse_packed(complete(ai.PACKED_PROMPT, payload))
+
+    def reduce(self, summaries: list[str]) -> Tuple[str, int, bool]:
+        parts = "\n\n".join(f"Part {i}: {s}" for i, s in enumerate(summaries, 1))
+        return ai.parse_reply(complete(ai.REDUCE_PROMPT, parts))
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 512  # text-embedding-3 models can shorten their vectors
+
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError)),
+    wait=wait_exponential(min=1, max=20),
+    stop=stop_after_attempt(3),
+    before_sleep=_before_sleep,
+)
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """One embeddings request for a batch of texts, in input order."""
+    if ai.limiter is not None:
+        with trace.span("ratelimit.wait"):
+            ai.limiter.acquire()
+    with trace.span("openai.embeddings", rows=len(texts)):
+        response = get_client().embeddings.create(
+            model=EMBEDDING_MODEL, input=texts, dimensions=EMBEDDING_DIM
+        )
+    _count_tokens(response)
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+class OpenAIEmbedder(embed.Embedder):
+    name = "openai"
+    dim = EMBEDDING_DIM
+
+    def version(self) -> str:
+        return f"openai-{EMBEDDING_MODEL}-{EMBEDDING_DIM}"
+
+    def embed(self, texts: list[str]):
+        return embed.normalise(embed_texts(texts))
@@ -0,0 +1,405 @@
+"""
+journal.api
+-----------
+asyncio HTTP API over the journal for the web and iOS front-ends
+(`journal serve`). Needs aiohttp.
+
+    GET   /entries?limit=20&before=ID&from=&to=&unanalyzed=1   newest first
+    POST  /entries              {"text": …}        201; analysis is queued
+    GET   /entries/{id}                            with its analysis status
+    PATCH /entries/{id}         {"text": …}        send If-Match to avoid lost updates
+    POST  /entries/{id}/analyze                    202
+    GET   /search?q=…&limit=20&offset=0
+    GET   /stats?by=day|week|month&from=&to=
+    GET   /changes?since=SEQ&limit=1000                 change feed for sync
+    GET   /health
+
+SQLite calls block, so handlers run them on a small thread pool;
+storage keeps one connection per thread, so that pool is the
+connection pool, and under WAL its readers don't wait for each other.
+
+Every GET answers with an ETag. An entry's is strong, a hash of its
+stored fields (updated_at included) but not of its analysis status, so
+a worker picking the job up doesn't fail a client's If-Match; a finished
+analysis changes the row and so the tag. Lists, search, stats and the
+change feed have weak ETags from the journal's latest change number
+(storage.last_change) plus the query. A client re-polling an unchanged
+journal with If-None-Match gets a 304 before any query runs. Clients keeping a copy sync through /changes
+(storage.changes_since); the server compacts that log every
+COMPACT_EVERY seconds.
+
+Writes queue analysis in their own transaction (journal.jobs) and
+respond at once; the server then wakes an in-process drain of the
+queue (worker.run_worker(once=True)) on a thread of its own. Clients
+see the result by re-fetching the entry. Use --no-analyze when a
+separate `journal worker` drains the queue instead.
+"""
+import asyncio
+import hashlib
+import html
+import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from aiohttp import web
+
+from journal import jobs, storage, trace
+
+DB_THREADS = 4
+PAGE_LIMIT = 20
+MAX_LIMIT = 200
+ENTRY_FIELDS = ("id", "timestamp", "text", "summary", "mood", "updated_at")
+COMPACT_EVERY = 3600  # seconds between change-log compactions
+
+DB_POOL = web.AppKey("db_pool", ThreadPoolExecutor)
+ANALYSER = web.AppKey("analyser", object)
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ---------- Helpers ---------------------------------------------------------
+
+async def _run(request: web.Request, fn, *args):
+    """Run blocking storage code on the connection pool."""
+    return await asyncio.get_running_loop().run_in_executor(
+        request.app[DB_POOL], partial(fn, *args))
+
+
+def _int(query, name: str, default=None, low: int = 0, high: int | None = None):
+    value = query.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be an integer") from None
+    if number < low:
+        raise ApiError(400, f"'{name}' must be at least {low}")
+    if high is not None and number > high:
+        raise ApiError(400, f"'{name}' must be at most {high}")
+    return number
+
+
+def _timestamp(query, name: str) -> str | None:
+    """An ISO date or datetime filter (`from`/`to`), or None when absent."""
+    value = query.get(name) or None
+    if value is not None:
+        try:
+            datetime.fromisoformat(value)
+        except ValueError:
+            raise ApiError(400, f"'{name}' must be an ISO date or datetime") from None
+    return value
+
+
+async def _text(request: web.Request) -> str:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError(400, "body must be JSON") from None
+    text = body.get("text") if isinstance(body, dict) else None
+    if not isinstance(text, str) or not text.strip():
+        raise ApiError(400, "'text' must be a non-empty string")
+    return text.strip()
+
+
+def _etag(*parts, weak: bool = True) -> str:
+    digest = hashlib.blake2b(json.dumps(parts, default=str).encode(), digest_size=8)
+    return f'{"W/" if weak else ""}"{digest.hexdigest()}"'
+
+
+def _matches(header: str | None, etag: str, weak: bool = True) -> bool:
+    """
+    Does `etag` match an If-None-Match (weak comparison) or, with
+    weak=False, an If-Match (strong comparison: weak tags never match)?
+    """
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(",")}
+    if "*" in tags:
+        return True
+    if not weak:
+        return not etag.startswith("W/") and etag in tags
+    return etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+
+
+def _respond(request: web.Request, etag: str, body, status: int = 200) -> web.Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if status == 200 and _matches(request.headers.get("If-None-Match"), etag):
+        return web.Response(status=304, headers=headers)
+    return web.json_response(body, status=status, headers=headers)
+
+
+def _marked(request: web.Request, build, *key):
+    """
+    Conditional GET for anything derived from the whole journal: the
+    ETag comes from its latest change number, and build() only runs (on
+    the pool) when the client's copy is out of date.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+
+    def work():
+        etag = _etag(storage.last_change(), request.path, *key)
+        if _matches(if_none_match, etag):
+            return etag, None
+        return etag, build()
+
+    return work
+
+
+async def _conditional(request: web.Request, build, *key) -> web.Response:
+    etag, body = await _run(request, _marked(request, build, *key))
+    if body is None:
+        return web.Response(status=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return _respond(request, etag, body)
+
+
+def _entry(entry_id: int) -> tuple[str, dict] | None:
+    """(ETag, representation) of one entry, or None."""
+    row = storage.get_entry(entry_id)
+    if row is None:
+        return None
+    body = {field: row[field] for field in ENTRY_FIELDS}
+    etag = _etag(*body.values(), weak=False)
+    body["analysis"] = jobs.entry_status(storage._db(), [entry_id]).get(entry_id)
+    return etag, body
+
+
+# ---------- Handlers --------------------------------------------------------
+
+async def list_entries(request: web.Request) -> web.Response:
+    query = request.query
+    limit = _int(query, "limit", PAGE_LIMIT, 1, MAX_LIMIT)
+    before = _int(query, "before", None, 1)
+    filters = {"start": _timestamp(query, "from"), "end": _timestamp(query, "to"),
+               "unanalyzed": query.get("unanalyzed") in ("1", "true")}
+
+    def build():
+        rows = list(storage.query_entries(**filters, columns=ENTRY_FIELDS, order_by="id desc",
+                                          limit=limit, before_id=before))
+        return {"entries": rows,
+                "next": rows[-1]["id"] if len(rows) == limit else None}
+
+    return await _conditional(request, build, limit, before, filters)
+
+
+async def create_entry(request: web.Request) -> web.Response:
+    text = await _text(request)
+
+    def create():
+        return _entry(storage.add_entry(text))
+
+    etag, body = await _run(request, create)
+    request.app[ANALYSER].kick()
+    return web.json_response(body, status=201, headers={
+        "ETag": etag, "Location": f"/entries/{body['id']}"})
+
+
+async def get_entry(request: web.Request) -> web.Response:
+    found = await _run(request, _entry, int(request.match_info["id"]))
+    if found is None:
+        raise ApiError(404, "no such entry")
+    return _respond(request, *found)
+
+
+async def edit_entry(request: web.Request) -> web.Response:
+    entry_id = int(request.match_info["id"])
+    text = await _text(request)
+    if_match = request.headers.get("If-Match")
+
+    def edit():
+        db = storage._db()
+        db.execute("BEGIN IMMEDIATE")  # check and write under one lock
+        try:
+            found = _entry(entry_id)
+            if found is None:
+                raise ApiError(404, "no such entry")
+            if if_match and not _matches(if_match, found[0], weak=False):
+                raise ApiError(412, "entry changed since it was fetched")
+        except BaseException:
+            db.rollback()
+            raise
+        storage.update_text(entry_id, text)  # commits
+        return _entry(entry_id)
+
+    etag, body = await _run(request, edit)
+    request.app[ANALYSER].kick()
+    return web.json_response(body, headers={"ETag": etag})
+
+
+async def analyse_entry(request: web.Request) -> web.Response:
+    entry_id = int(request.match_info["id"])
+
+    def enqueue():
+        if storage.get_entry(entry_id) is None:
+            raise ApiError(404, "no such entry")
+        with storage._db() as db:
+            jobs.enqueue(db, [entry_id])
+
+    await _run(request, enqueue)
+    request.app[ANALYSER].kick()
+    return web.json_response({"id": entry_id, "analysis": "queued"}, status=202)
+
+
+def _highlight(snippet: str) -> str:
+    start, end = storage.SNIPPET_MARK
+    return html.escape(snippet).replace(start, "<mark>").replace(end, "</mark>")
+
+
+async def search(request: web.Request) -> web.Response:
+    q = request.query.get("q", "").strip()
+    if not q:
+        raise ApiError(400, "'q' is required")
+    limit = _int(request.query, "limit", PAGE_LIMIT, 1, MAX_LIMIT)
+    offset = _int(request.query, "offset", 0, 0)
+
+    def build():
+        hits = storage.search(q, limit=limit, offset=offset)
+        for hit in hits:
+            hit["snippet"] = _highlight(hit["snippet"])
+        return {"hits": hits}
+
+    return await _conditional(request, build, q, limit, offset)
+
+
+async def stats(request: web.Request) -> web.Response:
+    by = request.query.get("by", "day")
+    if by not in storage.PERIODS:
+        raise ApiError(400, f"'by' must be one of {', '.join(storage.PERIODS)}")
+    start, end = _timestamp(request.query, "from"), _timestamp(request.query, "to")
+
+    def build():
+        return {"totals": storage.mood_totals(),
+                "periods": storage.mood_rollup(by, start, end)}
+
+    return await _conditional(request, build, by, start, end)
+
+
+async def changes(request: web.Request) -> web.Response:
+    since = _int(request.query, "since", 0, -2**63)  # negative: see changes_since
+    limit = _int(request.query, "limit", storage.CHANGES_PAGE, 1, 10 * storage.CHANGES_PAGE)
+    return await _conditional(request, partial(storage.changes_since, since, limit), since, limit)
+
+
+async def health(request: web.Request) -> web.Response:
+    counts = await _run(request, lambda: jobs.status_counts(storage._db()))
+    return web.json_response({"ok": True, "queue": counts})
+
+
+@web.middleware
+async def _middleware(request: web.Request, handler):
+    resource = request.match_info.route.resource
+    name = resource.canonical if resource else "unmatched"
+    with trace.span(f"api {request.method} {name}"):
+        try:
+            return await handler(request)
+        except ApiError as exc:
+            return web.json_response({"error": exc.message}, status=exc.status)
+
+
+# ---------- Background analysis ---------------------------------------------
+
+class Analyser:
+    """
+    Drains the analysis queue on its own thread whenever kicked. Kicks
+    that arrive during a drain are coalesced into one more drain.
+    """
+
+    def __init__(self, enabled: bool = True, provider: str | None = None,
+                 concurrency: int = 4, rps: float | None = None):
+        self.enabled = enabled
+        self.options = {"provider": provider, "concurrency": concurrency, "rps": rps}
+        self._wake = asyncio.Event()
+
+    def kick(self) -> None:
+        if self.enabled:
+            self._wake.set()
+
+    async def run(self) -> None:
+        from journal import worker
+
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-analyse")
+        self.kick()  # whatever was queued before we started
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                try:
+                    await loop.run_in_executor(pool, partial(
+                        worker.run_worker, once=True, **self.options))
+                except Exception as exc:  # keep serving; jobs stay queued for retry
+                    print(f"analysis drain failed: {type(exc).__name__}: {exc}")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _compact_periodically(pool: ThreadPoolExecutor) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(COMPACT_EVERY)
+        try:
+            await loop.run_in_executor(pool, storage.compact_changes)
+        except Exception as exc:  # e.g. a long write lock elsewhere; try next time
+            print(f"change-log compaction failed: {type(exc).__name__}: {exc}")
+
+
+# ---------- App -------------------------------------------------------------
+
+def create_app(db_threads: int = DB_THREADS, analyse: bool = True, provider: str | None = None,
+               concurrency: int = 4, rps: float | None = None) -> web.Application:
+    app = web.Application(middlewares=[_middleware])
+    app[ANALYSER] = Analyser(analyse, provider, concurrency, rps)
+
+    async def lifecycle(app):
+        app[DB_POOL] = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix="journal-db")
+        tasks = [asyncio.create_task(_compact_periodically(app[DB_POOL]))]
+        if analyse:
+            tasks.append(asyncio.create_task(app[ANALYSER].run()))
+        yield
+        for task in tasks:
+            task.cancel()
+        app[DB_POOL].shutdown(wait=True)
+
+    app.cleanup_ctx.append(lifecycle)
+    app.router.add_get("/entries", list_entries)
+    app.router.add_post("/entries", create_entry)
+    app.router.add_get(r"/entries/{id:\d+}", get_entry)
+    app.router.add_patch(r"/entries/{id:\d+}", edit_entry)
+    app.router.add_post(r"/entries/{id:\d+}/analyze", analyse_entry)
+    app.router.add_get("/search", search)
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/changes", changes)
+    app.router.add_get("/health", health)
+    return app
+
+
+def _serve_one(host: str, port: int, reuse_port: bool, options: dict) -> None:
+    web.run_app(create_app(**options), host=host, port=port, reuse_port=reuse_port,
+                print=None)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, workers: int = 1, **options) -> None:
+    """
+    Serve until interrupted. With `workers` > 1, that many processes
+    share the port (SO_REUSEPORT) and the kernel spreads connections.
+    """
+    if workers <= 1:
+        return _serve_one(host, port, False, options)
+    processes = [multiprocessing.Process(target=_serve_one, args=(host, port, True, options))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()  # run_app shuts down cleanly on SIGTERM
+            process.join()
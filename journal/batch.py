@@ -0,0 +1,92 @@
+"""
+journal.batch
+-------------
+Concurrent bulk analysis for backfills.
+
+Fans `ai.analyse` out over a thread pool, throttles every worker
+through one shared token bucket (a 429 in any worker pauses them all)
+and writes results back to SQLite in batched transactions.
+
+Point OPENAI_BASE_URL at a local stand-in (see scripts/fake_openai.py)
+to exercise the whole pipeline without touching the real API.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from journal import ai, storage, trace
+from journal.ratelimit import TokenBucket
+
+
+def _analyse_pack(entries: list[dict]) -> dict[int, tuple[str, int, bool]]:
+    if len(entries) == 1:
+        return {entries[0]["id"]: ai.analyse_checked(entries[0]["text"])}
+    return ai.analyse_many(entries)
+
+
+@dataclass
+class BatchReport:
+    analysed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Entries analysed per second of wall-clock time."""
+        return self.analysed / self.seconds if self.seconds else 0.0
+
+
+@trace.traced("batch.analyse_entries")
+def analyse_entries(
+    entries: Iterable[dict],
+    concurrency: int = 4,
+    rps: float | None = None,
+    batch_size: int = 1,
+    flush_every: int = 50,
+    progress: Callable[[int, int], None] | None = None,
+) -> BatchReport:
+    """
+    Analyse `entries` (dicts with `id` and `text`) with up to
+    `concurrency` requests in flight and at most `rps` requests/sec.
+    With `batch_size` > 1, short entries are packed up to that many per
+    request (see `ai.pack`), which saves the repeated prompt overhead.
+
+    `progress(done, total)` is called from the calling thread after
+    every finished request, so UI code (Streamlit, rich) can use it.
+    """
+    entries = list(entries)
+    analyser = ai.fingerprint()
+    report = BatchReport()
+    pending: list[tuple[int, str, int, bool]] = []
+    started = time.perf_counter()
+
+    previous, ai.limiter = ai.limiter, TokenBucket(rps, burst=concurrency)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            packs = ai.pack(entries, batch_size) if batch_size > 1 else ([e] for e in entries)
+            futures = {pool.submit(_analyse_pack, p): p for p in packs}
+            done = 0
+            for future in as_completed(futures):
+                size = len(futures[future])
+                done += size
+                try:
+                    results = future.result()
+                except Exception:
+                    report.failed += size
+                else:
+                    pending.extend((i, *result) for i, result in results.items())
+                    report.analysed += len(results)
+                if len(pending) >= flush_every:
+                    storage.update_entries(pending, analyser=analyser)
+                    pending.clear()
+                if progress:
+                    progress(done, len(entries))
+    finally:
+        ai.limiter = previous
+        if pending:
+            storage.update_entries(pending, analyser=analyser)
+
+    report.seconds = time.perf_counter() - started
+    trace.count("batch.failed", report.failed)
+    return report
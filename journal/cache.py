@@ -0,0 +1,188 @@
+"""
+journal.cache
+-------------
+Content-addressed cache for `ai.analyse` results, stored in the
+journal's own SQLite file.
+
+Keys are sha256(model, prompt, temperature, text), so identical text
+is only ever sent to the API once per analyser version. Rows written
+by an older prompt/model are dropped the first time a process opens
+the cache; old and least-recently-used rows are evicted at the same
+point and then every PRUNE_EVERY puts or PRUNE_SECONDS. Hit/miss
+counters live in the `meta` table so `journal stats` can report them
+across runs.
+
+A lookup is a plain read: its hit/miss count and last_used stamp are
+buffered in memory and written by flush(), which runs every FLUSH_EVERY
+lookups or FLUSH_SECONDS, inside each put()'s transaction, and at exit.
+"""
+import atexit
+import hashlib
+import json
+import threading
+import time
+
+from journal.db import connect, CACHE_TABLE, META_TABLE
+
+MAX_ENTRIES = 50_000
+MAX_AGE_DAYS = 180
+FLUSH_EVERY = 100        # buffered lookups before their bookkeeping is written
+FLUSH_SECONDS = 30.0
+PRUNE_EVERY = 1_000      # puts between evictions
+PRUNE_SECONDS = 3600.0
+
+_local = threading.local()   # sqlite3 connections are per-thread
+_pruned: set[str] = set()    # versions already pruned in this process
+_prune_lock = threading.Lock()
+
+_lock = threading.Lock()     # guards the buffered bookkeeping below
+_hits = _misses = 0          # lookups not yet added to the meta counters
+_used: dict[str, float] = {}  # key -> last_used stamp not yet written
+_flushed_at = time.monotonic()
+_puts = 0                    # puts since the last eviction
+_evicted_at = time.monotonic()
+
+
+def _db():
+    if getattr(_local, "db", None) is None:
+        _local.db = connect()
+    return _local.db
+
+
+def version_hash(model: str, prompt: str, temperature: float) -> str:
+    """Fingerprint of everything besides the text that shapes a result."""
+    payload = json.dumps([model, prompt, temperature])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(version: str, text: str) -> str:
+    return hashlib.sha256(f"{version}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _bump(db, counter: str, by: int) -> None:
+    db.execute(
+        f"INSERT INTO {META_TABLE} (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+        [counter, by],
+    )
+
+
+def _evict(db) -> None:
+    """Enforce the age and size caps (caller holds the transaction)."""
+    global _puts, _evicted_at
+    with _lock:
+        _puts, _evicted_at = 0, time.monotonic()
+    cutoff = time.time() - MAX_AGE_DAYS * 86400
+    db.execute(f"DELETE FROM {CACHE_TABLE} WHERE last_used < ?", [cutoff])
+    db.execute(
+        f"DELETE FROM {CACHE_TABLE} WHERE key IN ("
+        f"  SELECT key FROM {CACHE_TABLE} ORDER BY last_used DESC"
+        f"  LIMIT -1 OFFSET ?)",
+        [MAX_ENTRIES],
+    )
+
+
+def _prune_once(version: str) -> None:
+    """Drop rows from other analyser versions and enforce size/age caps."""
+    with _prune_lock:
+        if version in _pruned:
+            return
+        _pruned.add(version)
+    db = _db()
+    with db:
+        db.execute(f"DELETE FROM {CACHE_TABLE} WHERE version != ?", [version])
+        _evict(db)
+
+
+def _write_pending(db) -> None:
+    """Write the buffered bookkeeping on `db` (caller holds the transaction)."""
+    global _hits, _misses, _used, _flushed_at
+    with _lock:
+        hits, misses, used = _hits, _misses, _used
+        _hits, _misses, _used, _flushed_at = 0, 0, {}, time.monotonic()
+    if hits:
+        _bump(db, "cache_hits", hits)
+    if misses:
+        _bump(db, "cache_misses", misses)
+    if used:
+        db.executemany(
+            f"UPDATE {CACHE_TABLE} SET last_used = max(last_used, ?) WHERE key = ?",
+            [(stamp, key) for key, stamp in used.items()],
+        )
+
+
+def flush() -> None:
+    """Write buffered hit/miss counts and last_used stamps in one transaction."""
+    with _lock:
+        if not (_hits or _misses):
+            return
+    db = _db()
+    with db:
+        _write_pending(db)
+
+
+def _drop_pending() -> None:
+    """Forget buffered bookkeeping (a forked child: the parent writes its own)."""
+    global _hits, _misses, _used
+    with _lock:
+        _hits, _misses, _used = 0, 0, {}
+
+
+atexit.register(flush)
+
+
+def get(version: str, text: str) -> tuple[str, int] | None:
+    """Return the cached (summary, mood) for `text`, or None on a miss."""
+    global _hits, _misses
+    _prune_once(version)
+    key = make_key(version, text)
+    row = _db().execute(
+        f"SELECT summary, mood FROM {CACHE_TABLE} WHERE key = ?", [key]
+    ).fetchone()
+    with _lock:
+        if row is None:
+            _misses += 1
+        else:
+            _hits += 1
+            _used[key] = time.time()
+        due = (_hits + _misses >= FLUSH_EVERY
+               or time.monotonic() - _flushed_at >= FLUSH_SECONDS)
+    if due:
+        flush()
+    return None if row is None else (row[0], row[1])
+
+
+def put(version: str, text: str, summary: str, mood: int) -> None:
+    global _puts
+    with _lock:
+        _puts += 1
+        evict = _puts >= PRUNE_EVERY or time.monotonic() - _evicted_at >= PRUNE_SECONDS
+    db = _db()
+    now = time.time()
+    with db:
+        db.execute(
+            f"INSERT OR REPLACE INTO {CACHE_TABLE} "
+            "(key, version, summary, mood, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [make_key(version, text), version, summary, mood, now, now],
+        )
+        _write_pending(db)
+        if evict:
+            _evict(db)
+
+
+def stats() -> dict:
+    """Entry count plus lifetime hit/miss counters."""
+    flush()
+    db = _db()
+    counters = dict(
+        tuple(row) for row in db.execute(
+            f"SELECT key, CAST(value AS INTEGER) FROM {META_TABLE} "
+            "WHERE key IN ('cache_hits', 'cache_misses')"
+        )
+    )
+    return {
+        "entries": db.execute(f"SELECT count(*) FROM {CACHE_TABLE}").fetchone()[0],
+        "hits": counters.get("cache_hits", 0),
+        "misses": counters.get("cache_misses", 0),
+    }
@@ -1,88 +1,611 @@
+"""
+journal.cli
+-----------
+Command-line entry point. Only `storage` (plain sqlite3) is imported up
+front; each subcommand imports the modules it needs, so `journal write`
+never pays for the OpenAI SDK, PortAudio, WeasyPrint, pandas or rich.
+See benchmarks/importtime.py for the startup budget.
+"""
 import argparse
+import builtins
 from pathlib import Path
-from rich import print
-from journal import storage, ai, utils, export, import_md, voice
+from journal import storage
+
+
+def print(*objects, **kwargs):
+    """rich's print (markup, colour), imported on first use: rich.console
+    alone is ~35 ms, so `write` and `list` print plain text instead."""
+    from rich import print as rich_print
+
+    rich_print(*objects, **kwargs)
+
 
 def main():
     parser = argparse.ArgumentParser(prog="journal")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print per-stage timings and counters (to stderr) when done")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write a Chrome trace (chrome://tracing, Perfetto) to FILE")
+    parser.add_argument("--journal", metavar="NAME",
+                        help="Journal to use; each has its own database file "
+                             "(default: $JOURNAL_NAME or 'default')")
     sub = parser.add_subparsers(dest="command")
 
     write_cmd = sub.add_parser("write", help="Add a new journal entry")
     write_cmd.add_argument("text", nargs="+", help="Journal text")
 
     sub.add_parser("list", help="Show previous entries")
-    sub.add_parser("analyze", help="Run AI analysis on new entries")
-    sub.add_parser("stats", help="Show mood statistics")
-    export_cmd = sub.add_parser("export", help="Export entries to Markdown / PDF")
+    analyze_cmd = sub.add_parser("analyze", help="Run AI analysis on new entries")
+    analyze_cmd.add_argument("--concurrency", type=int, default=4,
+                             help="Parallel API requests (default 4)")
+    analyze_cmd.add_argument("--rps", type=float, default=None,
+                             help="Max API requests per second (default unlimited)")
+    analyze_cmd.add_argument("--batch-size", type=int, default=1,
+                             help="Pack up to N short entries into one request (default 1)")
+    analyze_cmd.add_argument("--provider", metavar="{local,openai}",
+                             help="Analysis backend: 'local' is offline and fast, "
+                                  "'openai' uses the API (default: $JOURNAL_AI_PROVIDER or openai)")
+    analyze_cmd.add_argument("--all-journals", action="store_true",
+                             help="Run on every journal in parallel and merge the results")
+    reanalyze_cmd = sub.add_parser("reanalyze",
+                                   help="Redo analyses made by another prompt/model or of edited text")
+    reanalyze_cmd.add_argument("--stale", action="store_true", required=True,
+                               help="Only entries whose text or analyser version changed")
+    reanalyze_cmd.add_argument("--include-unknown", action="store_true",
+                               help="Also redo analyses made before versions were recorded")
+    reanalyze_cmd.add_argument("--dry-run", action="store_true",
+                               help="Only print the plan and its estimated cost")
+    reanalyze_cmd.add_argument("--concurrency", type=int, default=4,
+                               help="Parallel API requests (default 4)")
+    reanalyze_cmd.add_argument("--rps", type=float, default=None,
+                               help="Max API requests per second (default unlimited)")
+    reanalyze_cmd.add_argument("--batch-size", type=int, default=1,
+                               help="Pack up to N short entries into one request (default 1)")
+    reanalyze_cmd.add_argument("--provider", metavar="{local,openai}",
+                               help="Analyser to bring entries up to date with "
+                                    "(default: $JOURNAL_AI_PROVIDER or openai)")
+    worker_cmd = sub.add_parser("worker", help="Process the background analysis queue")
+    worker_cmd.add_argument("--concurrency", type=int, default=4,
+                            help="Parallel API requests (default 4)")
+    worker_cmd.add_argument("--rps", type=float, default=None,
+                            help="Max API requests per second (default unlimited)")
+    worker_cmd.add_argument("--poll", type=float, default=2.0,
+                            help="Seconds between checks of an empty queue (default 2)")
+    worker_cmd.add_argument("--once", action="store_true",
+                            help="Exit when no job is due instead of polling")
+    worker_cmd.add_argument("--provider", metavar="{local,openai}",
+                            help="Analysis backend (default: $JOURNAL_AI_PROVIDER or openai)")
+    worker_cmd.add_argument("--enqueue-missing", action="store_true",
+                            help="First queue every entry that has no summary yet")
+    worker_cmd.add_argument("--retry-dead", action="store_true",
+                            help="First give dead-lettered jobs another round of attempts")
+    stats_cmd = sub.add_parser("stats", help="Show mood statistics")
+    stats_cmd.add_argument("--by", choices=["day", "week", "month"],
+                           help="Also print a per-day/week/month table")
+    stats_cmd.add_argument("--all-journals", action="store_true",
+                           help="Run on every journal in parallel and merge the results")
+    search_cmd = sub.add_parser("search", help="Full-text search entries and summaries")
+    search_cmd.add_argument("query", nargs="+", help="Words to look for")
+    search_cmd.add_argument("--limit", type=int, default=20,
+                            help="Maximum number of results (default 20)")
+    search_cmd.add_argument("--all-journals", action="store_true",
+                            help="Run on every journal in parallel and merge the results")
+    similar_cmd = sub.add_parser("similar", help="Find entries similar in meaning to one entry")
+    similar_cmd.add_argument("id", type=int, help="Entry id (as shown by 'search')")
+    similar_cmd.add_argument("--limit", type=int, default=10,
+                             help="Maximum number of results (default 10)")
+    similar_cmd.add_argument("--embedder", metavar="{local,openai}",
+                             help="Embedding backend (default: $JOURNAL_EMBEDDER or local)")
+    similar_cmd.add_argument("--index", choices=["auto", "flat", "ivf"], default="auto",
+                             help="Exact (flat) or clustered approximate (ivf) search")
+    export_cmd = sub.add_parser("export", help="Export entries to Markdown / PDF / Parquet / Arrow")
     export_cmd.add_argument("file", help="Base filename (without extension or with .md)")
+    export_cmd.add_argument("--format", choices=["md", "parquet", "arrow"], default="md",
+                            help="Markdown (default) or a lossless columnar snapshot")
+    export_cmd.add_argument("--compression", default="default",
+                            help="Snapshot codec: zstd, lz4, snappy, none (default: zstd for "
+                                 "Parquet, none for Arrow so it can be memory-mapped)")
     export_cmd.add_argument("--pdf", action="store_true", help="Also create PDF alongside Markdown")
-    import_cmd = sub.add_parser("import", help="Import entries from Markdown")
-    import_cmd.add_argument("file", help="Path to .md file exported earlier")
+    export_cmd.add_argument("--from", dest="start", help="Only entries on/after this date (YYYY-MM-DD)")
+    export_cmd.add_argument("--to", dest="end", help="Only entries on/before this date (YYYY-MM-DD)")
+    export_cmd.add_argument("--since-last", action="store_true",
+                            help="Only entries added since the previous --since-last export")
+    export_cmd.add_argument("--workers", type=int, default=None,
+                            help="Processes used to render the PDF (default: all cores)")
+    export_cmd.add_argument("--all-journals", action="store_true",
+                            help="Export every journal to its own <file>-<journal> file, in parallel")
+    import_cmd = sub.add_parser("import", help="Import entries from Markdown or a snapshot")
+    import_cmd.add_argument("file", help="Path to a .md, .parquet or .arrow file exported earlier")
+    import_cmd.add_argument("--dry-run", action="store_true",
+                            help="Only report how many entries would be imported")
+    migrate_cmd = sub.add_parser("migrate", help="Upgrade the database schema / import the old JSON journal")
+    migrate_cmd.add_argument("--legacy-json", nargs="?", const="", metavar="FILE",
+                             help="Also import a pre-SQLite JSON journal "
+                                  "(default ~/.ai_chat_journal.json); resumes if interrupted")
+    ingest_cmd = sub.add_parser("ingest", help="Stream entries in from JSONL / CSV / TSV / text")
+    ingest_cmd.add_argument("files", nargs="*", metavar="FILE",
+                            help="Input files; none or '-' reads stdin")
+    ingest_cmd.add_argument("--format", choices=["jsonl", "csv", "tsv", "lines"],
+                            help="Input format (default: from the file suffix; stdin is jsonl)")
+    ingest_cmd.add_argument("--batch-size", type=int, default=1000,
+                            help="Entries per transaction (default 1000)")
+    ingest_cmd.add_argument("--analyze", action="store_true",
+                            help="Analyse each batch of new entries right away "
+                                 "(default: leave them queued for 'worker')")
+    ingest_cmd.add_argument("--provider", metavar="{local,openai}",
+                            help="Analysis backend for --analyze")
+    ingest_cmd.add_argument("--concurrency", type=int, default=4,
+                            help="Parallel API requests for --analyze (default 4)")
+    ingest_cmd.add_argument("--rps", type=float, default=None,
+                            help="Max API requests per second for --analyze")
+
+    journals_cmd = sub.add_parser("journals", help="List journals, or add one to the catalog")
+    journals_cmd.add_argument("--add", metavar="NAME", help="Create and catalogue a new journal")
+
+    sync_cmd = sub.add_parser("sync", help="Show what changed since a change number (sync feed)")
+    sync_cmd.add_argument("--since", type=int, default=0, metavar="SEQ",
+                          help="Cursor from the previous sync (default 0: everything)")
+    sync_cmd.add_argument("--limit", type=int, default=storage.CHANGES_PAGE,
+                          help=f"Changes per page (default {storage.CHANGES_PAGE})")
+    sync_cmd.add_argument("--json", action="store_true",
+                          help="Print the delta as JSON, as a client would receive it")
+    sync_cmd.add_argument("--compact", action="store_true",
+                          help="First compact the change log (one row per entry, "
+                               f"deletions kept {storage.TOMBSTONE_DAYS} days)")
+
+    serve_cmd = sub.add_parser("serve", help="Serve the HTTP API (needs aiohttp)")
+    serve_cmd.add_argument("--host", default="127.0.0.1", help="Interface (default 127.0.0.1)")
+    serve_cmd.add_argument("--port", type=int, default=8080, help="Port (default 8080)")
+    serve_cmd.add_argument("--workers", type=int, default=1,
+                           help="Server processes sharing the port (default 1)")
+    serve_cmd.add_argument("--db-threads", type=int, default=4,
+                           help="SQLite connections per process (default 4)")
+    serve_cmd.add_argument("--no-analyze", action="store_true",
+                           help="Only queue analysis; leave it to a separate 'worker'")
+    serve_cmd.add_argument("--provider", metavar="{local,openai}",
+                           help="Analysis backend (default: $JOURNAL_AI_PROVIDER or openai)")
+    serve_cmd.add_argument("--concurrency", type=int, default=4,
+                           help="Parallel API requests for analysis (default 4)")
+    serve_cmd.add_argument("--rps", type=float, default=None,
+                           help="Max API requests per second for analysis")
 
     voice_cmd = sub.add_parser("voice", help="Record audio and transcribe into a new entry")
     voice_cmd.add_argument("--duration", type=int, default=30,
                            help="Recording length in seconds (default 30)")
+    voice_cmd.add_argument("--stream", action="store_true",
+                           help="Transcribe pause-separated segments while still recording")
+    voice_cmd.add_argument("--from-wav", metavar="FILE",
+                           help="Feed a WAV file through the streaming pipeline instead of the mic")
 
     args = parser.parse_args()
+    if not (args.profile or args.trace):
+        return run(args, parser)
+
+    import time
+    from journal import trace
+
+    trace.enable()
+    started = time.perf_counter()
+    try:
+        run(args, parser)
+    finally:
+        wall = time.perf_counter() - started
+        trace.disable()
+        if args.profile:
+            trace.print_summary(wall)
+        if args.trace:
+            print(f"[green]Trace written to {trace.write_chrome_trace(args.trace)}[/green]")
+
 
+def run(args, parser):
+    if args.journal:
+        from journal import shards
+
+        try:
+            shards.use(args.journal)
+        except ValueError as exc:
+            parser.error(str(exc))
     if args.command == "write":
         storage.add_entry(" ".join(args.text))
-        print("[green]Entry saved.[/green]")
+        builtins.print("Entry saved.")
     elif args.command == "list":
-        for i, e in enumerate(storage.list_entries(), 1):
+        for i, e in enumerate(storage.query_entries(), 1):
             line = f"{i}. {e['timestamp']}\n   {e['text']}"
             if e.get("summary"):
                 line += f"\n   → {e['summary']} (mood {e['mood']}/10)"
-            print(line + "\n")
+            builtins.print(line + "\n")
     elif args.command == "analyze":
-        entries = storage.list_entries()
-        pending = [e for e in entries if e.get("summary") is None]
+        from journal import ai, batch
+
+        if args.provider:
+            try:
+                ai.set_provider(args.provider)
+            except ValueError as exc:
+                parser.error(str(exc))
+        if args.all_journals:
+            from journal import shards
+
+            reports = shards.analyse(args.provider, concurrency=args.concurrency, rps=args.rps,
+                                     batch_size=args.batch_size)
+            for name, report in reports.items():
+                failed = f", {report.failed} failed" if report.failed else ""
+                print(f"  {name}: {report.analysed} analysed in {report.seconds:.1f}s{failed}")
+            print(f"[green]{sum(r.analysed for r in reports.values())} entries analysed "
+                  f"across {len(reports)} journals[/green]")
+            return
+        pending = list(storage.query_entries(unanalyzed=True, columns=["id", "text"]))
         if not pending:
             print("No unanalyzed entries.")
             return
 
-        for entry in pending:
-            print(f"Analyzing entry {entry['id']} …", end=" ", flush=True)
-            summary, mood = ai.analyse(entry["text"])
-            storage.update_entry(entry["id"], summary, mood)
-            print("done.")
+        def progress(done, total):
+            print(f"Analyzing… {done}/{total}", end="\r", flush=True)
+
+        report = batch.analyse_entries(
+            pending, concurrency=args.concurrency, rps=args.rps,
+            batch_size=args.batch_size, progress=progress,
+        )
+        print()  # end the progress line
+        print(f"[green]{report.analysed} entries analysed in {report.seconds:.1f}s "
+              f"({report.rate:.1f} entries/sec)[/green]")
+        if report.failed:
+            print(f"[yellow]{report.failed} entries failed; re-run 'analyze' to retry.[/yellow]")
+    elif args.command == "reanalyze":
+        from journal import ai, reanalyze
+
+        if args.provider:
+            try:
+                ai.set_provider(args.provider)
+            except ValueError as exc:
+                parser.error(str(exc))
+        plan = reanalyze.plan(include_unknown=args.include_unknown, concurrency=args.concurrency,
+                              rps=args.rps, batch_size=args.batch_size)
+        print(f"Analyser: {plan.provider} ({plan.model}, version {plan.version})")
+        print(f"Stale entries: {plan.entries}  "
+              f"(text changed: {plan.changed_text}, other analyser: {plan.other_analyser}, "
+              f"fell back: {plan.fallback})")
+        if plan.unknown and not args.include_unknown:
+            print(f"[yellow]{plan.unknown} entries have no recorded analyser; "
+                  f"add --include-unknown to redo them too.[/yellow]")
+        if not plan.entries:
+            return
+        print(f"Estimate: {plan.requests} requests, ~{plan.prompt_tokens:,} prompt + "
+              f"~{plan.reply_tokens:,} reply tokens, ~${plan.cost:.2f}, ~{plan.seconds:.0f}s")
+        if args.dry_run:
+            return
+
+        def progress(done, total):
+            print(f"Re-analysing… {done}/{total}", end="\r", flush=True)
+
+        try:
+            report = reanalyze.run(plan, concurrency=args.concurrency, rps=args.rps,
+                                   batch_size=args.batch_size, progress=progress)
+        except KeyboardInterrupt:
+            print("\n[yellow]Interrupted; finished pages are saved. "
+                  "Re-run to continue.[/yellow]")
+            return
+        if report.analysed + report.failed:  # progress() ran; end its line
+            print()
+        print(f"[green]{report.analysed} entries re-analysed in {report.seconds:.1f}s[/green]")
+        if report.failed:
+            print(f"[yellow]{report.failed} entries failed; they stay stale for the next run."
+                  "[/yellow]")
+    elif args.command == "worker":
+        from journal import ai, jobs, worker
+
+        if args.provider:
+            try:
+                ai.set_provider(args.provider)
+            except ValueError as exc:
+                parser.error(str(exc))
+        if args.enqueue_missing:
+            print(f"Queued {jobs.enqueue_unanalyzed()} unanalysed entries.")
+        if args.retry_dead:
+            print(f"Re-queued {jobs.retry_dead()} dead jobs.")
+        print(f"Worker started (concurrency {args.concurrency}); Ctrl+C to stop.")
+        try:
+            report = worker.run_worker(
+                concurrency=args.concurrency, poll=args.poll, once=args.once,
+                rps=args.rps, log=lambda msg: print(msg, end="\r", flush=True),
+            )
+        except KeyboardInterrupt:
+            print("\n[yellow]Worker stopped.[/yellow]")
+            return
+        print(f"\n[green]{report.done} jobs done in {report.seconds:.1f}s[/green]")
+        if report.dead:
+            print(f"[yellow]{report.dead} jobs dead-lettered; "
+                  f"'worker --retry-dead' to try again.[/yellow]")
     elif args.command == "stats":
-        data = storage.list_entries()
-        moods = [e["mood"] for e in data if e.get("mood") is not None]
-        if not moods:
+        from journal import utils
+
+        if args.all_journals:
+            from journal import shards
+
+            merged = shards.stats(args.by or "day")
+            if not merged["journals"]:
+                print("No journals yet.")
+                return
+            print(f"Journals: {merged['journals']}")
+            c, q, totals = merged["cache"], merged["jobs"], merged["totals"]
+            periods = merged["periods"]
+        else:
+            from journal import cache, jobs
+
+            c, q, totals = cache.stats(), jobs.status_counts(), storage.mood_totals()
+            periods = storage.mood_rollup(args.by or "day")
+        lookups = c["hits"] + c["misses"]
+        hit_rate = f"{c['hits'] / lookups:.0%}" if lookups else "n/a"
+        print(f"Analysis cache: {c['entries']} results  "
+              f"Hits: {c['hits']}  Misses: {c['misses']}  Hit rate: {hit_rate}")
+        print(f"Analysis queue: {q['queued']} queued  {q['running']} running  "
+              f"{q['dead']} dead")
+
+        if not totals["moods"]:
             print("No mood data yet. Run 'analyze' first.")
             return
 
-        avg = sum(moods) / len(moods)
-        best = max(moods)
-        worst = min(moods)
-        print(f"Entries: {len(data)}  Avg mood: {avg:.2f}  "
-              f"Best: {best}  Worst: {worst}")
+        print(f"Entries: {totals['entries']}  Avg mood: {totals['avg']:.2f}  "
+              f"Best: {totals['best']}  Worst: {totals['worst']}")
+
+        periods = [p for p in periods if p["avg"] is not None]
+        if args.by:
+            for p in periods:
+                print(f"  {p['period']}  {p['entries']:>5} entries  avg {p['avg']:.2f}  "
+                      f"min {p['min']}  max {p['max']}")
 
         # Trend sparkline
-        print("Trend:", utils.sparkline(moods)) 
+        print("Trend:", utils.sparkline([p["avg"] for p in periods]))
+    elif args.command == "search":
+        from rich.markup import escape
+
+        if args.all_journals:
+            from journal import shards
+
+            hits = shards.search(" ".join(args.query), limit=args.limit)
+        else:
+            hits = storage.search(" ".join(args.query), limit=args.limit)
+        if not hits:
+            print("No matching entries.")
+            return
+        start, end = storage.SNIPPET_MARK
+        for hit in hits:
+            snippet = escape(hit["snippet"]).replace(start, "[bold yellow]").replace(end, "[/bold yellow]")
+            mood = f" (mood {hit['mood']}/10)" if hit["mood"] is not None else ""
+            where = f"{hit['journal']} " if "journal" in hit else ""
+            print(f"{where}#{hit['id']} {hit['timestamp']}{mood}\n   {snippet}\n")
+    elif args.command == "similar":
+        from journal import embed
+
+        if args.embedder:
+            try:
+                embed.set_embedder(args.embedder)
+            except ValueError as exc:
+                parser.error(str(exc))
+        if storage.get_entry(args.id) is None:
+            print(f"[red]No entry with id {args.id}.[/red]")
+            return
+        pending = embed.pending_count()
+        if pending:
+            embed.refresh(progress=lambda done, total: print(
+                f"Embedding… {done}/{total}", end="\r", flush=True))
+            print()
+        hits = embed.similar(args.id, k=args.limit, index=embed.build_index(args.index))
+        if not hits:
+            print("No other entries to compare with.")
+            return
+        for hit in hits:
+            text = hit["text"] if len(hit["text"]) <= 160 else hit["text"][:157] + "…"
+            print(f"#{hit['id']} {hit['timestamp']}  similarity {hit['score']:.2f}\n   {text}\n")
+    elif args.command == "export" and args.all_journals:
+        from journal import shards
+
+        if args.pdf:
+            parser.error("--pdf exports one journal at a time; drop --all-journals or --pdf")
+        options = {"start": args.start, "end": args.end, "since_last": args.since_last}
+        if args.format != "md":
+            options["compression"] = None if args.compression == "none" else args.compression
+        try:
+            paths = shards.export(args.file, args.format, **options)
+        except Exception as exc:  # pyarrow missing, unknown codec, …
+            print(f"[red]Export failed: {exc}[/red]")
+            return
+        for name, path in paths.items():
+            print(f"  {name}: {path}")
+        print(f"[green]{len(paths)} journals exported[/green]")
+    elif args.command == "export" and args.format != "md":
+        from journal import snapshot
+
+        try:
+            path = snapshot.export_snapshot(
+                args.file, args.format, start=args.start, end=args.end, since_last=args.since_last,
+                compression=None if args.compression == "none" else args.compression,
+            )
+            print(f"[green]{args.format.capitalize()} snapshot exported to {path}[/green]")
+        except Exception as exc:  # pyarrow missing, unknown codec, …
+            print(f"[red]Snapshot export failed: {exc}[/red]")
     elif args.command == "export":
+        from journal import export
+
         # Determine Markdown path
         base = Path(args.file).expanduser()
         md_path = base.with_suffix(".md") if base.suffix.lower() != ".md" else base
 
-        md_path = export.export_markdown(md_path)
+        md_path = export.export_markdown(
+            md_path, start=args.start, end=args.end, since_last=args.since_last
+        )
         print(f"[green]Markdown exported to {md_path}[/green]")
 
         if args.pdf:
             try:
-                pdf_path = export.export_pdf(md_path.with_suffix(".pdf"), md_path)
+                pdf_path = export.export_pdf(md_path.with_suffix(".pdf"), md_path,
+                                            workers=args.workers)
                 print(f"[green]PDF exported to {pdf_path}[/green]")
             except Exception as exc:
                 print(f"[red]PDF export failed: {exc}[/red]")
     elif args.command == "import":
+        from journal import import_md, snapshot
+
         try:
-            added = import_md.import_markdown(args.file)
-            print(f"[green]{added} new entries imported[/green]")
+            if snapshot.format_for(args.file):
+                def progress(r):
+                    print(f"Read {r.read} entries ({r.rate:.0f}/sec)…", end="\r", flush=True)
+
+                report = snapshot.import_snapshot(args.file, dry_run=args.dry_run,
+                                                  progress=progress)
+                read, ran = f"{report.read} read", report.read
+            else:
+                def progress(r):
+                    print(f"Parsed {r.parsed} entries ({r.rate:.0f}/sec)…", end="\r", flush=True)
+
+                report = import_md.import_markdown(args.file, dry_run=args.dry_run,
+                                                   progress=progress)
+                read, ran = f"{report.parsed} parsed", report.parsed
+            if ran:  # progress() ran; end its line
+                print()
+            verb = "would be imported" if args.dry_run else "imported"
+            print(f"[green]{report.added} new entries {verb} "
+                  f"({read} in {report.seconds:.2f}s, "
+                  f"{report.rate:.0f} entries/sec)[/green]")
+            if getattr(report, "renumbered", 0):
+                verb = "would get" if args.dry_run else "got"
+                print(f"[yellow]{report.renumbered} entries {verb} new ids "
+                      "(theirs belong to other entries here)[/yellow]")
         except Exception as exc:
-            print(f"[red]Import failed: {exc}[/red]")
+            print(f"\n[red]Import failed: {exc}[/red]")
+    elif args.command == "migrate":
+        from journal import db
+
+        conn = db.connect()  # applies pending migrations
+        print(f"Schema version {db.schema_version(conn)} (latest {db.SCHEMA_VERSION})")
+        for version, name, applied_at in conn.execute(
+                f"SELECT version, name, datetime(applied_at, 'unixepoch', 'localtime') "
+                f"FROM {db.VERSION_TABLE} ORDER BY version DESC LIMIT 3"):
+            print(f"  {version:3}  {name}  (applied {applied_at})")
+        if args.legacy_json is not None:
+            from journal import legacy
+
+            path = Path(args.legacy_json or legacy.LEGACY_PATH).expanduser()
+            if not path.exists():
+                print(f"[yellow]{path} not found; nothing to import.[/yellow]")
+                return
+
+            def progress(r):
+                print(f"Read {r.resumed_from + r.read} entries ({r.rate:.0f}/sec)…",
+                      end="\r", flush=True)
+
+            try:
+                report = legacy.import_legacy(path, progress=progress)
+            except ValueError as exc:
+                print(f"\n[red]Migration failed: {exc}[/red]")
+                return
+            if report.read > report.invalid:  # progress() ran; end its line
+                print()
+            resumed = f", resumed after {report.resumed_from}" if report.resumed_from else ""
+            print(f"[green]{report.added} entries imported from {path} "
+                  f"({report.read} read in {report.seconds:.2f}s{resumed}; "
+                  f"{report.invalid} invalid skipped)[/green]")
+    elif args.command == "ingest":
+        from journal import ingest
+
+        if args.provider:
+            from journal import ai
+
+            try:
+                ai.set_provider(args.provider)
+            except ValueError as exc:
+                parser.error(str(exc))
+
+        def progress(r):
+            print(f"Read {r.read} records, {r.added} new ({r.rate:.0f}/sec)…", end="\r", flush=True)
+
+        try:
+            report = ingest.ingest(args.files, fmt=args.format, batch_size=args.batch_size,
+                                   analyse=args.analyze, concurrency=args.concurrency,
+                                   rps=args.rps, progress=progress)
+        except (OSError, ValueError) as exc:
+            print(f"\n[red]Ingest failed: {exc}[/red]")
+            return
+        if report.read > report.invalid:  # progress() ran; end its line
+            print()
+        print(f"[green]{report.added} new entries ingested "
+              f"({report.read} read in {report.seconds:.2f}s, {report.rate:.0f} records/sec; "
+              f"{report.skipped} already present)[/green]")
+        if args.analyze:
+            print(f"[green]{report.analysed} entries analysed.[/green]")
+        if report.invalid:
+            print(f"[yellow]{report.invalid} invalid records skipped:[/yellow]")
+            for error in report.errors:
+                print(f"  {error}")
+            if report.invalid > len(report.errors):
+                print(f"  … and {report.invalid - len(report.errors)} more")
+    elif args.command == "journals":
+        from journal import shards
+
+        if args.add:
+            try:
+                print(f"[green]Journal {args.add} at {shards.register(args.add)}[/green]")
+            except ValueError as exc:
+                parser.error(str(exc))
+        names = shards.journals()
+        if not names:
+            print("No journals yet.")
+        for name, path in names.items():
+            marker = "*" if name == shards.current() else " "
+            print(f"{marker} {name:20} {path.stat().st_size / 1e6:8.1f} MB  {path}")
+    elif args.command == "sync":
+        if args.compact:
+            print(f"Compacted the change log: {storage.compact_changes()} rows removed.")
+        delta = storage.changes_since(args.since, args.limit)
+        if args.json:
+            import json
+            import sys
+
+            sys.stdout.write(json.dumps(delta, ensure_ascii=False) + "\n")
+            return
+        from rich.markup import escape
+
+        if delta["reset"]:
+            print(f"[yellow]Deletions since change {args.since} were compacted away: "
+                  "drop the local copy and apply these changes from 0.[/yellow]")
+        for change in delta["changes"]:
+            if change["op"] == "delete":
+                print(f"{change['seq']:>8}  [red]delete[/red]  #{change['id']}")
+            else:
+                preview = escape(change["text"][:60].replace("\n", " "))
+                print(f"{change['seq']:>8}  [green]upsert[/green]  #{change['id']}  "
+                      f"{change['timestamp'][:16]}  {preview}")
+        more = " (more pending)" if delta["more"] else ""
+        print(f"{len(delta['changes'])} changes; next: --since {delta['seq']}{more}")
+    elif args.command == "serve":
+        from journal import ai, shards
+
+        if args.provider:
+            try:
+                ai.set_provider(args.provider)
+            except ValueError as exc:
+                parser.error(str(exc))
+        try:
+            from journal import api
+        except ImportError as exc:
+            print(f"[red]{exc}; install it with 'pip install aiohttp'.[/red]")
+            return
+        print(f"Serving journal {shards.current()} on http://{args.host}:{args.port} "
+              f"({args.workers} process(es)); Ctrl+C to stop.")
+        try:
+            api.serve(args.host, args.port, workers=args.workers, db_threads=args.db_threads,
+                      analyse=not args.no_analyze, provider=args.provider,
+                      concurrency=args.concurrency, rps=args.rps)
+        except KeyboardInterrupt:
+            pass
+        print("[yellow]Server stopped.[/yellow]")
     elif args.command == "voice":
-        text = voice.record_and_transcribe(args.duration)
+        from journal import voice
+
+        if args.from_wav:
+            rate, blocks = voice.wav_blocks(args.from_wav)
+            text = voice.transcribe_stream(blocks, sample_rate=rate)
+        else:
+            text = voice.record_and_transcribe(args.duration, stream=args.stream)
         if not text.strip():
             print("[yellow]No speech detected; entry not saved.[/yellow]")
         else:
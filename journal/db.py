@@ -1,24 +1,401 @@
 """
 journal.db – central place for the SQLite connection.
+
+connect() returns a plain sqlite3 connection to the journal in DB_PATH
+with the schema in place, in WAL mode (see PRAGMAS). The schema is
+versioned: MIGRATIONS lists every change in order and migrate() applies
+the ones a journal's `schema_version` table doesn't record yet.
+It deliberately avoids sqlite-utils, which imports pandas/numpy when they
+are installed and would add half a second to every CLI command.
+get_db() wraps a connection in sqlite_utils.Database for code that
+wants that API.
 """
 from pathlib import Path
-import sqlite_utils
+import os
+import re
+import sqlite3
+import warnings
+
+# One SQLite file per journal. "default" is the original single-journal
+# file; others live in JOURNALS_DIR (see journal.shards for the catalog).
+# JOURNAL_NAME picks the journal a process works on.
+DEFAULT_JOURNAL = "default"
+JOURNALS_DIR = Path.home() / ".ai_chat_journals"
+JOURNAL_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
 
-DB_PATH = Path.home() / ".ai_chat_journal.db"
+def journal_path(name: str) -> Path:
+    """Database file for the journal called `name`."""
+    if name == DEFAULT_JOURNAL:
+        return Path.home() / ".ai_chat_journal.db"
+    if not JOURNAL_NAME_RE.match(name):
+        raise ValueError(f"Invalid journal name {name!r}: use letters, digits, '.', '_' or '-'")
+    return JOURNALS_DIR / f"{name}.db"
+
+
+DB_PATH = journal_path(os.environ.get("JOURNAL_NAME") or DEFAULT_JOURNAL)
 TABLE = "entries"
+CACHE_TABLE = "analysis_cache"
+META_TABLE = "meta"
+ROLLUP_TABLE = "mood_daily"
+JOBS_TABLE = "jobs"
+EMBED_TABLE = "embeddings"
+VERSION_TABLE = "schema_version"
+CHANGES_TABLE = "changes"
+
+# Re-aggregate one or all days of entries into the rollup table.
+# Day = the local date prefix of the ISO timestamp.
+ROLLUP_SQL = f"""
+    INSERT OR REPLACE INTO {ROLLUP_TABLE} (day, entries, moods, mood_sum, mood_min, mood_max)
+    SELECT substr(timestamp, 1, 10), count(*), count(mood),
+           coalesce(sum(mood), 0), min(mood), max(mood)
+    FROM {TABLE}
+"""
+
+# Applied to every connection. WAL lets readers (dashboard, exports) run
+# alongside a writer, and synchronous=NORMAL syncs at checkpoints rather
+# than on every commit: a power cut can lose the last few commits, but
+# never corrupts the file. Writers wait up to BUSY_TIMEOUT_MS for the
+# lock instead of failing with "database is locked".
+BUSY_TIMEOUT_MS = 10_000
+MMAP_SIZE = 256 * 1024 * 1024
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+)
+
+# Unix time with sub-second precision, as SQL.
+NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+
+# `updated_at` is stamped by trigger on every content change, so readers
+# can fetch "rows with id > X or updated_at > T" instead of the whole
+# table (see journal.frames). Rows never edited keep NULL. The FTS
+# update trigger is narrowed to the indexed columns so the stamp itself
+# doesn't reindex the row.
+UPDATED_AT_DDL = f"""
+    ALTER TABLE "{TABLE}" ADD COLUMN "updated_at" REAL;
+    CREATE INDEX "idx_{TABLE}_updated_at" ON "{TABLE}" ("updated_at");
+    CREATE TRIGGER "{TABLE}_touch" AFTER UPDATE OF "text", "summary", "mood" ON "{TABLE}" BEGIN
+      UPDATE "{TABLE}" SET "updated_at" = {NOW_SQL} WHERE id = new.id;
+    END;
+    DROP TRIGGER IF EXISTS "{TABLE}_au";
+    CREATE TRIGGER "{TABLE}_au" AFTER UPDATE OF "text", "summary" ON "{TABLE}" BEGIN
+      INSERT INTO "{TABLE}_fts" ("{TABLE}_fts", rowid, "text", "summary")
+      VALUES('delete', old.rowid, old."text", old."summary");
+      INSERT INTO "{TABLE}_fts" (rowid, "text", "summary")
+      VALUES (new.rowid, new."text", new."summary");
+    END;
+"""
 
-def get_db() -> sqlite_utils.Database:
-    db = sqlite_utils.Database(DB_PATH)
-    if TABLE not in db.table_names():
-        db[TABLE].create(
-            {
-                "id": int,
-                "timestamp": str,
-                "text": str,
-                "summary": str,
-                "mood": int,
-            },
-            pk="id",
-            not_null={"timestamp", "text"},
+# Provenance of each summary/mood: the analyser's model and version
+# (Provider.version(), a hash of model + prompts + temperature), when it
+# ran and a hash of the text it saw. `journal reanalyze --stale` compares
+# them with the current analyser and text. Rows analysed before these
+# columns existed keep NULLs ("unknown").
+ANALYSIS_DDL = f"""
+    ALTER TABLE "{TABLE}" ADD COLUMN "analysis_model" TEXT;
+    ALTER TABLE "{TABLE}" ADD COLUMN "analysis_version" TEXT;
+    ALTER TABLE "{TABLE}" ADD COLUMN "analysed_at" REAL;
+    ALTER TABLE "{TABLE}" ADD COLUMN "text_hash" TEXT;
+"""
+
+# Same DDL sqlite-utils generated for earlier versions of this file, so
+# existing journals are recognised as up to date.
+SCHEMA = {
+    TABLE: f"""
+        CREATE TABLE "{TABLE}" (
+           "id" INTEGER PRIMARY KEY,
+           "timestamp" TEXT NOT NULL,
+           "text" TEXT NOT NULL,
+           "summary" TEXT,
+           "mood" INTEGER
         )
-    return db
\ No newline at end of file
+    """,
+    # FTS5 index over text + summary, kept in sync by triggers.
+    f"{TABLE}_fts": f"""
+        CREATE VIRTUAL TABLE "{TABLE}_fts" USING FTS5 (
+            "text", "summary",
+            content="{TABLE}"
+        );
+        CREATE TRIGGER "{TABLE}_ai" AFTER INSERT ON "{TABLE}" BEGIN
+          INSERT INTO "{TABLE}_fts" (rowid, "text", "summary")
+          VALUES (new.rowid, new."text", new."summary");
+        END;
+        CREATE TRIGGER "{TABLE}_ad" AFTER DELETE ON "{TABLE}" BEGIN
+          INSERT INTO "{TABLE}_fts" ("{TABLE}_fts", rowid, "text", "summary")
+          VALUES('delete', old.rowid, old."text", old."summary");
+        END;
+        CREATE TRIGGER "{TABLE}_au" AFTER UPDATE OF "text", "summary" ON "{TABLE}" BEGIN
+          INSERT INTO "{TABLE}_fts" ("{TABLE}_fts", rowid, "text", "summary")
+          VALUES('delete', old.rowid, old."text", old."summary");
+          INSERT INTO "{TABLE}_fts" (rowid, "text", "summary")
+          VALUES (new.rowid, new."text", new."summary");
+        END;
+        INSERT INTO "{TABLE}_fts" ("{TABLE}_fts") VALUES ('rebuild');
+    """,
+    # key = sha256(version, text); version = fingerprint of the analyser,
+    # so a prompt/model change can drop old rows
+    CACHE_TABLE: f"""
+        CREATE TABLE "{CACHE_TABLE}" (
+           "key" TEXT PRIMARY KEY,
+           "version" TEXT,
+           "summary" TEXT,
+           "mood" INTEGER,
+           "created_at" REAL,
+           "last_used" REAL
+        );
+        CREATE INDEX "idx_{CACHE_TABLE}_last_used" ON "{CACHE_TABLE}" ("last_used");
+    """,
+    ROLLUP_TABLE: f"""
+        CREATE TABLE "{ROLLUP_TABLE}" (
+           "day" TEXT PRIMARY KEY,
+           "entries" INTEGER,
+           "moods" INTEGER,
+           "mood_sum" INTEGER,
+           "mood_min" INTEGER,
+           "mood_max" INTEGER
+        );
+        {ROLLUP_SQL} GROUP BY substr(timestamp, 1, 10);
+    """,
+    # Durable analysis queue (see journal.jobs). At most one *queued* job
+    # per entry; a running job can coexist with a newer queued one.
+    JOBS_TABLE: f"""
+        CREATE TABLE "{JOBS_TABLE}" (
+           "id" INTEGER PRIMARY KEY,
+           "entry_id" INTEGER NOT NULL,
+           "status" TEXT NOT NULL DEFAULT 'queued',
+           "attempts" INTEGER NOT NULL DEFAULT 0,
+           "last_error" TEXT,
+           "run_after" REAL NOT NULL DEFAULT 0,
+           "created_at" REAL,
+           "updated_at" REAL
+        );
+        CREATE UNIQUE INDEX "idx_{JOBS_TABLE}_queued_entry"
+            ON "{JOBS_TABLE}" ("entry_id") WHERE status = 'queued';
+        CREATE INDEX "idx_{JOBS_TABLE}_status" ON "{JOBS_TABLE}" ("status", "run_after");
+    """,
+    # One float32 vector per entry (see journal.embed). `model` is the
+    # embedder version; editing or deleting an entry drops its vector so
+    # the next refresh re-embeds just that row.
+    EMBED_TABLE: f"""
+        CREATE TABLE "{EMBED_TABLE}" (
+           "entry_id" INTEGER PRIMARY KEY,
+           "model" TEXT NOT NULL,
+           "vector" BLOB NOT NULL
+        );
+        CREATE TRIGGER "{TABLE}_embed_au" AFTER UPDATE OF "text" ON "{TABLE}" BEGIN
+          DELETE FROM "{EMBED_TABLE}" WHERE entry_id = old.id;
+        END;
+        CREATE TRIGGER "{TABLE}_embed_ad" AFTER DELETE ON "{TABLE}" BEGIN
+          DELETE FROM "{EMBED_TABLE}" WHERE entry_id = old.id;
+        END;
+    """,
+    # Change feed for client sync (see storage.changes_since): one row per
+    # insert, edit or delete of an entry, numbered by `seq`. AUTOINCREMENT
+    # means a seq is never reused, even after compaction deletes the
+    # newest rows. Edits that leave the synced columns as they were (an
+    # unchanged re-analysis, the updated_at stamp) aren't logged.
+    # Existing entries are logged as inserts, so a client starting from
+    # 0 receives the whole journal through the same feed.
+    CHANGES_TABLE: f"""
+        CREATE TABLE "{CHANGES_TABLE}" (
+           "seq" INTEGER PRIMARY KEY AUTOINCREMENT,
+           "entry_id" INTEGER NOT NULL,
+           "op" TEXT NOT NULL,
+           "changed_at" REAL NOT NULL
+        );
+        CREATE TRIGGER "{TABLE}_log_ai" AFTER INSERT ON "{TABLE}" BEGIN
+          INSERT INTO "{CHANGES_TABLE}" (entry_id, op, changed_at)
+          VALUES (new.id, 'insert', {NOW_SQL});
+        END;
+        CREATE TRIGGER "{TABLE}_log_au" AFTER UPDATE OF "timestamp", "text", "summary", "mood"
+        ON "{TABLE}" WHEN old."timestamp" IS NOT new."timestamp" OR old."text" IS NOT new."text"
+          OR old."summary" IS NOT new."summary" OR old."mood" IS NOT new."mood" BEGIN
+          INSERT INTO "{CHANGES_TABLE}" (entry_id, op, changed_at)
+          VALUES (new.id, 'update', {NOW_SQL});
+        END;
+        CREATE TRIGGER "{TABLE}_log_ad" AFTER DELETE ON "{TABLE}" BEGIN
+          INSERT INTO "{CHANGES_TABLE}" (entry_id, op, changed_at)
+          VALUES (old.id, 'delete', {NOW_SQL});
+        END;
+        INSERT INTO "{CHANGES_TABLE}" (entry_id, op, changed_at)
+        SELECT id, 'insert', {NOW_SQL} FROM "{TABLE}" ORDER BY id;
+    """,
+    META_TABLE: f"""
+        CREATE TABLE "{META_TABLE}" (
+           "key" TEXT PRIMARY KEY,
+           "value" TEXT
+        );
+    """,
+}
+
+
+def _script(conn: sqlite3.Connection, sql: str) -> None:
+    """
+    Run a multi-statement script one statement at a time. Unlike
+    executescript() this doesn't COMMIT first, so it stays inside the
+    migration's transaction.
+    """
+    statement = ""
+    for piece in sql.split(";"):
+        statement += piece + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+                conn.execute(statement)
+            statement = ""
+
+
+def _table_names(conn: sqlite3.Connection) -> set[str]:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _columns(conn: sqlite3.Connection) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE})")}
+
+
+def _create(name: str):
+    """Migration creating SCHEMA[name], a no-op if an older release already did."""
+    def migrate(conn: sqlite3.Connection) -> None:
+        if name not in _table_names(conn):
+            _script(conn, SCHEMA[name])
+    return migrate
+
+
+def _timestamp_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Timestamps are the natural key for Markdown round-trips, so index
+    them UNIQUE: imports can then dedupe with INSERT OR IGNORE. Exact
+    duplicate rows left by older importers are dropped first; if rows
+    with the same timestamp but different text remain, fall back to a
+    plain index rather than guess which one to delete.
+    """
+    # Small partial index that makes "what still needs analysis?" cheap
+    # no matter how big the journal is.
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_unanalyzed "
+        f"ON {TABLE}(id) WHERE summary IS NULL"
+    )
+    name = f"idx_{TABLE}_timestamp"
+    unique = {row[1]: row[2] for row in conn.execute(f"PRAGMA index_list({TABLE})")}
+    if unique.get(name):
+        return
+    removed = conn.execute(
+        f"DELETE FROM {TABLE} WHERE id NOT IN ("
+        f"  SELECT min(id) FROM {TABLE}"
+        f"  GROUP BY timestamp, text, summary, mood)"
+    ).rowcount
+    if removed and ROLLUP_TABLE in _table_names(conn):
+        conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+        conn.execute(ROLLUP_SQL + " GROUP BY substr(timestamp, 1, 10)")
+    clash = conn.execute(
+        f"SELECT 1 FROM {TABLE} GROUP BY timestamp HAVING count(*) > 1 LIMIT 1"
+    ).fetchone()
+    if clash:
+        warnings.warn("entries share timestamps with different text; "
+                      "timestamp index left non-unique")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE}(timestamp)")
+        return
+    conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute(f"CREATE UNIQUE INDEX {name} ON {TABLE}(timestamp)")
+
+
+def _add_updated_at(conn: sqlite3.Connection) -> None:
+    if "updated_at" not in _columns(conn):
+        _script(conn, UPDATED_AT_DDL)
+
+
+def _add_analysis_columns(conn: sqlite3.Connection) -> None:
+    if "text_hash" not in _columns(conn):
+        _script(conn, ANALYSIS_DDL)
+
+
+# Ordered schema migrations: (version, name, migrate(conn)). Append new
+# ones at the end with the next number; never renumber or edit applied
+# ones. Each must cope with journals created before versioning existed
+# (where its change may already be in place), because such a journal
+# starts at version 0 and runs them all.
+MIGRATIONS = [
+    (1, "entries table", _create(TABLE)),
+    (2, "timestamp and unanalysed indexes", _timestamp_indexes),
+    (3, "full-text index", _create(f"{TABLE}_fts")),
+    (4, "analysis cache", _create(CACHE_TABLE)),
+    (5, "daily mood rollup", _create(ROLLUP_TABLE)),
+    (6, "analysis job queue", _create(JOBS_TABLE)),
+    (7, "embeddings", _create(EMBED_TABLE)),
+    (8, "meta table", _create(META_TABLE)),
+    (9, "entries.updated_at", _add_updated_at),
+    (10, "analysis provenance columns", _add_analysis_columns),
+    (11, "change log", _create(CHANGES_TABLE)),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute(f"SELECT coalesce(max(version), 0) FROM {VERSION_TABLE}").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> list[str]:
+    """
+    Apply pending migrations in order, all in one write transaction
+    (so concurrent processes can't both apply one, and a failure leaves
+    the schema untouched). Returns the names of those applied.
+    """
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} "
+        "(version INTEGER PRIMARY KEY, name TEXT, applied_at REAL)"
+    )
+    if schema_version(conn) >= SCHEMA_VERSION:  # the usual case: one query
+        return []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = schema_version(conn)  # another process may have just migrated
+        applied = []
+        for version, name, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            migration(conn)
+            conn.execute(f"INSERT INTO {VERSION_TABLE} VALUES (?, ?, {NOW_SQL})",
+                         [version, name])
+            applied.append(name)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return applied
+
+
+def text_hash(text: str | None) -> str | None:
+    """Short content hash of an entry's text (also SQL function text_hash())."""
+    import hashlib  # here, not at the top: `journal write` never needs it
+
+    if text is None:
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def connect(path: str | Path | None = None) -> sqlite3.Connection:
+    """
+    Open the journal (creating or upgrading its schema as needed).
+    Rows come back as sqlite3.Row: index them by position or name.
+    """
+    conn = sqlite3.connect(str(path or DB_PATH), timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.create_function("text_hash", 1, text_hash, deterministic=True)
+    migrate(conn)
+    return conn
+
+
+def get_db():
+    """
+    The journal, migrated to the current schema, as a
+    sqlite_utils.Database (imports sqlite-utils lazily).
+    """
+    import sqlite_utils
+
+    conn = connect()
+    conn.row_factory = None
+    return sqlite_utils.Database(conn)
@@ -0,0 +1,350 @@
+"""
+journal.embed
+-------------
+Entry embeddings and "similar entries" search.
+
+Each entry gets one L2-normalised float32 vector, stored as a blob in
+the `embeddings` table and tagged with the embedder version. Editing an
+entry drops its vector (trigger in journal.db), so refresh() only ever
+embeds new, edited or out-of-date rows. Embedders are pluggable like
+journal.ai providers: a deterministic feature-hashing embedder that runs
+offline (default) or the OpenAI embeddings API.
+
+Search is brute-force cosine similarity over the whole matrix, which is
+a few milliseconds even at 100k entries. For very large journals
+IVFIndex clusters the vectors and keeps them int8-quantised (4x less
+memory), scanning only the closest clusters per query.
+"""
+import importlib
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Iterable
+
+import numpy as np
+
+from journal import trace
+from journal.ai_local import WORD_RE, STOPWORDS
+from journal.db import connect, TABLE, EMBED_TABLE, META_TABLE
+
+IVF_MIN_ENTRIES = 200_000  # build_index("auto") switches to IVF from here
+REFRESH_BATCH = 500
+GENERATION_KEY = "embeddings_generation"  # bumped whenever vectors are written
+
+_local = threading.local()  # sqlite3 connections are per-thread
+
+
+def _db():
+    if getattr(_local, "conn", None) is None:
+        _local.conn = connect()
+    return _local.conn
+
+
+# ---------- Embedders -------------------------------------------------------
+
+class Embedder:
+    """Interface every embedding backend implements."""
+    name = "base"
+    dim = 0
+
+    def version(self) -> str:
+        """Fingerprint of whatever shapes the vectors (model, dim, …)."""
+        raise NotImplementedError
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """(len(texts), dim) float32 array of L2-normalised rows."""
+        raise NotImplementedError
+
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+SUFFIXES = ("ing", "ed", "es", "s", "ly", "e")
+
+
+@lru_cache(maxsize=100_000)
+def _stem(word: str) -> str:
+    """Very light suffix stripping so hike / hiking / hiked share a feature."""
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+class HashingEmbedder(Embedder):
+    """
+    Signed feature hashing of stemmed words, word bigrams and character
+    trigrams, with sublinear term frequency. Needs no vocabulary or
+    corpus statistics, so a vector never changes once computed and new
+    entries embed independently.
+    """
+    name = "local"
+    dim = 256
+    TRIGRAM_WEIGHT = 0.3
+
+    def version(self) -> str:
+        return f"hashing-2-{self.dim}"
+
+    def __init__(self):
+        # feature -> (columns, signed weights); a word's entry also holds
+        # its character trigrams, so each distinct word is hashed once.
+        self._slots: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    def _slot(self, feature: str, trigrams: bool) -> tuple[np.ndarray, np.ndarray]:
+        keys = [feature]
+        if trigrams:
+            padded = f"<{feature}>"
+            keys += [f"#{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        cols, vals = [], []
+        for key in keys:
+            h = zlib.crc32(key.encode())
+            scale = self.TRIGRAM_WEIGHT if key[0] == "#" else 1.0
+            cols.append(h % self.dim)
+            vals.append(scale if h & 0x80000000 else -scale)
+        if len(self._slots) > 500_000:  # bound memory on huge vocabularies
+            self._slots.clear()
+        slot = self._slots[feature] = (np.array(cols, dtype=np.intp),
+                                       np.array(vals, dtype=np.float32))
+        return slot
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        slots = self._slots
+        rows, weights, cols, vals = [], [], [], []
+        for row, text in enumerate(texts):
+            words = [_stem(w) for w in WORD_RE.findall(text.lower())
+                     if w not in STOPWORDS and len(w) > 1]
+            for trigrams, counts in ((True, Counter(words)),
+                                     (False, Counter(map(" ".join, zip(words, words[1:]))))):
+                for feature, count in counts.items():
+                    c, v = slots.get(feature) or self._slot(feature, trigrams)
+                    rows.append(row)
+                    weights.append(1.0 + math.log(count))
+                    cols.append(c)
+                    vals.append(v)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            lengths = np.fromiter(map(len, cols), dtype=np.intp, count=len(cols))
+            np.add.at(
+                out,
+                (np.repeat(np.array(rows, dtype=np.intp), lengths), np.concatenate(cols)),
+                np.concatenate(vals) * np.repeat(np.array(weights, dtype=np.float32), lengths),
+            )
+        return normalise(out)
+
+
+# name -> (module, class); imported only when selected.
+EMBEDDERS = {
+    "local": ("journal.embed", "HashingEmbedder"),
+    "openai": ("journal.ai_openai", "OpenAIEmbedder"),
+}
+DEFAULT_EMBEDDER = os.environ.get("JOURNAL_EMBEDDER", "local")
+
+_active = DEFAULT_EMBEDDER
+_instances: dict[str, Embedder] = {}
+
+
+def set_embedder(name: str) -> None:
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder {name!r}; choose from {', '.join(EMBEDDERS)}")
+    global _active
+    _active = name
+
+
+def get_embedder(name: str | None = None) -> Embedder:
+    name = name or _active
+    if name not in _instances:
+        module, cls = EMBEDDERS[name]
+        _instances[name] = getattr(importlib.import_module(module), cls)()
+    return _instances[name]
+
+
+# ---------- Storage ---------------------------------------------------------
+
+def pending_count() -> int:
+    """Entries whose vector is missing or from another embedder version."""
+    return _db().execute(
+        f"""
+        SELECT count(*) FROM {TABLE} e LEFT JOIN {EMBED_TABLE} v ON v.entry_id = e.id
+        WHERE v.entry_id IS NULL OR v.model != ?
+        """,
+        [get_embedder().version()],
+    ).fetchone()[0]
+
+
+def refresh(progress: Callable[[int, int], None] | None = None,
+            batch_size: int = REFRESH_BATCH) -> int:
+    """
+    Embed every entry that has no current vector; returns how many.
+    Each batch is committed on its own, so an interrupted run resumes.
+    """
+    embedder = get_embedder()
+    version = embedder.version()
+    db = _db()
+    total = pending_count()
+    done = 0
+    while True:
+        rows = db.execute(
+            f"""
+            SELECT e.id, e.text FROM {TABLE} e
+            LEFT JOIN {EMBED_TABLE} v ON v.entry_id = e.id
+            WHERE v.entry_id IS NULL OR v.model != ?
+            ORDER BY e.id LIMIT ?
+            """,
+            [version, batch_size],
+        ).fetchall()
+        if not rows:
+            return done
+        with trace.span("embed.embed", rows=len(rows), model=version):
+            vectors = embedder.embed([row[1] for row in rows])
+        with db:
+            db.executemany(
+                f"INSERT OR REPLACE INTO {EMBED_TABLE} (entry_id, model, vector) VALUES (?, ?, ?)",
+                [(row[0], version, vec.tobytes()) for row, vec in zip(rows, vectors)],
+            )
+            db.execute(
+                f"INSERT INTO {META_TABLE} (key, value) VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                [GENERATION_KEY],
+            )
+        done += len(rows)
+        if progress:
+            progress(done, total)
+
+
+def generation() -> int:
+    """Changes whenever stored vectors do; use it to invalidate cached indexes."""
+    row = _db().execute(f"SELECT value FROM {META_TABLE} WHERE key = ?",
+                        [GENERATION_KEY]).fetchone()
+    return int(row[0]) if row else 0
+
+
+def load_vectors() -> tuple[np.ndarray, np.ndarray]:
+    """(ids, matrix) for every entry embedded with the current embedder."""
+    embedder = get_embedder()
+    rows = _db().execute(
+        f"SELECT entry_id, vector FROM {EMBED_TABLE} WHERE model = ? ORDER BY entry_id",
+        [embedder.version()],
+    ).fetchall()
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32)
+    return ids, matrix.reshape(len(rows), -1) if len(rows) else matrix.reshape(0, embedder.dim)
+
+
+def vector_for(entry_id: int) -> np.ndarray | None:
+    row = _db().execute(
+        f"SELECT vector FROM {EMBED_TABLE} WHERE entry_id = ? AND model = ?",
+        [int(entry_id), get_embedder().version()],
+    ).fetchone()
+    return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+
+# ---------- Indexes ---------------------------------------------------------
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class FlatIndex:
+    """Exact search: one matrix-vector product over every entry."""
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray):
+        self.ids, self.vectors = ids, vectors
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: np.ndarray, k: int = 10) -> list[tuple[int, float]]:
+        scores = self.vectors @ query
+        return [(int(self.ids[i]), float(scores[i])) for i in _top_k(scores, k)]
+
+
+class IVFIndex:
+    """
+    Inverted-file index: spherical k-means into `nlist` clusters, vectors
+    stored int8-quantised and grouped by cluster. A query scans only the
+    `nprobe` clusters whose centroids are closest, so it is approximate.
+    """
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, nlist: int | None = None,
+                 nprobe: int = 32, iterations: int = 8, train_size: int = 20_000, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n = len(ids)
+        nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        sample = vectors[rng.choice(n, min(n, train_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]  # keep unused centroids where they were
+            centroids = normalise(sums)
+
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        self.centroids = centroids
+        self.ids = ids[order]
+        self.codes = np.round(vectors[order] * 127).astype(np.int8)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: np.ndarray, k: int = 10) -> list[tuple[int, float]]:
+        probes = _top_k(self.centroids @ query, self.nprobe)
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes])
+        scores = (self.codes[rows] @ query) / 127
+        return [(int(self.ids[rows[i]]), float(scores[i])) for i in _top_k(scores, k)]
+
+
+@trace.traced("embed.build_index")
+def build_index(kind: str = "auto"):
+    """'flat', 'ivf', or 'auto' (IVF from IVF_MIN_ENTRIES entries up)."""
+    ids, vectors = load_vectors()
+    if kind == "auto":
+        kind = "ivf" if len(ids) >= IVF_MIN_ENTRIES else "flat"
+    if kind == "ivf" and len(ids):
+        return IVFIndex(ids, vectors)
+    return FlatIndex(ids, vectors)
+
+
+@trace.traced("embed.similar")
+def similar(entry_id: int, k: int = 10, index=None) -> list[dict]:
+    """
+    The `k` entries closest in meaning to `entry_id`, best first, as
+    entry dicts with an extra `score` (cosine similarity, -1…1).
+    Embeds the entry first if it has no current vector.
+    """
+    query = vector_for(entry_id)
+    if query is None:
+        refresh()
+        query = vector_for(entry_id)
+        if query is None:
+            raise KeyError(f"No entry with id {entry_id}")
+    index = index if index is not None else build_index()
+    hits = [(i, s) for i, s in index.search(query, k + 1) if i != int(entry_id)][:k]
+    return _with_entries(hits)
+
+
+def _with_entries(hits: Iterable[tuple[int, float]]) -> list[dict]:
+    hits = list(hits)
+    if not hits:
+        return []
+    rows = _db().execute(
+        f"SELECT id, timestamp, text, summary, mood FROM {TABLE} "
+        f"WHERE id IN ({', '.join('?' * len(hits))})",
+        [i for i, _ in hits],
+    )
+    entries = {row["id"]: dict(row) for row in rows}
+    return [{**entries[i], "score": score} for i, score in hits if i in entries]
@@ -1,61 +1,116 @@
 """
 journal.export
 --------------
-Export all journal entries to a Markdown file.
+Export journal entries to a Markdown file (and optionally PDF).
+
+Entries are streamed from a SQLite cursor straight to the output file,
+so memory stays flat however big the journal is. PDFs are rendered one
+month at a time in a process pool and merged at the end.
 
 Usage from other modules:
     from journal import export
     export.export_markdown("my_journal.md")
+    export.export_markdown("new.md", since_last=True)
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import os
+import re
 import tempfile
-import markdown2
-from weasyprint import HTML
-from journal.db import get_db, TABLE
-
-def export_markdown(path: str | Path) -> Path:
-    """Write a Markdown file containing all entries; return Path object."""
-    db = get_db()
-    rows = list(db[TABLE].rows)
-
-    md_lines = [
-        "# AI Chat Journal Export",
-        "",
-        f"_Total entries: {len(rows)}_",
-        "",
-    ]
-
-    for entry in rows:
-        md_lines.extend(
-            [
-                f"## {entry['timestamp']}",
-                "",
-                entry["text"],
-                "",
-            ]
-        )
-
-        if entry.get("summary"):
-            md_lines.extend(
-                [
-                    f"> **AI Summary (mood {entry['mood']}/10)**",
-                    f"> {entry['summary']}",
-                    "",
-                ]
-            )
+from journal import storage, trace
+
+LAST_EXPORT_KEY = "last_export_id"
+MONTH_HEADING_RE = re.compile(r"^## (\d{4}-\d{2})")
+
+
+def entry_markdown(entry: dict) -> str:
+    """Markdown block for one entry (the format import_md parses back)."""
+    lines = [f"## {entry['timestamp']}", "", entry["text"], ""]
+    if entry.get("summary"):
+        lines += [
+            f"> **AI Summary (mood {entry['mood']}/10)**",
+            f"> {entry['summary']}",
+            "",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def export_markdown(
+    path: str | Path,
+    start=None,
+    end=None,
+    since_last: bool = False,
+) -> Path:
+    """
+    Write a Markdown file containing the selected entries; return Path.
+
+    `start`/`end` limit the date range (see storage.query_entries);
+    `since_last` only writes entries added after the previous
+    since_last export and then advances that watermark.
+    """
+    after_id = int(storage.get_meta(LAST_EXPORT_KEY, 0)) if since_last else None
+    where = dict(start=start, end=end, after_id=after_id)
 
     out_path = Path(path).expanduser()
-    out_path.write_text("\n".join(md_lines), encoding="utf-8")
+    last_id = after_id
+    with trace.span("export.markdown") as span, out_path.open("w", encoding="utf-8") as out:
+        out.write("# AI Chat Journal Export\n\n")
+        total = storage.count_entries(**where)
+        out.write(f"_Total entries: {total}_\n\n")
+        for entry in storage.query_entries(**where):
+            out.write(entry_markdown(entry))
+            last_id = entry["id"]
+        span.set(rows=total)
+
+    if since_last and last_id:
+        storage.set_meta(LAST_EXPORT_KEY, last_id)
+    return out_path
+
+
+def _month_chunks(md_path: Path):
+    """
+    Yield Markdown text one calendar month at a time (split on entry
+    headings), reading the file line by line.
+    """
+    chunk, month = [], None
+    with md_path.open(encoding="utf-8") as f:
+        for line in f:
+            m = MONTH_HEADING_RE.match(line)
+            if m and month is not None and m.group(1) != month and chunk:
+                yield "".join(chunk)
+                chunk = []
+            if m:
+                month = m.group(1)
+            chunk.append(line)
+    if chunk:
+        yield "".join(chunk)
+
+
+def _render_chunk(md_text: str, out_path: str) -> str:
+    """Worker: Markdown -> HTML -> PDF for one chunk (runs in a subprocess)."""
+    import markdown2
+    from weasyprint import HTML  # heavy (Pango/Cairo); only PDF export needs it
+
+    HTML(string=markdown2.markdown(md_text)).write_pdf(out_path)
     return out_path
 
 
 # PDF export helper
-def export_pdf(pdf_path: str | Path, md_path: str | Path | None = None) -> Path:
+def export_pdf(
+    pdf_path: str | Path,
+    md_path: str | Path | None = None,
+    workers: int | None = None,
+) -> Path:
     """
     Convert Markdown to PDF. If md_path is None, generate Markdown first.
-    Requires wkhtmltopdf to be installed and on PATH.
+
+    The Markdown is split per month; each month is rendered by
+    WeasyPrint in its own process and the pieces are merged in order.
+    At most ~2 chunks per worker are held in memory at any time.
     """
+    from pypdf import PdfWriter
+
     md_path = Path(md_path) if md_path else None
 
     # If no Markdown file supplied, create a temporary one
@@ -64,8 +119,26 @@ def export_pdf(pdf_path: str | Path, md_path: str | Path | None = None) -> Path:
         md_path = Path(tmp.name)
         export_markdown(md_path)
 
-    # Convert Markdown -> HTML -> PDF using WeasyPrint
-    html = markdown2.markdown(md_path.read_text(encoding="utf-8"))
+    workers = workers or os.cpu_count() or 1
     pdf_output = Path(pdf_path).expanduser().with_suffix(".pdf")
-    HTML(string=html).write_pdf(str(pdf_output))
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        # WeasyPrint runs in the workers, so the parent sees the render
+        # stage as a whole (split + queue + wait), not per chunk.
+        with trace.span("export.pdf.render", workers=workers) as span:
+            parts, in_flight = [], []
+            for i, chunk in enumerate(_month_chunks(md_path)):
+                part = str(Path(tmp_dir) / f"part-{i:05d}.pdf")
+                in_flight.append(pool.submit(_render_chunk, chunk, part))
+                if len(in_flight) >= workers * 2:
+                    parts.append(in_flight.pop(0).result())
+            parts += [f.result() for f in in_flight]
+            span.set(chunks=len(parts))
+
+        with trace.span("export.pdf.merge", rows=len(parts)):
+            writer = PdfWriter()
+            for part in parts:
+                writer.append(part)
+            with pdf_output.open("wb") as f:
+                writer.write(f)
     return pdf_output
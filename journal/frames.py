@@ -0,0 +1,157 @@
+"""
+journal.frames
+--------------
+In-memory pandas view of the journal for the dashboard.
+
+An EntryFrame loads the rows matching its filters once (filtering in
+SQL), then on every refresh() pulls only rows whose id or updated_at is
+past its watermark (see storage.changed_entries) and patches them in.
+Timestamps are parsed once per row into a datetime64 column, so a
+Streamlit rerun no longer re-reads the table or re-parses every date.
+
+A SnapshotFrame offers the same view of a Parquet/Arrow snapshot (see
+journal.snapshot) instead of the live database: an Arrow file is
+memory-mapped and its text columns stay Arrow-backed in pandas, so
+they are never copied into Python strings.
+"""
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from journal import storage
+
+# Re-read this many seconds of updated_at on each refresh, in case
+# another process's clock is slightly behind ours.
+WATERMARK_SLACK = 5.0
+
+FRAME_COLUMNS = list(storage.COLUMNS) + ["updated_at"]
+OFFSET_RE = r"(?:[+-]\d\d:?\d\d|Z)$"
+
+
+def _typed(rows: list[dict]) -> pd.DataFrame:
+    """Rows -> DataFrame with parsed timestamps and nullable integer moods."""
+    df = pd.DataFrame(rows, columns=FRAME_COLUMNS)
+    # Local wall-clock part of the ISO string; the offset is only needed
+    # to compare instants, which SQL already does on the raw text.
+    df["timestamp"] = pd.to_datetime(df["timestamp"].str.replace(OFFSET_RE, "", regex=True),
+                                     format="ISO8601", errors="coerce")
+    df["mood"] = df["mood"].astype("Int64")
+    df["updated_at"] = df["updated_at"].astype("float64")
+    return df.set_index("id", drop=False).rename_axis(None)
+
+
+class EntryFrame:
+    """
+    Entries matching start/end/unanalyzed as a DataFrame indexed by id,
+    newest first. Thread-safe: one instance can be shared by every
+    dashboard session.
+    """
+
+    def __init__(self, start=None, end=None, unanalyzed: bool = False):
+        self.filters = {"start": start, "end": end, "unanalyzed": unanalyzed}
+        self.df = _typed([])
+        self.max_id = 0
+        self.watermark: float | None = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        # Marks first: anything written after them is fetched again by
+        # the next refresh, and re-applying a row is harmless.
+        self.max_id, self.watermark = storage.change_marks()
+        self.df = _typed(list(storage.query_entries(**self.filters, columns=FRAME_COLUMNS)))
+        self.df = self.df.sort_values(["timestamp", "id"], ascending=False)
+        self._loaded = True
+
+    def _apply(self, changed: list[dict]) -> None:
+        present = self.df.index
+        edited = _typed([r for r in changed if r["keep"] and r["id"] in present])
+        added = _typed([r for r in changed if r["keep"] and r["id"] not in present])
+        gone = [r["id"] for r in changed if not r["keep"] and r["id"] in present]
+        if not edited.empty:  # timestamps never change, so order holds
+            # Column by column: a block assignment trips over Int64 moods
+            # when the edited rows mix values and <NA>.
+            for column in edited.columns:
+                self.df.loc[edited.index, column] = edited[column]
+        if gone:
+            self.df = self.df.drop(index=gone)
+        if not added.empty:
+            added = added.sort_values(["timestamp", "id"], ascending=False)
+            if self.df.empty:
+                self.df = added
+            elif added["timestamp"].min() >= self.df["timestamp"].max():
+                self.df = pd.concat([added, self.df])  # the usual case: new entries on top
+            else:
+                self.df = pd.concat([self.df, added]).sort_values(
+                    ["timestamp", "id"], ascending=False)
+
+    def refresh(self) -> int:
+        """Bring the frame up to date; returns the number of rows re-read."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                return len(self.df)
+
+            since = self.watermark - WATERMARK_SLACK if self.watermark else None
+            changed = list(storage.changed_entries(self.max_id, since, **self.filters))
+            if changed:
+                self.max_id = max(self.max_id, max(r["id"] for r in changed))
+                stamps = [r["updated_at"] for r in changed if r["updated_at"] is not None]
+                if stamps:
+                    self.watermark = max(self.watermark or 0, max(stamps))
+                self._apply(changed)
+
+            # Entries can only disappear by deletion, which leaves no
+            # watermark behind; a count mismatch means reload.
+            if len(self.df) != storage.count_entries(**self.filters):
+                self._load()
+            return len(changed)
+
+
+class SnapshotFrame:
+    """
+    Entries from the snapshot file at `path` matching start/end/
+    unanalyzed, same shape as EntryFrame.df. refresh() reloads only when
+    the file has been rewritten.
+    """
+
+    def __init__(self, path, start=None, end=None, unanalyzed: bool = False):
+        self.path = Path(path).expanduser()
+        self.filters = {"start": start, "end": end, "unanalyzed": unanalyzed}
+        self.df = _typed([])
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        from journal import snapshot
+
+        table = snapshot.read_table(self.path, columns=FRAME_COLUMNS)
+        start, end = storage.timestamp_range(self.filters["start"], self.filters["end"])
+        if start is not None:
+            table = table.filter(pc.greater_equal(table["timestamp"], start))
+        if end is not None:
+            table = table.filter(pc.less(table["timestamp"], end))
+        if self.filters["unanalyzed"]:
+            table = table.filter(pc.is_null(table["summary"]))
+        df = table.to_pandas(
+            types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_string(t) else None)
+        df["timestamp"] = pd.to_datetime(df["timestamp"].astype(str).str.replace(
+            OFFSET_RE, "", regex=True), format="ISO8601", errors="coerce")
+        df["mood"] = df["mood"].astype("Int64")
+        self.df = (df.set_index("id", drop=False).rename_axis(None)
+                   .sort_values(["timestamp", "id"], ascending=False))
+
+    def refresh(self) -> int:
+        """Reload if the snapshot changed; returns the number of rows re-read."""
+        with self._lock:
+            stat = self.path.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamp:
+                return 0
+            self._load()
+            self._stamp = stamp
+            return len(self.df)
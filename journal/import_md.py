@@ -3,69 +3,139 @@ journal.import_md
 -----------------
 Parse a Markdown file (as exported by export_markdown) and insert
 entries into the SQLite DB if they don't already exist.
+
+The file is parsed as a stream of lines and inserted in batches inside
+one transaction; duplicates are skipped by the UNIQUE timestamp index
+(INSERT OR IGNORE), so there is no per-entry lookup or commit. The same
+transaction refreshes the touched days' rollups and queues new entries
+without a summary for analysis (journal.jobs).
 """
 import re
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from journal.db import get_db, TABLE
+from typing import Callable, Iterable, Iterator
+
+from journal.db import connect, TABLE
+from journal import jobs, storage, trace
 
 HEADING_RE = re.compile(r"^## (.+)$")  # captures timestamp
 SUMMARY_RE = re.compile(r"^> \*\*AI Summary \(mood (\d+)/10\)\*\*$")
 
-def import_markdown(md_path: str | Path) -> int:
-    db = get_db()
-    table = db[TABLE]
+BATCH_SIZE = 1000
 
-    md_text = Path(md_path).expanduser().read_text(encoding="utf-8").splitlines()
-    added = 0
 
-    i = 0
-    while i < len(md_text):
-        m = HEADING_RE.match(md_text[i])
-        if not m:
-            i += 1
-            continue
+@dataclass
+class ImportReport:
+    parsed: int = 0
+    added: int = 0
+    seconds: float = 0.0
 
-        timestamp = m.group(1).strip()
-        i += 2  # skip blank line after heading
+    @property
+    def rate(self) -> float:
+        """Entries parsed per second."""
+        return self.parsed / self.seconds if self.seconds else 0.0
 
-        text_lines = []
-        while i < len(md_text) and not md_text[i].startswith("##"):
-            if md_text[i].startswith(">"):  # summary block starts
-                break
-            text_lines.append(md_text[i])
-            i += 1
 
-        text = "\n".join(line.rstrip() for line in text_lines).strip()
+def _finish(entry: dict) -> dict:
+    entry["text"] = "\n".join(line.rstrip() for line in entry["text"]).strip()
+    return entry
 
-        summary = None
-        mood = None
-        if i < len(md_text) and SUMMARY_RE.match(md_text[i]):
-            mood = int(SUMMARY_RE.match(md_text[i]).group(1))
-            i += 1
-            # next line is the actual summary text prefixed with '>'
-            if i < len(md_text) and md_text[i].startswith("> "):
-                summary = md_text[i][2:].strip()
-                i += 1
-            # skip until blank line
-            while i < len(md_text) and md_text[i]:
-                i += 1
-        # move past any additional blank lines
-        while i < len(md_text) and not md_text[i]:
-            i += 1
-
-        # Skip if timestamp already exists
-        if table.count_where("timestamp = ?", [timestamp]) > 0:
+
+def parse_markdown(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    Yield {timestamp, text, summary, mood} dicts from exported Markdown,
+    one entry at a time, without holding the file in memory.
+    """
+    entry, state = None, None
+    for line in lines:
+        line = line.rstrip("\n")
+        m = HEADING_RE.match(line)
+        if m:
+            if entry is not None:
+                yield _finish(entry)
+            entry = {"timestamp": m.group(1).strip(), "text": [],
+                     "summary": None, "mood": None}
+            state = "gap"
+            continue
+        if entry is None:           # file header before the first entry
             continue
+        if state == "gap":          # blank line after heading
+            state = "text"
+        elif state == "text":
+            if line.startswith(">"):  # summary block starts
+                summary = SUMMARY_RE.match(line)
+                if summary:
+                    entry["mood"] = int(summary.group(1))
+                state = "summary" if summary else "tail"
+            else:
+                entry["text"].append(line)
+        elif state == "summary":
+            # next line is the actual summary text prefixed with '>'
+            if line.startswith("> "):
+                entry["summary"] = line[2:].strip()
+            state = "tail"          # ignore anything else until next heading
+    if entry is not None:
+        yield _finish(entry)
+
+
+def import_markdown(
+    md_path: str | Path,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+    progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    """
+    Import entries from `md_path`. With `dry_run`, only count how many
+    entries would be new. `progress(report)` is called after each batch.
+    """
+    db = connect()
+    report = ImportReport()
+    started = time.perf_counter()
+    days = set()
+
+    def flush(batch):
+        with trace.span("import_md.insert", rows=len(batch)):
+            _flush(batch)
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    def _flush(batch):
+        if dry_run:
+            for row in batch:
+                if not db.execute(f"SELECT 1 FROM {TABLE} WHERE timestamp = ?",
+                                  [row[0]]).fetchone():
+                    report.added += 1
+        else:
+            last_id = db.execute(f"SELECT coalesce(max(id), 0) FROM {TABLE}").fetchone()[0]
+            db.executemany(
+                f"INSERT OR IGNORE INTO {TABLE} (timestamp, text, summary, mood) "
+                "VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            # ignored rows don't consume ids, so new rows are exactly those past last_id
+            new = db.execute(f"SELECT id, timestamp, summary FROM {TABLE} WHERE id > ?",
+                             [last_id]).fetchall()
+            report.added += len(new)
+            days.update(row[1][:10] for row in new)
+            jobs.enqueue(db, [row[0] for row in new if row[2] is None])
 
-        table.insert(
-            {
-                "timestamp": timestamp,
-                "text": text,
-                "summary": summary,
-                "mood": mood,
-            },
-            pk="id",
-        )
-        added += 1
-
-    return added
+    try:
+        with db, Path(md_path).expanduser().open(encoding="utf-8") as f:
+            if not dry_run:
+                db.execute("BEGIN IMMEDIATE")  # take the write lock first, so max(id) stays ours
+            batch = []
+            for entry in trace.timed_iter("import_md.parse", parse_markdown(f)):
+                batch.append((entry["timestamp"], entry["text"], entry["summary"], entry["mood"]))
+                report.parsed += 1
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+            storage._refresh_days(db, days)
+    finally:
+        db.close()
+    report.seconds = time.perf_counter() - started
+    return report
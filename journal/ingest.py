@@ -0,0 +1,200 @@
+"""
+journal.ingest
+--------------
+Stream entries from other tools into the journal (`journal ingest`).
+
+Input is read line by line as a generator pipeline, so memory stays
+flat however much is piped in:
+
+    read (JSONL / CSV / TSV / one entry per line)
+      -> normalise (validate text, canonical ISO timestamps, moods)
+      -> storage.add_entries (batched transactions; duplicates by
+         timestamp are skipped, as on import)
+      -> optional analysis of each batch's new entries
+
+Records are dicts with `text` and optional `timestamp`, `summary` and
+`mood`. Timestamps may be ISO 8601 (naive ones are taken as local time)
+or Unix seconds; records without one are stamped on arrival.
+"""
+import csv
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TextIO
+
+from journal import storage, trace
+
+FORMATS = ("jsonl", "csv", "tsv", "lines")
+SUFFIX_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl",
+                  ".csv": "csv", ".tsv": "tsv", ".txt": "lines"}
+MAX_ERRORS_KEPT = 20  # the report keeps the first few messages, counts the rest
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+@dataclass
+class IngestReport:
+    read: int = 0
+    added: int = 0
+    invalid: int = 0
+    analysed: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def skipped(self) -> int:
+        """Valid records not added: their timestamp was already in the journal."""
+        return self.read - self.invalid - self.added
+
+    @property
+    def rate(self) -> float:
+        """Records read per second."""
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def format_for(path: str | None) -> str:
+    """Guess the input format from a file suffix (stdin: JSONL)."""
+    if not path or path == "-":
+        return "jsonl"
+    return SUFFIX_FORMATS.get(Path(path).suffix.lower(), "jsonl")
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | InvalidRecord]]:
+    """
+    Yield (line number, record) pairs, one record per input line (CSV
+    and TSV need a header row naming the fields). A malformed JSON line
+    yields an InvalidRecord in place of the record, so one bad line
+    doesn't stop the stream.
+    """
+    if fmt == "jsonl":
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield number, InvalidRecord(f"bad JSON: {exc.msg}")
+    elif fmt in ("csv", "tsv"):
+        reader = csv.DictReader(lines, delimiter="," if fmt == "csv" else "\t")
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "lines":
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                yield number, {"text": line.rstrip("\n")}
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}")
+
+
+def _timestamp(value) -> str | None:
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+            moment = datetime.fromtimestamp(float(value))
+        else:
+            moment = datetime.fromisoformat(str(value).strip())
+    except (ValueError, OverflowError, OSError):
+        raise InvalidRecord(f"bad timestamp {value!r}") from None
+    # Same shape as entries written here: local offset when none given.
+    return (moment.astimezone() if moment.tzinfo is None else moment).isoformat()
+
+
+def _mood(value) -> int | None:
+    if value is None or value == "":
+        return None
+    # int() would quietly turn true into 1 and 7.9 into 7.
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise InvalidRecord(f"bad mood {value!r}")
+    try:
+        mood = int(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"bad mood {value!r}") from None
+    if not 1 <= mood <= 10:
+        raise InvalidRecord(f"mood {mood} outside 1-10")
+    return mood
+
+
+def normalise(record) -> dict:
+    """Validate one record; returns an add_entries() dict or raises InvalidRecord."""
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord("expected an object with a 'text' field")
+    text = record.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise InvalidRecord("missing or empty 'text'")
+    summary = record.get("summary")
+    if summary is not None and not isinstance(summary, str):
+        raise InvalidRecord("'summary' must be a string")
+    summary = summary or None
+    mood = _mood(record.get("mood"))
+    if (summary is None) != (mood is None):
+        raise InvalidRecord("'summary' and 'mood' go together")
+    return {"text": text.strip(), "timestamp": _timestamp(record.get("timestamp")),
+            "summary": summary, "mood": mood}
+
+
+def _open(path: str | None) -> TextIO:
+    if not path or path == "-":
+        return sys.stdin
+    return Path(path).expanduser().open(encoding="utf-8", newline="")
+
+
+def ingest(
+    paths: list[str] | None = None,
+    fmt: str | None = None,
+    batch_size: int = storage.ADD_BATCH,
+    analyse: bool = False,
+    concurrency: int = 4,
+    rps: float | None = None,
+    progress: Callable[[IngestReport], None] | None = None,
+) -> IngestReport:
+    """
+    Ingest every record from `paths` (None or "-" = stdin). With
+    `analyse`, each batch's new unanalysed entries go straight through
+    batch.analyse_entries before the next batch is read; otherwise they
+    wait in the job queue for a worker.
+    """
+    report = IngestReport()
+    started = time.perf_counter()
+
+    def valid_records() -> Iterator[dict]:
+        for path in paths or ["-"]:
+            source = _open(path)
+            try:
+                for number, record in read_records(source, fmt or format_for(path)):
+                    report.read += 1
+                    try:
+                        yield normalise(record)
+                    except InvalidRecord as exc:
+                        report.invalid += 1
+                        if len(report.errors) < MAX_ERRORS_KEPT:
+                            report.errors.append(f"{path or '-'}:{number}: {exc}")
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+
+    def added(new: list[dict]) -> None:
+        report.added += len(new)
+        pending = [entry for entry in new if entry["summary"] is None]
+        if analyse and pending:
+            from journal import batch
+
+            with trace.span("ingest.analyse", rows=len(pending)):
+                report.analysed += batch.analyse_entries(pending, concurrency=concurrency,
+                                                         rps=rps).analysed
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    with trace.span("ingest") as span:
+        storage.add_entries(valid_records(), batch_size=batch_size, on_added=added)
+        span.set(rows=report.read)
+    report.seconds = time.perf_counter() - started
+    return report
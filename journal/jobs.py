@@ -0,0 +1,213 @@
+"""
+journal.jobs
+------------
+SQLite-backed queue of analysis jobs.
+
+Writers (storage.add_entry / update_text) enqueue inside their own
+transaction, so a saved entry always has a job. `journal worker`
+(journal.worker) claims jobs, runs them and marks them done; failures
+are retried with exponential backoff and end up `dead` after
+MAX_ATTEMPTS. Job lifecycle: queued -> running -> done | queued (retry)
+| dead.
+"""
+import sqlite3
+import time
+
+from journal import trace
+from journal.db import connect, TABLE, JOBS_TABLE
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5      # 5 s, 10 s, 20 s, … between attempts
+LEASE_SECONDS = 15 * 60     # a running job older than this is presumed orphaned
+STATUSES = ("queued", "running", "done", "dead")
+
+
+def enqueue(db: sqlite3.Connection, entry_ids) -> None:
+    """
+    Queue analysis for `entry_ids` on the caller's connection (and so in
+    the caller's transaction). Entries that already have a queued job
+    are left alone.
+    """
+    now = time.time()
+    db.executemany(
+        f"INSERT OR IGNORE INTO {JOBS_TABLE} (entry_id, created_at, updated_at) "
+        "VALUES (?, ?, ?)",
+        [(int(i), now, now) for i in entry_ids],
+    )
+
+
+def enqueue_unanalyzed(db: sqlite3.Connection | None = None) -> int:
+    """Queue every entry without a summary (backfill). Returns jobs added."""
+    db = db or connect()
+    now = time.time()
+    with db:
+        return db.execute(
+            f"INSERT OR IGNORE INTO {JOBS_TABLE} (entry_id, created_at, updated_at) "
+            f"SELECT id, ?, ? FROM {TABLE} WHERE summary IS NULL",
+            [now, now],
+        ).rowcount
+
+
+def _with_write_lock(db: sqlite3.Connection, fn):
+    """Run fn(db) inside BEGIN IMMEDIATE so concurrent workers don't race."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn(db)
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+    return result
+
+
+@trace.traced("jobs.claim")
+def claim(db: sqlite3.Connection, limit: int) -> list[dict]:
+    """
+    Atomically move up to `limit` due jobs from queued to running and
+    return them as dicts (id, entry_id, attempts).
+    """
+    now = time.time()
+
+    def take(db):
+        rows = db.execute(
+            f"""
+            UPDATE {JOBS_TABLE}
+            SET status = 'running', attempts = attempts + 1, updated_at = ?
+            WHERE id IN (
+                SELECT id FROM {JOBS_TABLE}
+                WHERE status = 'queued' AND run_after <= ?
+                ORDER BY id LIMIT ?
+            )
+            RETURNING id, entry_id, attempts
+            """,
+            [now, now, limit],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    return _with_write_lock(db, take)
+
+
+def complete(db: sqlite3.Connection, job_ids) -> None:
+    """Mark jobs done (call in the same transaction as the write-back)."""
+    db.executemany(
+        f"UPDATE {JOBS_TABLE} SET status = 'done', last_error = NULL, updated_at = ? "
+        "WHERE id = ?",
+        [(time.time(), int(i)) for i in job_ids],
+    )
+
+
+def release(db: sqlite3.Connection, job_ids) -> None:
+    """Hand claimed-but-unstarted jobs back (e.g. on shutdown) without using up an attempt."""
+    rows = [(time.time(), int(i)) for i in job_ids]
+    with db:
+        db.executemany(
+            f"UPDATE OR IGNORE {JOBS_TABLE} SET status = 'queued', attempts = attempts - 1, "
+            "updated_at = ? WHERE id = ? AND status = 'running'",
+            rows,
+        )
+        # Those still running were ignored: a newer queued job for the
+        # same entry supersedes them, as in fail().
+        db.executemany(
+            f"UPDATE {JOBS_TABLE} SET status = 'done', updated_at = ? "
+            "WHERE id = ? AND status = 'running'",
+            rows,
+        )
+
+
+def fail(db: sqlite3.Connection, job: dict, error: BaseException | str) -> str:
+    """Record a failure; requeue with backoff or mark dead. Returns new status."""
+    now = time.time()
+    dead = job["attempts"] >= MAX_ATTEMPTS
+    status = "dead" if dead else "queued"
+    delay = RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+    with db:
+        if not dead:
+            # A newer queued job for the same entry supersedes this one.
+            if db.execute(
+                f"SELECT 1 FROM {JOBS_TABLE} WHERE entry_id = ? AND status = 'queued'",
+                [job["entry_id"]],
+            ).fetchone():
+                status = "done"
+        db.execute(
+            f"UPDATE {JOBS_TABLE} SET status = ?, last_error = ?, run_after = ?, "
+            "updated_at = ? WHERE id = ?",
+            [status, str(error)[:500], now + delay, now, job["id"]],
+        )
+    return status
+
+
+def recover(db: sqlite3.Connection, lease: float = LEASE_SECONDS) -> int:
+    """
+    Requeue running jobs whose worker apparently died, or close them
+    when a newer queued job for the same entry supersedes them. Returns
+    how many were recovered.
+    """
+    now = time.time()
+    with db:
+        requeued = db.execute(
+            f"""
+            UPDATE {JOBS_TABLE} SET status = 'queued', updated_at = ?
+            WHERE status = 'running' AND updated_at < ?
+              AND entry_id NOT IN (
+                  SELECT entry_id FROM {JOBS_TABLE} WHERE status = 'queued')
+            """,
+            [now, now - lease],
+        ).rowcount
+        superseded = db.execute(
+            f"UPDATE {JOBS_TABLE} SET status = 'done', updated_at = ? "
+            "WHERE status = 'running' AND updated_at < ?",
+            [now, now - lease],
+        ).rowcount
+    return requeued + superseded
+
+
+def retry_dead(db: sqlite3.Connection | None = None) -> int:
+    """Give every dead job a fresh set of attempts."""
+    db = db or connect()
+    with db:
+        return db.execute(
+            f"""
+            UPDATE OR IGNORE {JOBS_TABLE}
+            SET status = 'queued', attempts = 0, run_after = 0, updated_at = ?
+            WHERE status = 'dead'
+            """,
+            [time.time()],
+        ).rowcount
+
+
+def purge(db: sqlite3.Connection | None = None, older_than_days: float = 7) -> int:
+    """Delete done jobs older than `older_than_days`."""
+    db = db or connect()
+    with db:
+        return db.execute(
+            f"DELETE FROM {JOBS_TABLE} WHERE status = 'done' AND updated_at < ?",
+            [time.time() - older_than_days * 86400],
+        ).rowcount
+
+
+def status_counts(db: sqlite3.Connection | None = None) -> dict[str, int]:
+    """{status: job count} for every status (zeros included)."""
+    db = db or connect()
+    counts = dict.fromkeys(STATUSES, 0)
+    for status, n in db.execute(
+        f"SELECT status, count(*) FROM {JOBS_TABLE} GROUP BY status"
+    ):
+        counts[status] = n
+    return counts
+
+
+def entry_status(db: sqlite3.Connection, entry_ids) -> dict[int, str]:
+    """Latest job status per entry (entries without jobs are omitted)."""
+    ids = [int(i) for i in entry_ids]
+    if not ids:
+        return {}
+    rows = db.execute(
+        f"""
+        SELECT entry_id, status FROM {JOBS_TABLE}
+        WHERE id IN (SELECT max(id) FROM {JOBS_TABLE}
+                     WHERE entry_id IN ({', '.join('?' * len(ids))})
+                     GROUP BY entry_id)
+        """,
+        ids,
+    )
+    return {row[0]: row[1] for row in rows}
@@ -0,0 +1,147 @@
+"""
+journal.legacy
+--------------
+Import the pre-SQLite JSON journal: one top-level array of
+{timestamp, text, summary, mood} objects.
+
+iter_json_array() parses the file incrementally, one element at a time
+out of a fixed-size read buffer, so memory stays flat whatever the file
+size. Each element is validated by ingest.normalise, like a `journal
+ingest` record, and goes through storage.add_entries in batched
+transactions. After each batch, the number of elements consumed is
+checkpointed in `meta` under a key derived from the file's path, size
+and mtime, so an interrupted import resumes after its last committed
+batch. Duplicate timestamps are skipped on insert, so overlapping with
+an earlier partial run is harmless anyway.
+"""
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, TextIO
+
+from journal import ingest, storage
+
+LEGACY_PATH = Path.home() / ".ai_chat_journal.json"
+READ_SIZE = 1 << 16
+CHECKPOINT_PREFIX = "legacy_import:"
+
+_WHITESPACE = re.compile(r"\s*")
+_NUMBER_CHARS = set("0123456789.eE+-")
+
+
+def iter_json_array(f: TextIO, read_size: int = READ_SIZE) -> Iterator:
+    """Yield the elements of the JSON array in `f` one by one."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def refill() -> bool:
+        nonlocal buf, pos, eof
+        more = f.read(read_size)
+        eof = not more
+        buf, pos = buf[pos:] + more, 0
+        return not eof
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not refill():
+                raise ValueError("unexpected end of file: JSON array not closed")
+
+    if next_char() != "[":
+        raise ValueError("expected a JSON array of entries")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof or not refill():
+                    raise
+                continue
+            # A number cut by the end of the buffer ("12" of "123", "2." of
+            # "2.5") decodes fine but short: only trust it once the
+            # character after it is in and can't continue it.
+            if (isinstance(value, (int, float)) and not isinstance(value, bool) and not eof
+                    and (end == len(buf) or buf[end] in _NUMBER_CHARS) and refill()):
+                continue
+            break
+        pos = end
+        yield value
+        separator = next_char()
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"expected ',' or ']' in JSON array, found {separator!r}")
+
+
+@dataclass
+class LegacyReport:
+    read: int = 0
+    added: int = 0
+    resumed_from: int = 0   # elements skipped thanks to an earlier checkpoint
+    invalid: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Elements read per second."""
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def checkpoint_key(path: Path) -> str:
+    stat = path.stat()
+    return f"{CHECKPOINT_PREFIX}{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def import_legacy(
+    path: str | Path = LEGACY_PATH,
+    batch_size: int = storage.ADD_BATCH,
+    progress: Callable[[LegacyReport], None] | None = None,
+) -> LegacyReport:
+    """
+    Import the legacy JSON file at `path`, resuming from its checkpoint.
+    Elements that ingest.normalise rejects (no text, a bad timestamp or
+    mood, …) are counted as invalid and skipped.
+    """
+    path = Path(path).expanduser()
+    key = checkpoint_key(path)
+    report = LegacyReport(resumed_from=int(storage.get_meta(key, 0)))
+    started = time.perf_counter()
+    consumed = 0
+
+    def entries() -> Iterator[dict]:
+        nonlocal consumed
+        with path.open(encoding="utf-8") as f:
+            for item in iter_json_array(f):
+                consumed += 1
+                if consumed <= report.resumed_from:
+                    continue
+                report.read += 1
+                try:
+                    entry = ingest.normalise(item)
+                except ingest.InvalidRecord:
+                    report.invalid += 1
+                    continue
+                yield entry
+
+    def committed(new: list[dict]) -> None:
+        # Every element consumed so far is in a committed batch (or invalid).
+        report.added += len(new)
+        storage.set_meta(key, consumed)
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    storage.add_entries(entries(), batch_size=batch_size, on_added=committed)
+    storage.set_meta(key, consumed)  # trailing invalid elements
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,52 @@
+"""
+journal.ratelimit
+-----------------
+Thread-safe token bucket shared by every worker of a bulk run.
+
+`acquire()` blocks until a request may be sent; `pause()` stops *all*
+callers for a while, which is how one worker's 429 turns into a
+backoff for the whole pool instead of each thread hammering the API.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float | None = None, burst: int | None = None):
+        """
+        `rate` is requests per second (None = unthrottled, but `pause()`
+        is still honoured). `burst` caps how many tokens can pile up.
+        """
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate or 1)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and no pause is active."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate is None:
+                    return
+                else:
+                    elapsed = now - self._updated
+                    self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for at least `seconds` and drain the bucket."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = max(self._updated, self._paused_until)
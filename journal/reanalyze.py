@@ -0,0 +1,123 @@
+"""
+journal.reanalyze
+-----------------
+Re-run analysis only where it is out of date (`journal reanalyze --stale`).
+
+Every analysis write records the analyser's model and version
+(ai.fingerprint()) and a hash of the analysed text (see journal.db).
+plan() finds entries whose summary came from another analyser or whose
+text has changed since, and estimates requests, tokens, cost and time.
+run() works through them in id order, one committed page at a time: an
+interrupted run loses at most the page in flight, and since finished
+entries are no longer stale, running it again resumes where it stopped.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from journal import ai, batch, storage
+from journal.db import connect, TABLE
+
+PAGE_SIZE = 500
+REPLY_TOKENS = 100  # JSON summary + mood per entry, roughly
+
+
+def _stale_where(model: str, version: str, include_unknown: bool) -> tuple[str, list]:
+    sql = ("summary IS NOT NULL AND (analysis_model IS NOT ? OR analysis_version IS NOT ? "
+           "OR text_hash IS NOT text_hash(text))")
+    if not include_unknown:
+        sql += " AND analysis_version IS NOT NULL"
+    return sql, [model, version]
+
+
+@dataclass
+class Plan:
+    provider: str
+    model: str
+    version: str
+    include_unknown: bool = False
+    entries: int = 0
+    changed_text: int = 0
+    other_analyser: int = 0
+    unknown: int = 0          # analysed before provenance was recorded
+    fallback: int = 0         # the reply was malformed; stored as-is
+    requests: int = 0
+    prompt_tokens: int = 0
+    reply_tokens: int = 0
+    cost: float = 0.0         # USD, list prices
+    seconds: float = 0.0
+
+
+def plan(provider: str | None = None, include_unknown: bool = False,
+         concurrency: int = 4, rps: float | None = None, batch_size: int = 1) -> Plan:
+    """Count stale entries for `provider` and estimate what redoing them costs."""
+    backend = ai.get_provider(provider)
+    model, version = ai.fingerprint(provider)
+    result = Plan(backend.name, model, version, include_unknown)
+    where, params = _stale_where(model, version, include_unknown)
+    db = connect()
+    row = db.execute(
+        f"""
+        SELECT count(*),
+               coalesce(sum(text_hash IS NOT text_hash(text)), 0),
+               coalesce(sum(analysis_model IS NOT ? OR analysis_version IS NOT ?), 0),
+               coalesce(sum(length(text) / 4 + 1), 0)
+        FROM {TABLE} WHERE {where}
+        """,
+        [model, version, *params],
+    ).fetchone()
+    result.entries, result.changed_text, result.other_analyser, entry_tokens = row
+    result.unknown, result.fallback = db.execute(
+        f"SELECT coalesce(sum(analysis_version IS NULL), 0), "
+        f"coalesce(sum(analysis_version IS ?), 0) FROM {TABLE} WHERE summary IS NOT NULL",
+        [storage.FALLBACK_VERSION],
+    ).fetchone()
+
+    prompt_overhead = ai.estimate_tokens(ai.PACKED_PROMPT if batch_size > 1 else ai.SYSTEM_PROMPT)
+    result.requests = -(-result.entries // max(1, batch_size))
+    result.prompt_tokens = entry_tokens + result.requests * prompt_overhead
+    result.reply_tokens = result.entries * REPLY_TOKENS
+    price_in, price_out = backend.price_per_1k
+    result.cost = (result.prompt_tokens * price_in + result.reply_tokens * price_out) / 1000
+    result.seconds = result.requests * backend.seconds_per_request / max(1, concurrency)
+    if rps:
+        result.seconds = max(result.seconds, result.requests / rps)
+    return result
+
+
+@dataclass
+class RunReport:
+    analysed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+
+def run(stale: Plan, concurrency: int = 4, rps: float | None = None, batch_size: int = 1,
+        page_size: int = PAGE_SIZE,
+        progress: Callable[[int, int], None] | None = None) -> RunReport:
+    """
+    Re-analyse the entries `stale` counted, `page_size` at a time through
+    batch.analyse_entries. Failures stay stale for the next run.
+    """
+    ai.set_provider(stale.provider)
+    where, params = _stale_where(stale.model, stale.version, stale.include_unknown)
+    report = RunReport()
+    started = time.perf_counter()
+    db = connect()
+    after_id = 0
+    while True:
+        page = [dict(row) for row in db.execute(
+            f"SELECT id, text FROM {TABLE} WHERE id > ? AND {where} ORDER BY id LIMIT ?",
+            [after_id, *params, page_size],
+        )]
+        if not page:
+            break
+        result = batch.analyse_entries(page, concurrency=concurrency, rps=rps,
+                                       batch_size=batch_size)
+        report.analysed += result.analysed
+        report.failed += result.failed
+        after_id = page[-1]["id"]
+        if progress:
+            progress(report.analysed + report.failed, stale.entries)
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,289 @@
+"""
+journal.shards
+--------------
+Many journals, one SQLite file each (see db.journal_path), so journals
+grow and take write locks independently.
+
+A process works on one journal at a time: JOURNAL_NAME or
+`journal --journal NAME` picks it, and use() switches. The catalog
+(CATALOG_PATH, a small SQLite file next to the journals) records every
+journal by name; journal files found on disk that it doesn't know yet
+are added when journals are listed.
+
+Cross-journal commands (`stats`, `search`, `export`, `analyze` with
+--all-journals) fan out over a process pool, one task per journal, and
+merge the results in the parent: each journal is a separate file with
+its own lock, so the work scales with cores rather than queueing behind
+one writer.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from journal import db, trace
+
+CATALOG_PATH = db.JOURNALS_DIR / "catalog.db"
+CATALOG_DDL = """
+    CREATE TABLE IF NOT EXISTS journals (
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+"""
+
+
+def _catalog() -> sqlite3.Connection:
+    CATALOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(CATALOG_PATH), timeout=db.BUSY_TIMEOUT_MS / 1000)
+    conn.execute(CATALOG_DDL)
+    return conn
+
+
+def register(name: str) -> Path:
+    """Add `name` to the catalog (no-op if known) and create its database."""
+    path = db.journal_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db.connect(path).close()
+    conn = _catalog()
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO journals VALUES (?, ?, ?)",
+                     [name, str(path), time.time()])
+    conn.close()
+    return path
+
+
+def journals() -> dict[str, Path]:
+    """Every known journal, name -> database file, in name order."""
+    found = {}
+    if db.journal_path(db.DEFAULT_JOURNAL).exists():
+        found[db.DEFAULT_JOURNAL] = db.journal_path(db.DEFAULT_JOURNAL)
+    if db.JOURNALS_DIR.is_dir():
+        for path in db.JOURNALS_DIR.glob("*.db"):
+            if path != CATALOG_PATH and db.JOURNAL_NAME_RE.match(path.stem):
+                found[path.stem] = path
+    if found.keys() - {db.DEFAULT_JOURNAL} or CATALOG_PATH.exists():
+        conn = _catalog()
+        with conn:
+            known = {name for (name,) in conn.execute("SELECT name FROM journals")}
+            conn.executemany("INSERT OR IGNORE INTO journals VALUES (?, ?, ?)",
+                             [(name, str(path), time.time())
+                              for name, path in found.items() if name not in known])
+            # Catalogued journals whose file is gone are left out, not forgotten.
+        conn.close()
+    return dict(sorted(found.items()))
+
+
+_current = os.environ.get("JOURNAL_NAME") or db.DEFAULT_JOURNAL
+_inherited: list = []  # connections a forked worker must neither use nor close
+
+
+def current() -> str:
+    """Name of the journal this process is using."""
+    return _current
+
+
+def use(name: str) -> Path:
+    """
+    Point this process at journal `name`, creating and cataloguing it if
+    new: later storage/cache/embed/jobs calls open its file. Connections
+    to the previous journal are closed.
+    """
+    global _current
+    path = db.journal_path(name)
+    if name != db.DEFAULT_JOURNAL and not path.exists():
+        register(name)
+    _current = name
+    if path != db.DB_PATH:
+        switch(path)
+    return path
+
+
+def switch(path: str | Path, close: bool = True) -> None:
+    """
+    Point journal.db and the modules' cached connections at `path`.
+    With close=False the old connections are dropped but left open (in
+    a forked child, closing the parent's connections would touch its
+    locks).
+    """
+    from journal import storage
+
+    conns = [getattr(storage._local, "conn", None)]
+    storage._local = threading.local()
+    # Only reset modules already loaded; embed pulls in numpy.
+    embed = sys.modules.get("journal.embed")
+    if embed is not None:
+        conns.append(getattr(embed._local, "conn", None))
+        embed._local = threading.local()
+    cache = sys.modules.get("journal.cache")
+    if cache is not None:
+        if close:
+            cache.flush()  # buffered lookups belong to the journal being left
+        else:
+            cache._drop_pending()  # the parent writes its own
+        conns.append(getattr(cache._local, "db", None))
+        cache._local = threading.local()
+        cache._pruned.clear()
+    for conn in filter(None, conns):
+        if close:
+            conn.close()
+        else:
+            _inherited.append(conn)
+    db.DB_PATH = Path(path)
+
+
+# ---------- Fan-out ---------------------------------------------------------
+
+def _detach() -> None:
+    """Pool initializer: SQLite connections must not cross a fork."""
+    switch(db.DB_PATH, close=False)
+
+
+def _run_in(name: str, fn, args: tuple):
+    use(name)
+    try:
+        return fn(*args)
+    finally:
+        cache = sys.modules.get("journal.cache")
+        if cache is not None:
+            cache.flush()  # pool workers exit without running atexit hooks
+
+
+def fan_out(fn, args: tuple = (), names=None, workers: int | None = None) -> dict:
+    """
+    Run fn(*args) once per journal (default: all) in a process pool and
+    return {journal name: result}. `fn` must be a module-level function
+    and its arguments and result picklable. A single journal runs here.
+    """
+    names = list(names or journals())
+    if not names:
+        return {}
+    with trace.span("shards.fan_out", rows=len(names), fn=fn.__name__):
+        if len(names) == 1:
+            previous = current()
+            try:
+                return {names[0]: _run_in(names[0], fn, args)}
+            finally:
+                use(previous)
+        workers = min(workers or os.cpu_count() or 1, len(names))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_detach) as pool:
+            futures = {name: pool.submit(_run_in, name, fn, args) for name in names}
+            return {name: future.result() for name, future in futures.items()}
+
+
+# ---------- Cross-journal operations ---------------------------------------
+# Each *_part function runs inside one journal; the caller merges.
+
+def _stats_part(by: str) -> dict:
+    from journal import cache, jobs, storage
+
+    return {"totals": storage.mood_totals(), "periods": storage.mood_rollup(by),
+            "cache": cache.stats(), "jobs": jobs.status_counts()}
+
+
+def _merge_moods(rows: list[dict], into: dict) -> None:
+    """Combine {entries, moods, avg, min/max or best/worst} rows into `into`."""
+    total = sum(r["avg"] * r["moods"] for r in rows if r["avg"] is not None)
+    into["entries"] = sum(r["entries"] for r in rows)
+    into["moods"] = sum(r["moods"] for r in rows)
+    into["avg"] = total / into["moods"] if into["moods"] else None
+    for key, pick in (("min", min), ("max", max), ("best", max), ("worst", min)):
+        values = [r[key] for r in rows if r.get(key) is not None]
+        if key in rows[0]:
+            into[key] = pick(values) if values else None
+
+
+def stats(by: str = "day", names=None, workers: int | None = None) -> dict:
+    """
+    storage.mood_totals / mood_rollup, cache.stats and jobs.status_counts
+    across journals: {"totals", "periods", "cache", "jobs", "journals"}.
+    Averages are weighted by the number of moods behind them.
+    """
+    parts = fan_out(_stats_part, (by,), names, workers)
+    merged = {"journals": len(parts), "totals": {}, "periods": [], "cache": {}, "jobs": {}}
+    if not parts:
+        return merged
+    _merge_moods([p["totals"] for p in parts.values()], merged["totals"])
+    periods: dict[str, list] = {}
+    for part in parts.values():
+        for row in part["periods"]:
+            periods.setdefault(row["period"], []).append(row)
+    for period in sorted(periods):
+        row = {"period": period}
+        _merge_moods(periods[period], row)
+        merged["periods"].append(row)
+    for key in ("cache", "jobs"):
+        for part in parts.values():
+            for name, value in part[key].items():
+                if isinstance(value, (int, float)):
+                    merged[key][name] = merged[key].get(name, 0) + value
+    return merged
+
+
+def _search_part(query: str, limit: int) -> list[dict]:
+    from journal import storage
+
+    return storage.search(query, limit=limit)
+
+
+def search(query: str, limit: int = 20, names=None, workers: int | None = None) -> list[dict]:
+    """
+    storage.search in every journal, best `limit` hits overall, each
+    tagged with its `journal`. bm25 scores use each journal's own term
+    statistics, so the ranking across journals is approximate.
+    """
+    hits = []
+    for name, part in fan_out(_search_part, (query, limit), names, workers).items():
+        hits += [{**hit, "journal": name} for hit in part]
+    return sorted(hits, key=lambda hit: hit["rank"])[:limit]
+
+
+def _export_part(base: str, fmt: str, options: dict) -> str:
+    path = Path(base).expanduser()
+    target = path.with_name(f"{path.stem}-{current()}")
+    if fmt == "md":
+        from journal import export
+
+        return str(export.export_markdown(target.with_suffix(".md"), **options))
+    from journal import snapshot
+
+    return str(snapshot.export_snapshot(target, fmt, **options))
+
+
+def export(base: str | Path, fmt: str = "md", names=None, workers: int | None = None,
+           **options) -> dict[str, Path]:
+    """
+    Export every journal to its own file, `<base>-<journal>.<ext>`, in
+    parallel. `options` go to export.export_markdown or
+    snapshot.export_snapshot. Returns {journal name: path}.
+    """
+    parts = fan_out(_export_part, (str(base), fmt, options), names, workers)
+    return {name: Path(path) for name, path in parts.items()}
+
+
+def _analyse_part(provider: str | None, concurrency: int, rps: float | None,
+                  batch_size: int):
+    from journal import ai, batch, storage
+
+    if provider:
+        ai.set_provider(provider)
+    pending = list(storage.query_entries(unanalyzed=True, columns=["id", "text"]))
+    if not pending:
+        return batch.BatchReport()
+    return batch.analyse_entries(pending, concurrency=concurrency, rps=rps,
+                                 batch_size=batch_size)
+
+
+def analyse(provider: str | None = None, concurrency: int = 4, rps: float | None = None,
+            batch_size: int = 1, names=None, workers: int | None = None) -> dict:
+    """
+    Analyse every journal's unanalysed entries, one process per journal
+    with `concurrency` requests each. `rps` is the overall rate limit,
+    split evenly between journals. Returns {journal name: BatchReport}.
+    """
+    names = list(names or journals())
+    share = rps / len(names) if rps and names else rps
+    return fan_out(_analyse_part, (provider, concurrency, share, batch_size), names, workers)
@@ -0,0 +1,275 @@
+"""
+journal.snapshot
+----------------
+Columnar snapshots of the journal: Parquet or Arrow IPC files
+(`journal export --format parquet|arrow`, `journal import FILE.parquet`).
+
+Unlike the Markdown export, a snapshot is lossless: it keeps ids,
+`updated_at` and the analysis provenance columns, and loads straight
+into pandas/pyarrow without parsing. Export streams record batches
+from a SQLite cursor, so memory stays flat; import reads them back one
+batch at a time.
+
+Parquet files are zstd-compressed (smallest, for backups). Arrow files
+are uncompressed by default so that read_table() can memory-map them:
+columns are then read in place from the page cache rather than copied,
+which is what the dashboard does with JOURNAL_SNAPSHOT (see
+journal.frames.SnapshotFrame). Compressing an Arrow file (lz4/zstd)
+makes it smaller but loses that.
+
+Needs pyarrow (imported lazily; nothing else in the journal does).
+"""
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from journal import storage, trace
+from journal.db import TABLE
+
+FORMATS = ("parquet", "arrow")
+SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow"}
+SUFFIX_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow",
+                  ".feather": "arrow", ".ipc": "arrow"}
+DEFAULT_COMPRESSION = {"parquet": "zstd", "arrow": None}
+BATCH_ROWS = 50_000  # rows per record batch (and per Parquet row group)
+
+# Stored columns, in file order. Only id, timestamp and text are required
+# on import, so snapshots from before a column existed still load.
+COLUMNS = ("id", "timestamp", "text", "summary", "mood", "updated_at",
+           "analysis_model", "analysis_version", "analysed_at", "text_hash")
+REQUIRED = ("id", "timestamp", "text")
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field("id", pa.int64(), nullable=False),
+        pa.field("timestamp", pa.string(), nullable=False),
+        pa.field("text", pa.string(), nullable=False),
+        pa.field("summary", pa.string()),
+        pa.field("mood", pa.int8()),
+        pa.field("updated_at", pa.float64()),
+        pa.field("analysis_model", pa.string()),
+        pa.field("analysis_version", pa.string()),
+        pa.field("analysed_at", pa.float64()),
+        pa.field("text_hash", pa.string()),
+    ], metadata={"journal.snapshot": "1"})
+
+
+def format_for(path: str | Path) -> str | None:
+    """Snapshot format from a file suffix, or None if it isn't one."""
+    return SUFFIX_FORMATS.get(Path(path).suffix.lower())
+
+
+def _batches(start=None, end=None, after_id=None,
+             batch_rows: int = BATCH_ROWS) -> Iterator[tuple[list[tuple], int]]:
+    """Yield (rows, last id) pages of the matching entries in id order."""
+    where, params = storage._where(start, end, after_id=after_id)
+    cursor = storage._db().cursor()
+    cursor.row_factory = None  # plain tuples: cheaper than sqlite3.Row to build and transpose
+    cursor.execute(f"SELECT {', '.join(COLUMNS)} FROM {TABLE} WHERE {where} ORDER BY id", params)
+    while True:
+        with trace.span("snapshot.fetch") as span:
+            rows = cursor.fetchmany(batch_rows)
+            span.set(rows=len(rows))
+        if not rows:
+            return
+        yield rows, rows[-1][0]
+
+
+def export_snapshot(
+    path: str | Path,
+    fmt: str | None = None,
+    start=None,
+    end=None,
+    since_last: bool = False,
+    compression: str | None = "default",
+    batch_rows: int = BATCH_ROWS,
+) -> Path:
+    """
+    Write the selected entries to a Parquet or Arrow file; return Path.
+
+    `fmt` defaults to the file's suffix (else Parquet), and the suffix
+    is added if missing. `start`/`end`/`since_last` select entries as in
+    export.export_markdown (and share its since_last watermark).
+    `compression` is a codec name or None; "default" is zstd for
+    Parquet and none for Arrow.
+    """
+    import pyarrow as pa
+
+    from journal.export import LAST_EXPORT_KEY
+
+    out_path = Path(path).expanduser()
+    fmt = fmt or format_for(out_path) or "parquet"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {fmt!r}; choose from {', '.join(FORMATS)}")
+    if format_for(out_path) != fmt:
+        out_path = out_path.with_name(out_path.name + SUFFIXES[fmt])
+    if compression == "default":
+        compression = DEFAULT_COMPRESSION[fmt]
+
+    after_id = int(storage.get_meta(LAST_EXPORT_KEY, 0)) if since_last else None
+    schema = _schema()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(out_path, schema, compression=compression or "none")
+        write = writer.write_batch
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        writer = pa.ipc.new_file(str(out_path), schema, options=options)
+        write = writer.write_batch
+
+    last_id, total = after_id, 0
+    with trace.span(f"snapshot.export.{fmt}") as span:
+        try:
+            for rows, last_id in _batches(start, end, after_id, batch_rows):
+                arrays = [pa.array(values, type=field.type)
+                          for values, field in zip(zip(*rows), schema)]
+                write(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                total += len(rows)
+        finally:
+            writer.close()
+        span.set(rows=total)
+
+    if since_last and last_id:
+        storage.set_meta(LAST_EXPORT_KEY, last_id)
+    return out_path
+
+
+def read_table(path: str | Path, columns: list[str] | None = None):
+    """
+    The snapshot at `path` as a pyarrow.Table. Arrow files are
+    memory-mapped (zero-copy unless compressed); Parquet is decoded.
+    """
+    import pyarrow as pa
+
+    path = Path(path).expanduser()
+    with trace.span("snapshot.read") as span:
+        if format_for(path) == "arrow":
+            table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+            if columns:
+                table = table.select(columns)
+        else:
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path, columns=columns, memory_map=True)
+        span.set(rows=table.num_rows)
+    return table
+
+
+def _read_batches(path: Path, batch_rows: int):
+    import pyarrow as pa
+
+    if format_for(path) == "arrow":
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        import pyarrow.parquet as pq
+
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_rows)
+
+
+@dataclass
+class SnapshotReport:
+    read: int = 0
+    added: int = 0
+    renumbered: int = 0   # added under a new id: theirs was taken by another entry
+    seconds: float = 0.0
+
+    @property
+    def skipped(self) -> int:
+        """Entries not added: their timestamp was already in the journal."""
+        return self.read - self.added
+
+    @property
+    def rate(self) -> float:
+        """Entries read per second."""
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+INSERT_SQL = (f"INSERT OR IGNORE INTO {TABLE} ({', '.join(COLUMNS)}) "
+              f"VALUES ({', '.join('?' * len(COLUMNS))})")
+LOOKUP_CHUNK = 500  # ids / timestamps per IN (...) lookup, under SQLite's variable limit
+
+
+def _existing(db, column: str, values: list) -> set:
+    """The subset of `values` already present in entries.<column>."""
+    found = set()
+    for i in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[i:i + LOOKUP_CHUNK]
+        found.update(r[0] for r in db.execute(
+            f"SELECT {column} FROM {TABLE} WHERE {column} IN ({', '.join('?' * len(chunk))})",
+            chunk))
+    return found
+
+
+def _batch_rows(batch) -> list[tuple]:
+    """A record batch as COLUMNS tuples (missing columns as NULL)."""
+    missing = [c for c in REQUIRED if c not in batch.schema.names]
+    if missing:
+        raise ValueError(f"not a journal snapshot (no {', '.join(missing)} column)")
+    columns = [batch.column(c).to_pylist() if c in batch.schema.names
+               else [None] * batch.num_rows for c in COLUMNS]
+    return list(zip(*columns))
+
+
+def import_snapshot(
+    path: str | Path,
+    dry_run: bool = False,
+    batch_rows: int = BATCH_ROWS,
+    progress: Callable[[SnapshotReport], None] | None = None,
+) -> SnapshotReport:
+    """
+    Add the entries of a snapshot that aren't in the journal yet (by
+    timestamp, as on import), one transaction per record batch. With
+    `dry_run`, only count them. Entries keep their snapshot id unless
+    another entry already has it; those get a new id above both the
+    journal's and the snapshot's, so they can't displace later rows.
+    New entries without a summary are queued for analysis.
+    """
+    import pyarrow.compute as pc
+
+    from journal import jobs
+
+    path = Path(path).expanduser()
+    report = SnapshotReport()
+    started = time.perf_counter()
+    db = storage._db()
+    next_id = (pc.max(read_table(path, columns=["id"])["id"]).as_py() or 0) + 1
+
+    for batch in trace.timed_iter("snapshot.import.read", _read_batches(path, batch_rows)):
+        rows = _batch_rows(batch)
+        report.read += len(rows)
+        with trace.span("snapshot.import.insert", rows=len(rows)), db:
+            if not dry_run:
+                db.execute("BEGIN IMMEDIATE")  # nobody else takes ids until we commit
+            seen = _existing(db, "timestamp", [row[1] for row in rows])
+            taken = _existing(db, "id", [row[0] for row in rows])
+            next_id = max(next_id, db.execute(
+                f"SELECT coalesce(max(id), 0) + 1 FROM {TABLE}").fetchone()[0])
+            new = []
+            for row in rows:
+                if row[1] in seen:
+                    continue
+                seen.add(row[1])
+                if row[0] in taken:
+                    row = (next_id,) + row[1:]
+                    next_id += 1
+                    report.renumbered += 1
+                taken.add(row[0])
+                new.append(row)
+            report.added += len(new)
+            if not dry_run:
+                db.executemany(INSERT_SQL, new)
+                storage._refresh_days(db, [row[1] for row in new])
+                jobs.enqueue(db, [row[0] for row in new if row[3] is None])
+        report.seconds = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    report.seconds = time.perf_counter() - started
+    return report
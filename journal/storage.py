@@ -3,38 +3,572 @@ journal.storage
 ---------------
 All persistence logic for AI Chat Journal.
 
-Switched from plain JSON to SQLite (see journal.db).
+Switched from plain JSON to SQLite (see journal.db). The connection
+is opened on first use, so importing this module costs nothing.
 """
-from datetime import datetime
-from dateutil import tz
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable
 
-from journal.db import get_db, TABLE
+from journal import jobs, trace
+from journal.db import (connect, TABLE, ROLLUP_TABLE, ROLLUP_SQL, META_TABLE, JOBS_TABLE,
+                        CHANGES_TABLE)
 
-# Single shared connection and table handle
-db = get_db()
-table = db[TABLE]
+_local = threading.local()  # sqlite3 connections are per-thread
+ADD_BATCH = 1_000  # entries per transaction in add_entries()
 
 
-def add_entry(text: str) -> None:
-    """Insert a new journal entry into the SQLite table."""
-    entry = {
-        "timestamp": datetime.now(tz.tzlocal()).isoformat(),
-        "text": text,
-        "summary": None,
-        "mood": None,
-    }
-    table.insert(entry)  # SQLite assigns an auto‑increment id
+def _db() -> sqlite3.Connection:
+    """This thread's connection, opened lazily."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        with trace.span("storage.connect"):
+            conn = _local.conn = connect()
+    return conn
+
+
+def _rows(cursor) -> list[dict]:
+    return [dict(row) for row in cursor]
+
+
+_last_now: datetime | None = None
+
+
+def _now() -> str:
+    """
+    Local time + offset as ISO 8601. Timestamps identify entries, so two
+    entries written in the same microsecond are stamped 1 µs apart.
+    """
+    global _last_now
+    moment = datetime.now().astimezone()
+    if _last_now is not None and moment <= _last_now:
+        moment = _last_now + timedelta(microseconds=1)
+    _last_now = moment
+    return moment.isoformat()
+
+
+@trace.traced("storage.add_entry")
+def add_entry(text: str) -> int:
+    """
+    Insert a new journal entry and queue it for analysis (see
+    journal.jobs). Returns the new id.
+    """
+    timestamp = _now()
+    with _db() as db:  # row + rollup + job in one transaction (one fsync)
+        # SQLite assigns an auto‑increment id
+        entry_id = db.execute(
+            f"INSERT INTO {TABLE} (timestamp, text) VALUES (?, ?)", [timestamp, text]
+        ).lastrowid
+        _refresh_days(db, [timestamp])
+        jobs.enqueue(db, [entry_id])
+    return entry_id
+
+
+def _entry_row(entry: str | dict) -> tuple:
+    if isinstance(entry, str):
+        return _now(), entry, None, None
+    return (_as_bound(entry.get("timestamp")) or _now(), entry["text"],
+            entry.get("summary"), entry.get("mood"))
+
+
+@trace.traced("storage.add_entries")
+def add_entries(entries: Iterable[str | dict], batch_size: int = ADD_BATCH,
+                on_added: Callable[[list[dict]], None] | None = None) -> int:
+    """
+    Insert many entries, `batch_size` per transaction, and return how
+    many were added. Items are texts (stamped now) or dicts with `text`
+    and optional `timestamp`, `summary` and `mood`. An entry whose
+    timestamp is already in the journal is skipped, as on import.
+    Entries without a summary are queued for analysis. After each
+    batch, on_added() gets its new entries as {id, text, summary} dicts.
+    """
+    added, batch = 0, []
+
+    def flush():
+        nonlocal added
+        new = _insert_rows(batch)
+        added += len(new)
+        if on_added:
+            on_added([{"id": row[0], "text": row[3], "summary": row[2]} for row in new])
+
+    for entry in entries:
+        batch.append(_entry_row(entry))
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return added
+
+
+def _insert_rows(rows: list[tuple]) -> list[sqlite3.Row]:
+    """
+    (timestamp, text, summary, mood) rows + rollups + jobs in one
+    transaction. Returns the new rows as (id, timestamp, summary, text).
+    """
+    with trace.span("storage.insert_rows", rows=len(rows)), _db() as db:
+        db.execute("BEGIN IMMEDIATE")  # take the write lock first, so max(id) stays ours
+        last_id = db.execute(f"SELECT coalesce(max(id), 0) FROM {TABLE}").fetchone()[0]
+        db.executemany(
+            f"INSERT OR IGNORE INTO {TABLE} (timestamp, text, summary, mood) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        # ignored rows don't consume ids, so new rows are exactly those past last_id
+        new = db.execute(f"SELECT id, timestamp, summary, text FROM {TABLE} WHERE id > ?",
+                         [last_id]).fetchall()
+        _refresh_days(db, [row[1] for row in new])
+        jobs.enqueue(db, [row[0] for row in new if row[2] is None])
+    return new
+
+
+class EntryWriter:
+    """
+    Buffers entries from a high-rate source (stdin, a transcription
+    stream) and writes them with add_entries() once `max_rows` are
+    waiting or the oldest has waited `max_delay` seconds. Texts are
+    stamped when added, not when written. close() (or leaving a `with`
+    block) writes the rest; `added` counts entries written so far.
+    """
+
+    def __init__(self, max_rows: int = ADD_BATCH, max_delay: float = 1.0):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.added = 0
+        self._rows: list[tuple] = []
+        self._oldest = 0.0
+
+    def add(self, entry: str | dict) -> None:
+        if not self._rows:
+            self._oldest = time.monotonic()
+        self._rows.append(_entry_row(entry))
+        if len(self._rows) >= self.max_rows or time.monotonic() - self._oldest >= self.max_delay:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._rows:
+            rows, self._rows = self._rows, []
+            self.added += len(_insert_rows(rows))
+
+    close = flush
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+COLUMNS = ("id", "timestamp", "text", "summary", "mood")
+SELECTABLE = COLUMNS + ("updated_at",)  # updated_at only on request
+SNIPPET_MARK = ("\x02", "\x03")  # wraps matched terms in search() snippets
+
+
+def _as_bound(value) -> str | None:
+    """Accept date / datetime / ISO string bounds for timestamp filters."""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def timestamp_range(start=None, end=None) -> tuple[str | None, str | None]:
+    """
+    start/end filters as ISO strings for `start <= timestamp < end`
+    (a bare `end` date means "through the end of that day").
+    """
+    start, end = _as_bound(start), _as_bound(end)
+    if end is not None and len(end) == 10:
+        end = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+    return start, end
+
+
+def _where(start=None, end=None, unanalyzed=False, after_id=None, before_id=None,
+           prefix: str = ""):
+    """WHERE clause and params; `prefix` qualifies the columns (e.g. "e.") in joins."""
+    clauses, params = [], []
+    start, end = timestamp_range(start, end)
+    if start is not None:
+        clauses.append(f"{prefix}timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append(f"{prefix}timestamp < ?")
+        params.append(end)
+    if unanalyzed:
+        clauses.append(f"{prefix}summary IS NULL")
+    if after_id is not None:
+        clauses.append(f"{prefix}id > ?")
+        params.append(int(after_id))
+    if before_id is not None:
+        clauses.append(f"{prefix}id < ?")
+        params.append(int(before_id))
+    return (" AND ".join(clauses) or "1"), params
+
+
+def query_entries(
+    start=None,
+    end=None,
+    unanalyzed: bool = False,
+    columns=None,
+    order_by: str = "id",
+    limit: int | None = None,
+    offset: int | None = None,
+    after_id: int | None = None,
+    before_id: int | None = None,
+):
+    """
+    Yield entries as dicts, streaming from SQLite instead of loading
+    the whole table.
+
+    `start`/`end` filter on timestamp (date, datetime or ISO string;
+    a bare `end` date is inclusive), `unanalyzed` keeps rows without a
+    summary, `columns` projects a subset of SELECTABLE. Paginate with
+    `limit`/`offset`, or keyset-style with `after_id` (pass the last id
+    of the previous page; requires order_by="id") or, newest first,
+    `before_id` with order_by="id desc".
+    """
+    select = ", ".join(c for c in (columns or COLUMNS) if c in SELECTABLE)
+    if order_by not in ("id", "timestamp", "id desc", "timestamp desc"):
+        raise ValueError(f"Unsupported order_by: {order_by!r}")
+    where, params = _where(start, end, unanalyzed, after_id, before_id)
+    sql = f"SELECT {select} FROM {TABLE} WHERE {where} ORDER BY {order_by}"
+    if limit is not None or offset is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset or 0]
+    for row in trace.timed_iter("storage.query_entries", _db().execute(sql, params)):
+        yield dict(row)
+
+
+@trace.traced("storage.count_entries")
+def count_entries(start=None, end=None, unanalyzed: bool = False,
+                  after_id: int | None = None) -> int:
+    """Number of entries matching the same filters as query_entries."""
+    where, params = _where(start, end, unanalyzed, after_id)
+    return _db().execute(f"SELECT count(*) FROM {TABLE} WHERE {where}", params).fetchone()[0]
+
+
+def change_marks() -> tuple[int, float | None]:
+    """(max id, max updated_at): the watermark pair for changed_entries()."""
+    row = _db().execute(f"SELECT coalesce(max(id), 0), max(updated_at) FROM {TABLE}").fetchone()
+    return row[0], row[1]
+
+
+def changed_entries(after_id: int, updated_after: float | None,
+                    start=None, end=None, unanalyzed: bool = False):
+    """
+    Yield entries added after `after_id` or edited after `updated_after`
+    (Unix time), with their `updated_at` and a `keep` flag saying whether
+    they match the same filters as query_entries. Both conditions are
+    index lookups, so this is cheap however large the journal is.
+    """
+    where, params = _where(start, end, unanalyzed)
+    sql = (f"SELECT {', '.join(COLUMNS)}, updated_at, ({where}) AS keep "
+           f"FROM {TABLE} WHERE id > ? OR updated_at > ?")
+    rows = _db().execute(sql, params + [int(after_id), updated_after or 0])
+    for row in trace.timed_iter("storage.changed_entries", rows):
+        yield dict(row)
+
+
+# ---------- Change feed -----------------------------------------------------
+# Triggers log every insert / edit / delete in CHANGES_TABLE (see
+# journal.db); clients keep the last `seq` they applied and ask for
+# what came after it.
+
+CHANGES_PAGE = 1_000   # changes per changes_since() call
+TOMBSTONE_DAYS = 30    # deletions older than this are compacted away
+CHANGES_FLOOR_KEY = "changes_floor"  # newest seq of a compacted-away deletion
+
+
+def last_change() -> int:
+    """Highest change number ever issued: a version stamp for the whole journal."""
+    row = _db().execute("SELECT seq FROM sqlite_sequence WHERE name = ?",
+                        [CHANGES_TABLE]).fetchone()
+    return row[0] if row else 0
+
+
+@trace.traced("storage.changes_since")
+def changes_since(seq: int = 0, limit: int = CHANGES_PAGE) -> dict:
+    """
+    What changed after change number `seq`, oldest first:
+
+        {"seq": cursor for the next call, "more": another page follows,
+         "reset": see below, "changes": [...]}
+
+    Each change carries an entry's current state, {"op": "upsert", "seq",
+    "id", "timestamp", "text", "summary", "mood", "updated_at"}, or is a
+    tombstone {"op": "delete", "seq", "id"}; an entry changed several
+    times appears once. The cost follows the number of changes after
+    `seq`, not the size of the journal.
+
+    `reset` means `seq` predates deletions that compact_changes() has
+    since dropped: the client should discard its copy and apply these
+    changes, which then start from 0. Treat cursors as opaque: while a
+    client is still catching up to the compaction floor they come back
+    negative, so the next page continues the replay instead of resetting
+    again, and the last page hands back a cursor at or past the floor.
+    """
+    floor = int(get_meta(CHANGES_FLOOR_KEY, 0))
+    catching_up = seq < 0
+    seq = abs(seq)
+    reset = 0 < seq < floor and not catching_up
+    if reset:
+        seq = 0
+    rows = _db().execute(
+        f"""
+        SELECT c.seq, c.entry_id, e.id IS NULL AS gone,
+               e.timestamp, e.text, e.summary, e.mood, e.updated_at
+        FROM (SELECT max(seq) AS seq FROM {CHANGES_TABLE} WHERE seq > ?
+              GROUP BY entry_id ORDER BY 1 LIMIT ?) AS latest
+        JOIN {CHANGES_TABLE} AS c ON c.seq = latest.seq
+        LEFT JOIN {TABLE} AS e ON e.id = c.entry_id
+        ORDER BY c.seq
+        """,
+        [int(seq), limit + 1],
+    ).fetchall()
+    changes = []
+    for row in rows[:limit]:
+        if row["gone"]:
+            changes.append({"op": "delete", "seq": row["seq"], "id": row["entry_id"]})
+        else:
+            changes.append({"op": "upsert", "seq": row["seq"], "id": row["entry_id"],
+                            **{k: row[k] for k in COLUMNS[1:] + ("updated_at",)}})
+    more = len(rows) > limit
+    cursor = changes[-1]["seq"] if changes else seq
+    if cursor < floor:
+        cursor = -cursor if more else floor
+    return {"seq": cursor, "more": more, "reset": reset, "changes": changes}
+
+
+@trace.traced("storage.compact_changes")
+def compact_changes(tombstone_days: float = TOMBSTONE_DAYS) -> int:
+    """
+    Keep only each entry's latest change (all changes_since() needs) and
+    drop deletions older than `tombstone_days`, so the log stays about
+    the size of the journal plus recent edits. Returns rows removed.
+    """
+    with _db() as db:
+        removed = db.execute(
+            f"DELETE FROM {CHANGES_TABLE} WHERE seq NOT IN "
+            f"(SELECT max(seq) FROM {CHANGES_TABLE} GROUP BY entry_id)"
+        ).rowcount
+        floor = db.execute(
+            f"SELECT max(seq) FROM {CHANGES_TABLE} WHERE op = 'delete' AND changed_at < ?",
+            [time.time() - tombstone_days * 86400],
+        ).fetchone()[0]
+        if floor:
+            removed += db.execute(f"DELETE FROM {CHANGES_TABLE} WHERE op = 'delete' AND seq <= ?",
+                                  [floor]).rowcount
+            # Clients behind the newest dropped tombstone must start over.
+            db.execute(f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES (?, ?)",
+                       [CHANGES_FLOOR_KEY, str(floor)])
+    return removed
+
+
+@trace.traced("storage.timestamp_bounds")
+def timestamp_bounds() -> tuple[str | None, str | None]:
+    """(oldest, newest) timestamp in the journal, via the timestamp index."""
+    row = _db().execute(f"SELECT min(timestamp), max(timestamp) FROM {TABLE}").fetchone()
+    return row[0], row[1]
+
+
+_FTS_TERM_RE = re.compile(r'\s+|(".*?")')
+
+
+def _fts_query(query: str) -> str:
+    """Quote each term (so NOT/OR/- are literal) and prefix-match it."""
+    if query.count('"') % 2:
+        query += '"'
+    terms = [t for t in _FTS_TERM_RE.split(query) if t and t != '""']
+    return " ".join(f'{t}*' if t.startswith('"') else f'"{t}"*' for t in terms)
+
+
+@trace.traced("storage.search")
+def search(query: str, limit: int = 20, offset: int = 0, start=None, end=None,
+           unanalyzed: bool = False) -> list[dict]:
+    """
+    Full-text search over text and summary, best matches first (bm25),
+    optionally within start/end and/or only unanalysed entries. Each hit
+    carries a `snippet` with matches wrapped in SNIPPET_MARK.
+    """
+    match = _fts_query(query)
+    if not match:  # blank, or nothing but quotes
+        return []
+    where, params = _where(start, end, unanalyzed, prefix="e.")
+    mark_start, mark_end = SNIPPET_MARK
+    sql = f"""
+        SELECT e.id, e.timestamp, e.summary, e.mood,
+               snippet({TABLE}_fts, -1, ?, ?, '…', 12) AS snippet,
+               bm25({TABLE}_fts) AS rank
+        FROM {TABLE}_fts
+        JOIN {TABLE} e ON e.id = {TABLE}_fts.rowid
+        WHERE {TABLE}_fts MATCH ? AND {where}
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """
+    return _rows(_db().execute(sql, [mark_start, mark_end, match, *params, limit, offset]))
+
+
+def get_meta(key: str, default=None):
+    """Read a small piece of bookkeeping state from the meta table."""
+    row = _db().execute(f"SELECT value FROM {META_TABLE} WHERE key = ?", [key]).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(key: str, value) -> None:
+    with _db() as db:
+        db.execute(
+            f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES (?, ?)",
+            [key, str(value)],
+        )
 
 
 def list_entries():
     """Return all entries as a list of dicts ordered by primary key."""
-    return list(table.rows)
+    return list(query_entries())
+
+
+@trace.traced("storage.get_entry")
+def get_entry(entry_id: int | str) -> dict | None:
+    """One entry by primary-key id, or None."""
+    row = _db().execute(f"SELECT * FROM {TABLE} WHERE id = ?", [int(entry_id)]).fetchone()
+    return dict(row) if row else None
 
 
 def update_entry(entry_id: int | str, summary: str, mood: int) -> None:
     """Update a single row identified by its primary‑key id."""
-    table.update(int(entry_id), {"summary": summary, "mood": mood})
+    update_entries([(entry_id, summary, mood)])
 
+@trace.traced("storage.update_text")
 def update_text(entry_id: int | str, new_text: str) -> None:
-    """Update only the text field for a given entry id."""
-    table.update(int(entry_id), {"text": new_text})
\ No newline at end of file
+    """Update only the text field for a given entry id and re-queue analysis."""
+    with _db() as db:
+        if db.execute(f"UPDATE {TABLE} SET text = ? WHERE id = ?",
+                      [new_text, int(entry_id)]).rowcount:
+            jobs.enqueue(db, [entry_id])
+
+FALLBACK_VERSION = "fallback"  # analysis_version of a malformed-reply fallback
+
+
+def update_entries(results, close_jobs: bool = True,
+                   analyser: tuple[str, str] | None = None, job_ids=()) -> int:
+    """
+    Write many (entry_id, summary, mood[, ok]) tuples in one transaction,
+    recording `analyser` (ai.fingerprint(): model, version) and the
+    text's hash as their provenance; None means unknown (e.g. a
+    hand-written summary). Results with ok=False (see
+    ai.analyse_checked) get FALLBACK_VERSION instead of the analyser's
+    version, so `reanalyze` counts them as stale. With `close_jobs`,
+    queued analysis jobs for those entries are marked done; the worker
+    passes False and its claimed `job_ids` instead, which are completed
+    in the same transaction. Returns the number of rows written.
+    """
+    model, version = analyser or (None, None)
+    now = time.time()
+    rows = []
+    for entry_id, summary, mood, *ok in results:
+        fell_back = version is not None and ok and not ok[0]
+        rows.append((summary, mood, model, FALLBACK_VERSION if fell_back else version,
+                     now, int(entry_id)))
+    ids = [row[-1] for row in rows]
+    with trace.span("storage.update_entries", rows=len(rows)), _db() as db:
+        # The hash is of the text as stored now: if it was edited while
+        # being analysed, update_text has queued it again anyway.
+        db.executemany(
+            f"UPDATE {TABLE} SET summary = ?, mood = ?, analysis_model = ?, "
+            "analysis_version = ?, analysed_at = ?, text_hash = text_hash(text) WHERE id = ?",
+            rows,
+        )
+        if close_jobs:
+            db.executemany(
+                f"UPDATE {JOBS_TABLE} SET status = 'done', updated_at = ? "
+                "WHERE entry_id = ? AND status = 'queued'",
+                [(time.time(), i) for i in ids],
+            )
+        jobs.complete(db, job_ids)
+        stamps = []
+        for i in range(0, len(ids), 500):  # stay under SQLite's variable limit
+            chunk = ids[i:i + 500]
+            stamps += [r[0] for r in db.execute(
+                f"SELECT timestamp FROM {TABLE} WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk)]
+        _refresh_days(db, stamps)
+    return len(rows)
+
+
+# ---------- Mood rollups ----------------------------------------------------
+
+PERIODS = {
+    "day": "day",
+    "week": "strftime('%Y-W%W', day)",
+    "month": "substr(day, 1, 7)",
+}
+
+
+@trace.traced("storage.refresh_rollups")
+def refresh_rollups(timestamps=None) -> None:
+    """
+    Re-aggregate the days touched by `timestamps` (ISO strings) into the
+    daily rollup table; None rebuilds every day. Each day is one range
+    scan on the timestamp index, so this stays cheap for any journal size.
+    """
+    with _db() as db:
+        if timestamps is None:
+            db.execute(f"DELETE FROM {ROLLUP_TABLE}")
+            db.execute(ROLLUP_SQL + " GROUP BY substr(timestamp, 1, 10)")
+        else:
+            _refresh_days(db, timestamps)
+
+
+def _refresh_days(db: sqlite3.Connection, timestamps) -> None:
+    """refresh_rollups body, for callers already inside a transaction."""
+    for day in sorted({ts[:10] for ts in timestamps}):
+        db.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE day = ?", [day])
+        db.execute(
+            ROLLUP_SQL + " WHERE timestamp >= ? AND timestamp < date(?, '+1 day')"
+            " GROUP BY substr(timestamp, 1, 10)",
+            [day, day],
+        )
+
+
+@trace.traced("storage.mood_rollup")
+def mood_rollup(by: str = "day", start=None, end=None) -> list[dict]:
+    """
+    Pre-aggregated mood per day / week / month, oldest first:
+    dicts with period, entries, moods, avg, min, max.
+    """
+    period = PERIODS[by]
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("day >= ?")
+        params.append(_as_bound(start)[:10])
+    if end is not None:
+        clauses.append("day <= ?")
+        params.append(_as_bound(end)[:10])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor = _db().execute(
+        f"""
+        SELECT {period} AS period, sum(entries) AS entries, sum(moods) AS moods,
+               CAST(sum(mood_sum) AS REAL) / nullif(sum(moods), 0) AS avg,
+               min(mood_min) AS min, max(mood_max) AS max
+        FROM {ROLLUP_TABLE} {where}
+        GROUP BY period ORDER BY period
+        """,
+        params,
+    )
+    return _rows(cursor)
+
+
+@trace.traced("storage.mood_totals")
+def mood_totals() -> dict:
+    """Whole-journal entries, avg/best/worst mood from the rollup table."""
+    row = _db().execute(
+        f"""
+        SELECT coalesce(sum(entries), 0), coalesce(sum(moods), 0),
+               CAST(sum(mood_sum) AS REAL) / nullif(sum(moods), 0),
+               max(mood_max), min(mood_min)
+        FROM {ROLLUP_TABLE}
+        """
+    ).fetchone()
+    return dict(zip(("entries", "moods", "avg", "best", "worst"), tuple(row)))
@@ -0,0 +1,222 @@
+"""
+journal.trace
+-------------
+Lightweight in-process tracing: timed spans, counters and a summary.
+
+Instrumented code calls `with trace.span("storage.search"):` or
+decorates a function with `@trace.traced("ai.analyse")`, and bumps
+counters with `trace.count("openai.retries")`. Nothing is recorded
+until enable() is called (the CLI does this for `--profile`), so the
+cost in normal runs is one flag check per call.
+
+summary() aggregates spans per name (calls, total, p50/p95/p99, rows/sec
+when spans carry a `rows` attribute); write_chrome_trace() dumps every
+span as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+"""
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+_enabled = False
+_lock = threading.Lock()
+_spans: list[tuple] = []          # (name, start_ns, duration_ns, thread id, attrs)
+_counters: dict[str, float] = {}
+_origin = time.perf_counter_ns()
+
+
+def enable() -> None:
+    global _enabled, _origin
+    reset()
+    _origin = time.perf_counter_ns()
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+class _Span:
+    """Handle yielded by span(); set attributes (e.g. rows) while it runs."""
+    __slots__ = ("attrs",)
+
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NULL = _NullSpan()
+
+
+@contextmanager
+def _recording(name: str, attrs: dict):
+    handle = _Span(attrs)
+    start = time.perf_counter_ns()
+    try:
+        yield handle
+    except BaseException as exc:
+        handle.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        duration = time.perf_counter_ns() - start
+        _spans.append((name, start - _origin, duration, threading.get_ident(), handle.attrs))
+
+
+@contextmanager
+def _idle():
+    yield _NULL
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block; yields a handle with .set(**attrs)."""
+    if not _enabled:
+        return _idle()
+    return _recording(name, attrs)
+
+
+def traced(name: str):
+    """Decorator: run every call of the function inside span(name)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _recording(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timed_iter(name: str, iterable, **attrs):
+    """
+    Yield from `iterable`, timing only the work of producing each item
+    (a SQLite step, a parser state machine), not the caller's work on
+    it. Recorded as one span with the summed time and a `rows` count.
+    """
+    if not _enabled:
+        yield from iterable
+        return
+    it = iter(iterable)
+    first, busy, rows = time.perf_counter_ns(), 0, 0
+    while True:
+        start = time.perf_counter_ns()
+        try:
+            item = next(it)
+        except StopIteration:
+            busy += time.perf_counter_ns() - start
+            break
+        busy += time.perf_counter_ns() - start
+        rows += 1
+        yield item
+    _spans.append((name, first - _origin, busy, threading.get_ident(), {"rows": rows, **attrs}))
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add `value` to a counter (retries, tokens, cache hits, …)."""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def _percentile(sorted_values: list[int], q: float) -> int:
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summary() -> list[dict]:
+    """Per-span-name stats, most total time first. Times in milliseconds."""
+    groups: dict[str, list] = {}
+    for name, _, duration, _, attrs in list(_spans):
+        group = groups.setdefault(name, [[], 0, 0])
+        group[0].append(duration)
+        group[1] += attrs.get("rows", 0)
+        group[2] += "error" in attrs
+    rows = []
+    for name, (durations, n_rows, errors) in groups.items():
+        durations.sort()
+        total = sum(durations)
+        rows.append({
+            "name": name,
+            "calls": len(durations),
+            "errors": errors,
+            "total_ms": total / 1e6,
+            "p50_ms": _percentile(durations, 0.50) / 1e6,
+            "p95_ms": _percentile(durations, 0.95) / 1e6,
+            "p99_ms": _percentile(durations, 0.99) / 1e6,
+            "rows": n_rows,
+            "rows_per_s": n_rows / (total / 1e9) if n_rows and total else None,
+        })
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def counters() -> dict[str, float]:
+    with _lock:
+        return dict(_counters)
+
+
+def print_summary(wall_seconds: float | None = None) -> None:
+    """Render summary() and counters() as rich tables (on stderr)."""
+    from rich import box
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console(stderr=True)
+    title = "Profile (ms)" + (f" — {wall_seconds * 1000:.0f} ms wall" if wall_seconds else "")
+    table = Table(title=title, title_justify="left", box=box.SIMPLE_HEAD)
+    table.add_column("span", no_wrap=True)
+    for column in ("calls", "err", "total", "p50", "p95", "p99", "rows/s"):
+        table.add_column(column, justify="right", no_wrap=True)
+    for row in summary():
+        table.add_row(
+            row["name"], str(row["calls"]), str(row["errors"] or ""), f"{row['total_ms']:.1f}",
+            f"{row['p50_ms']:.2f}", f"{row['p95_ms']:.2f}", f"{row['p99_ms']:.2f}",
+            f"{row['rows_per_s']:,.0f}" if row["rows_per_s"] else "",
+        )
+    console.print(table)
+    if _counters:
+        counts = Table(title="Counters", title_justify="left", box=box.SIMPLE_HEAD)
+        counts.add_column("counter")
+        counts.add_column("value", justify="right")
+        for name, value in sorted(counters().items()):
+            counts.add_row(name, f"{value:,.0f}")
+        console.print(counts)
+
+
+def write_chrome_trace(path: str | Path) -> Path:
+    """Write spans (and final counter values) in Chrome trace-event format."""
+    import json
+
+    pid = os.getpid()
+    events = [
+        {"name": name, "ph": "X", "ts": start / 1000, "dur": duration / 1000,
+         "pid": pid, "tid": tid, "args": {k: v for k, v in attrs.items()
+                                          if isinstance(v, (str, int, float, bool))}}
+        for name, start, duration, tid, attrs in list(_spans)
+    ]
+    end = max((e["ts"] + e["dur"] for e in events), default=0)
+    events += [{"name": name, "ph": "C", "ts": end, "pid": pid, "args": {"value": value}}
+               for name, value in counters().items()]
+    path = Path(path).expanduser()
+    path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+    return path
@@ -1,11 +1,31 @@
 SPARK_CHARS = "▁▂▃▄▅▆▇█"
 
-def sparkline(values):
+def downsample(values, width):
+    """
+    Average `values` into at most `width` evenly sized buckets in one
+    pass, so a years-long series still fits on a terminal line.
+    """
+    n = len(values)
+    if width <= 0 or n <= width:
+        return list(values)
+    sums = [0.0] * width
+    counts = [0] * width
+    for i, v in enumerate(values):
+        b = i * width // n
+        sums[b] += v
+        counts[b] += 1
+    return [s / c for s, c in zip(sums, counts)]
+
+
+def sparkline(values, width=60):
     """
     Turn a list of numeric values 1-10 into a unicode sparkline.
+    Series longer than `width` are downsampled first (0 = no limit).
     """
     if not values:
         return ""
-    step = (max(values) - min(values) or 1) / (len(SPARK_CHARS) - 1)
-    scaled = [int((v - min(values)) / step) for v in values]
-    return "".join(SPARK_CHARS[i] for i in scaled)
\ No newline at end of file
+    values = downsample(values, width)
+    lo, hi = min(values), max(values)
+    top = len(SPARK_CHARS) - 1
+    span = hi - lo or 1
+    return "".join(SPARK_CHARS[int((v - lo) * top / span)] for v in values)
@@ -2,25 +2,62 @@
 journal.voice
 -------------
 Record microphone audio and return the Whisper transcript.
+
+Two modes:
+* record_and_transcribe(duration)          – record everything, then upload
+* record_and_transcribe(duration, stream=True) – cut the live stream into
+  segments on silence and transcribe each one while recording continues
+
+The streaming pipeline (transcribe_stream) takes any iterable of audio
+blocks, so a WAV file can be pushed through it exactly like a microphone
+(see wav_blocks). sounddevice and the OpenAI client are only loaded
+when they are needed, so that path works without PortAudio or an API
+key.
 """
 
+import io
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from datetime import datetime
+from typing import Iterable, Iterator
 
-import sounddevice as sd
+import numpy as np
 import soundfile as sf
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from journal import trace
 
 load_dotenv()           # so OPENAI_API_KEY is in env
-client = OpenAI()       # Whisper and chat share the same client
 
 SAMPLE_RATE = 16_000    # Whisper works well at 16 kHz mono
 
+# Streaming segmentation
+BLOCK_SECONDS = 0.1     # audio callback granularity
+SILENCE_RMS = 0.01      # blocks quieter than this count as silence
+SILENCE_SECONDS = 0.6   # this much quiet ends a segment
+MIN_SEGMENT_SECONDS = 0.5
+MAX_SEGMENT_SECONDS = 30
+TRANSCRIBE_WORKERS = 3
+
+_client = None
+
+
+def get_client():
+    """Whisper client, created on first use."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI()
+    return _client
+
 
 def record_audio(duration: int, out_path: Path) -> None:
     """Capture microphone audio for `duration` seconds to WAV @16 kHz mono."""
+    import sounddevice as sd
+
     print(f"Recording {duration} s… Speak now.")
     audio = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1)
     sd.wait()           # block until recording finishes
@@ -30,9 +67,11 @@ def record_audio(duration: int, out_path: Path) -> None:
 
 def transcribe(path: Path) -> str:
     """Send the WAV file to Whisper and return the transcript."""
+    seconds = sf.info(path).duration
+    trace.count("voice.audio_seconds", seconds)
     print("Sending to Whisper…")
-    with open(path, "rb") as f:
-        resp = client.audio.transcriptions.create(
+    with trace.span("voice.transcribe", audio_seconds=round(seconds, 2)), open(path, "rb") as f:
+        resp = get_client().audio.transcriptions.create(
             model="whisper-1",
             file=f,
             response_format="text"
@@ -40,11 +79,136 @@ def transcribe(path: Path) -> str:
     return resp.strip()
 
 
-def record_and_transcribe(duration: int) -> str:
+def record_and_transcribe(duration: int, stream: bool = False) -> str:
     """High-level helper used by CLI."""
+    if stream:
+        return transcribe_stream(microphone_blocks(duration))
     with NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
         wav_path = Path(tmp.name)
     record_audio(duration, wav_path)
     text = transcribe(wav_path)
     wav_path.unlink(missing_ok=True)  # delete temp file
     return text
+
+
+# ---------- Streaming mode --------------------------------------------------
+
+class Segmenter:
+    """
+    Cut a stream of audio blocks into speech segments at pauses.
+
+    A segment ends after SILENCE_SECONDS of quiet or at
+    MAX_SEGMENT_SECONDS; segments that are too short or never rise above
+    the silence threshold are dropped rather than sent to Whisper.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._blocks: list[np.ndarray] = []
+        self._samples = 0
+        self._quiet = 0
+        self._voiced = False
+
+    def feed(self, block: np.ndarray) -> np.ndarray | None:
+        """Add one block; return a finished segment if this block ended one."""
+        block = block.reshape(len(block), -1).mean(axis=1)  # mono
+        loud = float(np.sqrt(np.mean(block ** 2))) >= SILENCE_RMS if len(block) else False
+        self._blocks.append(block)
+        self._samples += len(block)
+        self._quiet = 0 if loud else self._quiet + len(block)
+        self._voiced |= loud
+
+        pause = self._voiced and self._quiet >= SILENCE_SECONDS * self.sample_rate
+        if pause or self._samples >= MAX_SEGMENT_SECONDS * self.sample_rate:
+            return self.flush()
+        if not self._voiced and self._quiet >= SILENCE_SECONDS * self.sample_rate:
+            self._reset()  # leading silence: don't let it pile up
+        return None
+
+    def flush(self) -> np.ndarray | None:
+        """Return whatever is buffered as a final segment (or None)."""
+        keep = self._voiced and self._samples >= MIN_SEGMENT_SECONDS * self.sample_rate
+        segment = np.concatenate(self._blocks) if keep else None
+        self._reset()
+        return segment
+
+    def _reset(self):
+        self._blocks, self._samples, self._quiet, self._voiced = [], 0, 0, False
+
+
+def transcribe_audio(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> str:
+    """Encode `audio` as an in-memory WAV and send it to Whisper."""
+    seconds = len(audio) / sample_rate
+    trace.count("voice.audio_seconds", seconds)
+    buf = io.BytesIO()
+    sf.write(buf, audio, sample_rate, format="WAV", subtype="PCM_16")
+    with trace.span("voice.transcribe", audio_seconds=round(seconds, 2)):
+        resp = get_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=("segment.wav", buf.getvalue()),
+            response_format="text",
+        )
+    return resp.strip()
+
+
+def transcribe_stream(
+    blocks: Iterable[np.ndarray],
+    sample_rate: int = SAMPLE_RATE,
+    workers: int = TRANSCRIBE_WORKERS,
+) -> str:
+    """
+    Segment `blocks` on silence and transcribe each segment in a thread
+    pool as soon as it is cut; return the segment texts joined in order.
+    """
+    segmenter = Segmenter(sample_rate)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for block in blocks:
+            segment = segmenter.feed(block)
+            if segment is not None:
+                futures.append(pool.submit(transcribe_audio, segment, sample_rate))
+        segment = segmenter.flush()
+        if segment is not None:
+            futures.append(pool.submit(transcribe_audio, segment, sample_rate))
+        return " ".join(t for t in (f.result() for f in futures) if t)
+
+
+def microphone_blocks(duration: float) -> Iterator[np.ndarray]:
+    """
+    Yield BLOCK_SECONDS blocks from the microphone for `duration` seconds.
+    The PortAudio callback only copies into a bounded queue; everything
+    else happens on the consumer side. Ctrl-C stops early.
+    """
+    import sounddevice as sd
+
+    buffer: queue.Queue = queue.Queue(maxsize=int(60 / BLOCK_SECONDS))
+
+    def callback(indata, frames, time_info, status):
+        try:
+            buffer.put_nowait(indata.copy())
+        except queue.Full:  # consumer stalled; drop rather than block audio
+            pass
+
+    print(f"Recording {duration} s (streaming)… Speak now.")
+    deadline = time.monotonic() + duration
+    with sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype="float32",
+                        blocksize=int(BLOCK_SECONDS * SAMPLE_RATE), callback=callback):
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    yield buffer.get(timeout=BLOCK_SECONDS * 2)
+                except queue.Empty:
+                    continue
+        except KeyboardInterrupt:
+            pass
+    while not buffer.empty():
+        yield buffer.get_nowait()
+
+
+def wav_blocks(path: str | Path) -> tuple[int, Iterator[np.ndarray]]:
+    """(sample_rate, blocks) for a WAV file, shaped like microphone_blocks."""
+    sample_rate = sf.info(str(path)).samplerate
+    blocks = sf.blocks(str(path), blocksize=int(BLOCK_SECONDS * sample_rate),
+                       dtype="float32", always_2d=True)
+    return sample_rate, blocks
+
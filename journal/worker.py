@@ -0,0 +1,116 @@
+"""
+journal.worker
+--------------
+Long-running consumer for the analysis queue (journal.jobs).
+
+    python main.py worker --concurrency 4
+
+Claims due jobs, analyses their entries on a thread pool (all workers
+share one token bucket, as in journal.batch) and writes results back in
+one transaction per batch. Failed jobs are retried with backoff and
+dead-lettered after jobs.MAX_ATTEMPTS; `--once` drains the queue and
+exits instead of polling.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable
+
+from journal import ai, jobs, storage, trace
+from journal.db import connect, TABLE
+from journal.ratelimit import TokenBucket
+
+RECOVER_EVERY = 60  # seconds between sweeps for orphaned running jobs
+
+
+@dataclass
+class WorkerReport:
+    done: int = 0
+    retried: int = 0
+    dead: int = 0
+    seconds: float = 0.0
+
+
+def _texts(db, entry_ids) -> dict[int, str]:
+    ids = sorted(set(entry_ids))
+    rows = db.execute(
+        f"SELECT id, text FROM {TABLE} WHERE id IN ({', '.join('?' * len(ids))})", ids
+    )
+    return {row[0]: row[1] for row in rows}
+
+
+def run_worker(
+    concurrency: int = 4,
+    poll: float = 2.0,
+    once: bool = False,
+    rps: float | None = None,
+    provider: str | None = None,
+    log: Callable[[str], None] | None = None,
+) -> WorkerReport:
+    """
+    Process queued jobs until interrupted (or, with `once`, until no job
+    is due). `log(message)` is called after every batch.
+    """
+    db = connect()
+    analyser = ai.fingerprint(provider)
+    report = WorkerReport()
+    started = time.perf_counter()
+    last_recover = 0.0
+    claimed: list[dict] = []
+
+    previous, ai.limiter = ai.limiter, TokenBucket(rps, burst=concurrency)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            while True:
+                if time.monotonic() - last_recover > RECOVER_EVERY:
+                    jobs.recover(db)
+                    last_recover = time.monotonic()
+
+                claimed = jobs.claim(db, max(1, concurrency) * 2)
+                if not claimed:
+                    if once:
+                        break
+                    time.sleep(poll)
+                    continue
+
+                with trace.span("worker.batch", rows=len(claimed)):
+                    texts = _texts(db, [job["entry_id"] for job in claimed])
+                    results, finished = [], []
+                    futures = {}
+                    for job in claimed:
+                        if job["entry_id"] in texts:
+                            futures[pool.submit(ai.analyse_checked, texts[job["entry_id"]],
+                                                provider)] = job
+                        else:  # entry was deleted meanwhile
+                            finished.append(job["id"])
+
+                    for future in as_completed(futures):
+                        job = futures[future]
+                        try:
+                            summary, mood, ok = future.result()
+                        except Exception as exc:
+                            status = jobs.fail(db, job, f"{type(exc).__name__}: {exc}")
+                            if status == "dead":
+                                report.dead += 1
+                            elif status == "queued":
+                                report.retried += 1
+                        else:
+                            results.append((job["entry_id"], summary, mood, ok))
+                            finished.append(job["id"])
+
+                    storage.update_entries(results, close_jobs=False, analyser=analyser,
+                                           job_ids=finished)
+                report.done += len(results)
+                claimed = []
+                if log:
+                    counts = jobs.status_counts(db)
+                    log(f"{report.done} done, {report.retried} retrying, {report.dead} dead "
+                        f"· queue: {counts['queued']} queued, {counts['dead']} dead")
+    finally:
+        ai.limiter = previous
+        if claimed:  # interrupted mid-batch: give unfinished jobs back
+            jobs.release(db, [job["id"] for job in claimed])
+        db.close()
+
+    report.seconds = time.perf_counter() - started
+    return report
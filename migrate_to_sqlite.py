@@ -1,26 +1,25 @@
+"""
+One-off migration of the pre-SQLite JSON journal (~/.ai_chat_journal.json)
+into the SQLite database. Streams the file in batches and can be re-run
+after an interruption; see journal.legacy. Same as `journal migrate --legacy-json`.
+
+    python migrate_to_sqlite.py [path/to/journal.json]
+"""
+import sys
 from pathlib import Path
-import json
-from journal.db import get_db, TABLE
-from journal.storage import FILE_PATH  # old JSON path
 
-db = get_db()
-table = db[TABLE]
+from journal.legacy import LEGACY_PATH, import_legacy
 
-if not FILE_PATH.exists():
+path = Path(sys.argv[1]) if len(sys.argv) > 1 else LEGACY_PATH
+if not path.exists():
     print("No JSON file to migrate – nothing to do.")
-    exit()
-
-with FILE_PATH.open("r", encoding="utf-8") as f:
-    data = json.load(f)
-
-for idx, entry in enumerate(data, 1):
-    # fill in missing keys (if any)
-    entry.setdefault("summary", None)
-    entry.setdefault("mood", None)
-    entry["id"] = idx
-    table.insert(entry, pk="id", replace=True)
+    sys.exit()
 
-# backup old JSON
-backup = FILE_PATH.with_suffix(".json.bak")
-FILE_PATH.rename(backup)
-print(f"Migrated {len(data)} entries → SQLite. Original JSON backed up to {backup}.")
\ No newline at end of file
+report = import_legacy(
+    path, progress=lambda r: print(f"{r.resumed_from + r.read} entries read…", end="\r", flush=True)
+)
+# backup old JSON only once everything is in
+backup = path.with_suffix(".json.bak")
+path.rename(backup)
+print(f"Migrated {report.added} entries → SQLite ({report.invalid} invalid skipped). "
+      f"Original JSON backed up to {backup}.")
@@ -0,0 +1,93 @@
+"""
+Local stand-in for the OpenAI chat-completions endpoint.
+
+Answers every POST /v1/chat/completions with a canned JSON analysis
+after an optional delay, and can return 429s to exercise backoff.
+
+    python scripts/fake_openai.py --port 8765 --latency 0.2 --rate-limit-every 25
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test \
+        python main.py analyze --concurrency 8 --rps 20
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_counter = itertools.count(1)
+_lock = threading.Lock()
+
+
+def make_handler(latency: float, rate_limit_every: int):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # keep the console quiet
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict | None = None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with _lock:
+                n = next(_counter)
+
+            if rate_limit_every and n % rate_limit_every == 0:
+                self._send(429, {"error": {"message": "slow down", "type": "rate_limit"}},
+                           {"retry-after": "1"})
+                return
+
+            time.sleep(latency)
+            text = request.get("messages", [{}])[-1].get("content", "")
+            try:  # packed request: a JSON array of {id, text}
+                items = json.loads(text)
+            except ValueError:
+                items = None
+            if isinstance(items, list):
+                content = json.dumps([{"id": item["id"], "summary": item["text"][:80],
+                                       "mood": 1 + len(item["text"]) % 10}
+                                      for item in items])
+            else:
+                content = json.dumps({"summary": text[:80], "mood": 1 + len(text) % 10})
+            self._send(200, {
+                "id": f"chatcmpl-{n}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }],
+                "usage": {"prompt_tokens": len(text) // 4, "completion_tokens": 20,
+                          "total_tokens": len(text) // 4 + 20},
+            })
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Seconds to wait before answering (default 0.2)")
+    parser.add_argument("--rate-limit-every", type=int, default=0,
+                        help="Return HTTP 429 for every Nth request (0 = never)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port),
+                                 make_handler(args.latency, args.rate_limit_every))
+    print(f"Fake OpenAI listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
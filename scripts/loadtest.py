@@ -0,0 +1,133 @@
+"""
+Load test for the journal HTTP API (journal.api).
+
+Runs --clients concurrent clients against a running server for
+--duration seconds, each picking requests from a mix of entry pages,
+single entries, search and stats, plus creates with --write-ratio.
+GETs are revalidated with If-None-Match, as a polling front-end would,
+so unchanged resources come back as 304s. Prints
+requests/sec and p50/p95/p99 latency overall and per endpoint.
+
+    python main.py serve --port 8080 --provider local &
+    python scripts/loadtest.py --url http://127.0.0.1:8080 --duration 10 --clients 32
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+import aiohttp
+
+SEARCH_TERMS = ("today", "work", "tired", "happy", "walk", "friend", "sleep")
+MIX = {"list": 30, "get": 35, "search": 15, "stats": 20}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    return values[max(0, math.ceil(q * len(values)) - 1)] if values else 0.0
+
+
+async def client(session, url: str, ids: list[int], etags: dict, write_ratio: float,
+                 deadline: float, results: dict) -> None:
+    kinds, weights = list(MIX), list(MIX.values())
+    while time.perf_counter() < deadline:
+        kind = "create" if random.random() < write_ratio else random.choices(kinds, weights)[0]
+        if kind == "list":
+            request = ("GET", f"{url}/entries", {"limit": 20})
+        elif kind == "get":
+            entry_id = random.choice(ids)
+            request = ("GET", f"{url}/entries/{entry_id}", None)
+        elif kind == "search":
+            request = ("GET", f"{url}/search", {"q": random.choice(SEARCH_TERMS), "limit": 10})
+        elif kind == "stats":
+            request = ("GET", f"{url}/stats", {"by": random.choice(("day", "week", "month"))})
+        else:
+            request = ("POST", f"{url}/entries", None)
+        method, target, params = request
+        body = {"text": f"load test entry {time.time()}"} if method == "POST" else None
+        key = (target, tuple(sorted((params or {}).items())))
+        headers = {"If-None-Match": etags[key]} if method == "GET" and key in etags else {}
+
+        started = time.perf_counter()
+        try:
+            async with session.request(method, target, params=params, json=body,
+                                       headers=headers) as response:
+                await response.read()
+                status = response.status
+                if method == "GET" and "ETag" in response.headers:
+                    etags[key] = response.headers["ETag"]
+        except aiohttp.ClientError as exc:
+            status = type(exc).__name__
+        elapsed = time.perf_counter() - started
+        latencies, statuses = results.setdefault(kind, ([], {}))
+        latencies.append(elapsed)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def run(url: str, clients: int, duration: float, write_ratio: float) -> dict:
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{url}/entries", params={"limit": 200}) as response:
+            response.raise_for_status()
+            ids = [entry["id"] for entry in (await response.json())["entries"]]
+        if not ids:
+            raise SystemExit("The journal is empty; add entries first "
+                             "(e.g. python benchmarks/generate.py).")
+        results: dict = {}
+        etags: dict = {}
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client(session, url, ids, etags, write_ratio, deadline, results)
+                               for _ in range(clients)))
+    return results
+
+
+def report(results: dict, duration: float) -> dict:
+    rows = dict(sorted(results.items()))
+    everything, totals = [], {}
+    for latencies, statuses in rows.values():
+        everything += latencies
+        for status, n in statuses.items():
+            totals[status] = totals.get(status, 0) + n
+    rows["all"] = (everything, totals)
+    summary = {}
+    print(f"{'endpoint':8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8}  statuses")
+    for kind, (latencies, statuses) in rows.items():
+        latencies.sort()
+        line = {"requests": len(latencies), "rps": len(latencies) / duration,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "statuses": {str(k): v for k, v in statuses.items()}}
+        summary[kind] = line
+        print(f"{kind:8} {line['requests']:9} {line['rps']:8.0f} {line['p50_ms']:8.1f} "
+              f"{line['p95_ms']:8.1f} {line['p99_ms']:8.1f}  "
+              + " ".join(f"{k}:{v}" for k, v in line["statuses"].items()))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--clients", type=int, default=32,
+                        help="Concurrent clients (default 32)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Seconds to run (default 10)")
+    parser.add_argument("--write-ratio", type=float, default=0.0,
+                        help="Fraction of requests that create entries (default 0)")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    print(f"{args.clients} clients against {url} for {args.duration:.0f}s …")
+    summary = report(asyncio.run(run(url, args.clients, args.duration, args.write_ratio)),
+                     args.duration)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
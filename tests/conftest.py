@@ -0,0 +1,51 @@
+"""
+Shared fixtures. Every test gets a fresh journal in its own temporary
+HOME and analyses with the offline `local` provider, so nothing touches
+~/.ai_chat_journal.db or the network.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Before anything imports journal.db / journal.ai, which read these.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="journal-tests-")
+os.environ["JOURNAL_AI_PROVIDER"] = "local"
+os.environ["JOURNAL_EMBEDDER"] = "local"
+os.environ.pop("JOURNAL_NAME", None)
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import pytest  # noqa: E402
+
+from journal import ai, db, shards  # noqa: E402
+
+
+@pytest.fixture
+def journal_db(tmp_path, monkeypatch):
+    """Path of an empty journal that storage, jobs, cache, … now use."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(db, "JOURNALS_DIR", tmp_path / ".ai_chat_journals")
+    monkeypatch.setattr(shards, "CATALOG_PATH", tmp_path / ".ai_chat_journals" / "catalog.db")
+    monkeypatch.setattr(shards, "_current", db.DEFAULT_JOURNAL)
+    ai.set_provider("local")
+    path = tmp_path / ".ai_chat_journal.db"
+    shards.switch(path)
+    yield path
+    shards.switch(path)  # close this test's connections
+
+
+@pytest.fixture
+def entries(journal_db):
+    """A small journal: ids 1-5, one per day of January 2024, unanalysed."""
+    from journal import storage
+
+    texts = ["A lovely walk in the park, very happy.",
+             "Stressed about the deadline at work.",
+             "Quiet day reading a good book.",
+             "Argued with a friend, felt awful.",
+             "Great dinner with family, grateful."]
+    storage.add_entries([{"timestamp": f"2024-01-0{i}T09:00:00+00:00", "text": text}
+                         for i, text in enumerate(texts, 1)])
+    return texts
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+from journal import api, jobs, storage  # noqa: E402
+
+
+def _run(scenario):
+    async def main():
+        async with TestClient(TestServer(api.create_app(db_threads=2, analyse=False))) as client:
+            await scenario(client)
+    asyncio.run(main())
+
+
+def test_entries_and_conditional_get(entries):
+    async def scenario(client):
+        response = await client.get("/entries", params={"limit": 2})
+        assert response.status == 200
+        body = await response.json()
+        assert [e["id"] for e in body["entries"]] == [5, 4] and body["next"] == 4
+
+        again = await client.get("/entries", params={"limit": 2},
+                                 headers={"If-None-Match": response.headers["ETag"]})
+        assert again.status == 304
+
+        created = await client.post("/entries", json={"text": "Posted from a test."})
+        assert created.status == 201
+        entry_id = (await created.json())["id"]
+        edited = await client.patch(f"/entries/{entry_id}", json={"text": "Edited."},
+                                    headers={"If-Match": '"stale"'})
+        assert edited.status == 412
+        assert (await client.get("/entries/999")).status == 404
+
+    _run(scenario)
+
+
+def test_if_match_is_strong_and_ignores_job_state(entries):
+    async def scenario(client):
+        fetched = await client.get("/entries/1")
+        etag = fetched.headers["ETag"]
+        assert not etag.startswith("W/") and (await fetched.json())["analysis"] == "queued"
+        jobs.claim(storage._db(), 5)  # a worker picks the job up; the entry is unchanged
+        weak = await client.patch("/entries/1", json={"text": "Edited."},
+                                  headers={"If-Match": f"W/{etag}"})
+        assert weak.status == 412
+        edited = await client.patch("/entries/1", json={"text": "Edited."},
+                                    headers={"If-Match": etag})
+        assert edited.status == 200 and edited.headers["ETag"] != etag
+
+    _run(scenario)
+
+
+def test_search_stats_and_errors(entries):
+    async def scenario(client):
+        hits = (await (await client.get("/search", params={"q": "deadline"})).json())["hits"]
+        assert [hit["id"] for hit in hits] == [2] and "<mark>" in hits[0]["snippet"]
+        assert (await client.get("/search")).status == 400
+        quotes = await client.get("/search", params={"q": '""'})
+        assert quotes.status == 200 and (await quotes.json())["hits"] == []
+        assert (await client.get("/entries", params={"limit": 0})).status == 400
+        assert (await client.get("/entries", params={"to": "last week"})).status == 400
+        assert (await client.get("/stats", params={"from": "2024-13-01"})).status == 400
+        stats = await (await client.get("/stats", params={"by": "month"})).json()
+        assert "totals" in stats and "periods" in stats
+        # A negative cursor (replay after a reset) carries on after |since|.
+        changes = await (await client.get("/changes", params={"since": -2})).json()
+        assert not changes["reset"] and [c["id"] for c in changes["changes"]] == [3, 4, 5]
+        health = await (await client.get("/health")).json()
+        assert health["ok"]
+
+    _run(scenario)
@@ -0,0 +1,105 @@
+import importlib.util
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from journal import ai, batch, db, storage
+from journal.ratelimit import TokenBucket
+
+from conftest import ROOT
+
+
+def _fake_openai():
+    spec = importlib.util.spec_from_file_location("fake_openai", ROOT / "scripts/fake_openai.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def stand_in(journal_db, monkeypatch):
+    """scripts/fake_openai.py on a free port; yields its request log."""
+    pytest.importorskip("openai")
+    from journal import ai_openai
+
+    fake = _fake_openai()
+    log = {"requests": 0, "in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+
+    class Counting(fake.make_handler(latency=0.05, rate_limit_every=7)):
+        def do_POST(self):
+            with lock:
+                log["requests"] += 1
+                log["in_flight"] += 1
+                log["peak"] = max(log["peak"], log["in_flight"])
+            try:
+                super().do_POST()
+            finally:
+                with lock:
+                    log["in_flight"] -= 1
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Counting)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(ai_openai, "_client", None)
+    ai.set_provider("openai")
+    yield log
+    server.shutdown()
+    ai.set_provider("local")
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.2
+
+
+def test_token_bucket_pause_holds_everyone():
+    bucket = TokenBucket()
+    bucket.pause(0.2)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_local_backfill_writes_back(entries):
+    pending = list(storage.query_entries(unanalyzed=True, columns=["id", "text"]))
+    report = batch.analyse_entries(pending, concurrency=2, flush_every=2)
+    assert (report.analysed, report.failed) == (5, 0)
+    assert storage.count_entries(unanalyzed=True) == 0
+    model, version = ai.fingerprint()
+    row = storage._db().execute(
+        f"SELECT analysis_model, analysis_version FROM {db.TABLE} WHERE id = 1").fetchone()
+    assert tuple(row) == (model, version)
+
+
+def test_backfill_against_stand_in(entries, stand_in):
+    more = [{"timestamp": f"2024-02-{i:02}T09:00:00+00:00", "text": f"Day {i} was fine."}
+            for i in range(1, 11)]
+    storage.add_entries(more)
+    pending = list(storage.query_entries(unanalyzed=True, columns=["id", "text"]))
+    report = batch.analyse_entries(pending, concurrency=4, rps=50)
+
+    assert (report.analysed, report.failed) == (15, 0)
+    assert storage.count_entries(unanalyzed=True) == 0
+    assert 1 < stand_in["peak"] <= 4          # requests really ran side by side
+    assert stand_in["requests"] > 15          # every 7th got a 429 and was retried
+    assert storage.get_entry(1)["summary"].startswith("A lovely walk")
+
+    # Same texts again: answered from the cache, no new requests.
+    before = stand_in["requests"]
+    batch.analyse_entries(pending, concurrency=4)
+    assert stand_in["requests"] == before
+
+
+def test_packed_requests_against_stand_in(entries, stand_in):
+    pending = list(storage.query_entries(unanalyzed=True, columns=["id", "text"]))
+    report = batch.analyse_entries(pending, concurrency=2, batch_size=5)
+    assert report.analysed == 5
+    assert stand_in["requests"] <= 3  # one packed request (plus a possible 429 retry)
+    assert storage.count_entries(unanalyzed=True) == 0
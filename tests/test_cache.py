@@ -0,0 +1,64 @@
+import pytest
+
+from journal import ai, cache
+
+
+def test_put_get_and_counters(journal_db):
+    version = cache.version_hash("model", "prompt", 0.0)
+    assert cache.get(version, "text") is None
+    cache.put(version, "text", "Summary.", 6)
+    assert cache.get(version, "text") == ("Summary.", 6)
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_lookups_are_read_only_until_flushed(journal_db):
+    version = cache.version_hash("model", "prompt", 0.0)
+    cache.put(version, "text", "Summary.", 6)
+    db = cache._db()
+    before = db.total_changes
+    for _ in range(3):
+        assert cache.get(version, "text") == ("Summary.", 6)
+        assert cache.get(version, "other") is None
+    assert db.total_changes == before
+    cache.flush()
+    assert db.total_changes > before
+    assert cache.stats() == {"entries": 1, "hits": 3, "misses": 3}
+
+
+def test_puts_evict_periodically(journal_db, monkeypatch):
+    version = cache.version_hash("model", "prompt", 0.0)
+    cache.get(version, "warm-up")  # first use: prunes and resets the put count
+    monkeypatch.setattr(cache, "MAX_ENTRIES", 2)
+    monkeypatch.setattr(cache, "PRUNE_EVERY", 3)
+    for i in range(3):
+        cache.put(version, f"text {i}", "Summary.", 5)
+    assert cache.stats()["entries"] == 2
+    cache.put(version, "text 3", "Summary.", 5)
+    assert cache.stats()["entries"] == 3  # the next eviction is three puts away
+
+
+def test_other_versions_are_pruned(journal_db):
+    old = cache.version_hash("model", "old prompt", 0.0)
+    new = cache.version_hash("model", "new prompt", 0.0)
+    assert old != new
+    cache.put(old, "text", "Old.", 3)
+    assert cache.get(new, "text") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_local_provider_is_not_cached(journal_db):
+    ai.analyse("Nice day.")
+    assert cache.stats()["entries"] == 0
+
+
+def test_openai_version_covers_prompts_and_chunking(monkeypatch):
+    ai_openai = pytest.importorskip("journal.ai_openai")
+    provider = ai_openai.OpenAIProvider()
+    seen = {provider.version()}
+    for name, value in [("SYSTEM_PROMPT", "x"), ("PACKED_PROMPT", "x"), ("REDUCE_PROMPT", "x"),
+                        ("CHUNK_TOKENS", 900), ("CHUNK_MIN_TOKENS", 300),
+                        ("CHUNK_BOUNDARY_ODDS", 8)]:
+        with monkeypatch.context() as patch:
+            patch.setattr(ai, name, value)
+            seen.add(provider.version())
+    assert len(seen) == 7
@@ -0,0 +1,81 @@
+from journal import storage
+
+
+def sync(seq=0, limit=storage.CHANGES_PAGE, copy=None):
+    """Follow the feed to the end like a client would; returns (cursor, copy, pages)."""
+    copy = {} if copy is None else copy
+    pages = 0
+    while True:
+        delta = storage.changes_since(seq, limit)
+        pages += 1
+        assert pages < 50, "sync never finished"
+        if delta["reset"]:
+            copy.clear()
+        for change in delta["changes"]:
+            if change["op"] == "delete":
+                copy.pop(change["id"], None)
+            else:
+                copy[change["id"]] = change["text"]
+        seq = delta["seq"]
+        if not delta["more"]:
+            return seq, copy, pages
+
+
+def journal_texts():
+    return {row["id"]: row["text"] for row in storage.query_entries(columns=["id", "text"])}
+
+
+def test_edits_coalesce(entries):
+    seq, copy, _ = sync()
+    assert copy == journal_texts() and seq == storage.last_change()
+    storage.update_text(2, "First edit.")
+    storage.update_text(2, "Second edit.")
+    delta = storage.changes_since(seq)
+    assert [(c["op"], c["id"], c["text"]) for c in delta["changes"]] == [
+        ("upsert", 2, "Second edit.")]
+    assert storage.changes_since(delta["seq"])["changes"] == []
+
+
+def test_sync_compact_sync(entries):
+    seq, copy, _ = sync()
+    db = storage._db()
+    with db:
+        db.execute("DELETE FROM entries WHERE id IN (1, 5)")
+    storage.compact_changes(tombstone_days=0)   # drops the newest tombstone
+
+    first = storage.changes_since(seq)
+    assert first["reset"] and first["seq"] >= int(storage.get_meta(storage.CHANGES_FLOOR_KEY))
+    seq, copy, _ = sync(seq, copy=copy)
+    assert copy == journal_texts()
+    # Caught up: later calls neither reset nor return anything.
+    again = storage.changes_since(seq)
+    assert not again["reset"] and again["changes"] == [] and again["seq"] == seq
+
+    storage.add_entry("After compaction.")
+    seq, copy, _ = sync(seq, copy=copy)
+    assert copy == journal_texts()
+
+
+def test_reset_replay_pages(entries):
+    seq, copy, _ = sync()
+    storage.add_entries([f"Entry {i}" for i in range(10)])
+    db = storage._db()
+    with db:
+        db.execute("DELETE FROM entries WHERE id = 15")   # newest change is the deletion
+    storage.compact_changes(tombstone_days=0)
+    storage.update_text(3, "Edited after the compaction.")
+
+    seq, copy, pages = sync(seq, limit=2, copy=copy)
+    assert pages > 3 and copy == journal_texts()
+    assert not storage.changes_since(seq)["reset"]
+
+
+def test_from_zero_never_resets(entries):
+    db = storage._db()
+    with db:
+        db.execute("DELETE FROM entries WHERE id = 5")
+    storage.compact_changes(tombstone_days=0)
+    delta = storage.changes_since(0, limit=2)
+    assert not delta["reset"] and delta["more"]
+    seq, copy, _ = sync(0, limit=2)
+    assert copy == journal_texts() and seq == storage.last_change()
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def journal(home, *args, stdin=None):
+    env = {**os.environ, "HOME": str(home), "JOURNAL_AI_PROVIDER": "local"}
+    # Bytes in and out: text mode would turn the progress lines' \r into \n.
+    done = subprocess.run([sys.executable, str(ROOT / "main.py"), *args],
+                          input=stdin.encode() if stdin else None,
+                          env=env, capture_output=True, timeout=120)
+    assert done.returncode == 0, done.stderr.decode()
+    return done.stdout.decode()
+
+
+def test_write_analyse_search(tmp_path):
+    journal(tmp_path, "write", "Went", "sailing", "with", "friends,", "wonderful.")
+    out = journal(tmp_path, "ingest", "--format", "lines", stdin="Long day at work.\n")
+    assert any(line.startswith("1 new entries ingested") for line in out.split("\n"))
+    out = journal(tmp_path, "analyze")
+    assert any(line.startswith("2 entries analysed") for line in out.split("\n"))
+    assert "Entries: 2" in journal(tmp_path, "stats")
+    assert "sailing" in journal(tmp_path, "search", "sailing")
+    assert "sailing" in journal(tmp_path, "list")
+    assert (tmp_path / ".ai_chat_journal.db").exists()
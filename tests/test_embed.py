@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from journal import embed, storage
+
+
+def test_refresh_and_similar(entries):
+    storage.add_entry("A happy walk through the park with the dog.")
+    assert embed.pending_count() == 6
+    assert embed.refresh(batch_size=4) == 6
+    assert embed.pending_count() == 0
+    assert embed.generation() == 2
+
+    ids, matrix = embed.load_vectors()
+    assert list(ids) == [1, 2, 3, 4, 5, 6]
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1, atol=1e-5)
+
+    hits = embed.similar(6, k=3)
+    assert hits[0]["id"] == 1 and len(hits) == 3
+    assert hits[0]["score"] >= hits[-1]["score"]
+
+
+def test_flat_and_ivf_agree(entries):
+    embed.refresh()
+    ids, matrix = embed.load_vectors()
+    flat = embed.FlatIndex(ids, matrix)
+    ivf = embed.IVFIndex(ids, matrix, nlist=2, nprobe=2)  # probes every cluster: exact
+    assert [i for i, _ in ivf.search(matrix[0], 3)] == [i for i, _ in flat.search(matrix[0], 3)]
+    assert flat.search(matrix[0], 1)[0][0] == 1
+
+
+def test_usable_from_other_threads(entries):
+    embed.refresh()
+    with ThreadPoolExecutor(max_workers=2) as pool:  # as Streamlit runs each session
+        hits = list(pool.map(lambda i: embed.similar(i, k=2), [1, 2, 3, 4]))
+    assert [len(h) for h in hits] == [2, 2, 2, 2]
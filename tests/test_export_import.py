@@ -0,0 +1,42 @@
+from journal import jobs, storage
+from journal.export import export_markdown
+from journal.import_md import import_markdown, parse_markdown
+from journal.worker import run_worker
+
+
+def test_markdown_round_trip(entries, tmp_path):
+    run_worker(once=True)
+    path = export_markdown(tmp_path / "journal.md")
+    parsed = list(parse_markdown(path.open(encoding="utf-8")))
+    assert [entry["text"] for entry in parsed] == entries
+    assert all(entry["summary"] and 1 <= entry["mood"] <= 10 for entry in parsed)
+
+    # Everything is already there ...
+    assert import_markdown(path).added == 0
+    # ... until it isn't.
+    db = storage._db()
+    with db:
+        db.execute("DELETE FROM entries WHERE id IN (1, 2)")
+    assert import_markdown(path, dry_run=True).added == 2
+    report = import_markdown(path)
+    assert (report.parsed, report.added) == (5, 2)
+    assert storage.count_entries() == 5
+
+
+def test_import_queues_unanalysed_entries(journal_db, tmp_path):
+    path = tmp_path / "notes.md"
+    path.write_text("# Journal\n\n"
+                    "## 2024-05-01T09:00:00+00:00\n\nNo summary yet.\n\n"
+                    "## 2024-05-02T09:00:00+00:00\n\nAnalysed.\n\n"
+                    "> **AI Summary (mood 7/10)**\n> Fine.\n", encoding="utf-8")
+    assert import_markdown(path).added == 2
+    assert jobs.status_counts()["queued"] == 1
+    assert [p["period"] for p in storage.mood_rollup("day")] == ["2024-05-01", "2024-05-02"]
+
+
+def test_since_last_export(entries, tmp_path):
+    export_markdown(tmp_path / "first.md", since_last=True)
+    storage.add_entry("Something new.")
+    second = list(parse_markdown(export_markdown(tmp_path / "second.md", since_last=True)
+                                 .open(encoding="utf-8")))
+    assert [entry["text"] for entry in second] == ["Something new."]
@@ -0,0 +1,40 @@
+from journal import storage
+from journal.frames import EntryFrame
+from journal.worker import run_worker
+
+
+def test_refresh_patches_changes(entries):
+    frame = EntryFrame()
+    assert frame.refresh() == 5
+    assert list(frame.df["id"]) == [5, 4, 3, 2, 1]
+    assert frame.df["mood"].isna().all()
+
+    run_worker(once=True)
+    storage.add_entries([{"timestamp": "2024-01-06T09:00:00+00:00", "text": "Sixth."}])
+    assert frame.refresh() == 6
+    assert list(frame.df["id"]) == [6, 5, 4, 3, 2, 1]
+    assert frame.df.loc[1, "summary"] == storage.get_entry(1)["summary"]
+
+    db = storage._db()
+    with db:
+        db.execute("DELETE FROM entries WHERE id = 3")
+    frame.refresh()
+    assert 3 not in frame.df.index and len(frame.df) == 5
+
+
+def test_filters(entries):
+    frame = EntryFrame(start="2024-01-02", end="2024-01-03")
+    frame.refresh()
+    assert sorted(frame.df["id"]) == [2, 3]
+
+
+def test_refresh_with_mixed_missing_moods(entries):
+    frame = EntryFrame()
+    frame.refresh()
+    storage.update_entry(1, "Happy walk.", 8)    # one edited row gains a mood ...
+    storage.update_text(2, "Deadline moved.")    # ... the other still has none
+    assert frame.refresh() == 2
+    assert frame.df.loc[1, "mood"] == 8 and frame.df.loc[1, "summary"] == "Happy walk."
+    assert frame.df["mood"].isna().sum() == 4
+    assert frame.df.loc[2, "text"] == "Deadline moved."
+    assert str(frame.df["mood"].dtype) == "Int64"
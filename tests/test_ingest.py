@@ -0,0 +1,51 @@
+import json
+
+from journal import ingest, storage
+
+
+def test_jsonl_and_csv(journal_db, tmp_path):
+    jsonl = tmp_path / "a.jsonl"
+    jsonl.write_text("\n".join([
+        json.dumps({"timestamp": "2024-03-01T08:00:00+00:00", "text": "First"}),
+        json.dumps({"timestamp": "2024-03-02T08:00:00+00:00", "text": "Second",
+                    "summary": "Fine.", "mood": "7"}),
+        "{not json",
+        json.dumps({"text": ""}),
+    ]) + "\n", encoding="utf-8")
+    csv = tmp_path / "b.csv"
+    csv.write_text("timestamp,text\n2024-03-03T08:00:00+00:00,Third\n"
+                   "2024-03-01T08:00:00+00:00,First again\n", encoding="utf-8")
+
+    report = ingest.ingest([str(jsonl), str(csv)])
+    assert (report.read, report.added, report.invalid, report.skipped) == (6, 3, 2, 1)
+    assert len(report.errors) == 2
+    assert storage.count_entries(unanalyzed=True) == 2
+
+
+def test_ingest_with_analysis(journal_db, tmp_path):
+    lines = tmp_path / "notes.txt"
+    lines.write_text("Good run this morning.\nLong meeting.\n", encoding="utf-8")
+    report = ingest.ingest([str(lines)], analyse=True)
+    assert (report.added, report.analysed) == (2, 2)
+    assert storage.count_entries(unanalyzed=True) == 0
+
+
+def test_normalise_rejects_bad_records():
+    for record in ({"text": "x", "mood": "11", "summary": "s"},
+                   {"text": "x", "mood": True, "summary": "s"},
+                   {"text": "x", "mood": 7.5, "summary": "s"},
+                   {"text": "x", "mood": float("nan"), "summary": "s"},
+                   {"text": "x", "summary": "no mood"},
+                   {"text": "x", "summary": {"short": "s"}, "mood": 5},
+                   {"text": "x", "timestamp": "yesterday"},
+                   ["text"]):
+        try:
+            ingest.normalise(record)
+        except ingest.InvalidRecord:
+            continue
+        raise AssertionError(f"{record!r} was accepted")
+
+
+def test_integral_moods_are_accepted():
+    for mood in (7, 7.0, "7"):
+        assert ingest.normalise({"text": "x", "summary": "s", "mood": mood})["mood"] == 7
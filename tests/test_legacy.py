@@ -0,0 +1,39 @@
+import io
+import json
+
+from journal import legacy, storage
+
+
+def test_iter_json_array_small_reads():
+    items = [{"text": "a \"quoted\" ]"}, 12, [1, [2]], None, "s"]
+    f = io.StringIO(json.dumps(items, indent=2))
+    assert list(legacy.iter_json_array(f, read_size=3)) == items
+
+
+def test_import_resumes_from_checkpoint(journal_db, tmp_path):
+    path = tmp_path / "legacy.json"
+    items = [{"timestamp": f"2023-05-{day:02}T10:00:00+00:00", "text": f"Day {day}"}
+             for day in range(1, 8)]
+    path.write_text(json.dumps(items[:3] + [{"text": ""}] + items[3:]), encoding="utf-8")
+
+    report = legacy.import_legacy(path, batch_size=2)
+    assert (report.read, report.added, report.invalid) == (8, 7, 1)
+    assert storage.get_meta(legacy.checkpoint_key(path)) == "8"
+
+    again = legacy.import_legacy(path)
+    assert (again.resumed_from, again.read, again.added) == (8, 0, 0)
+
+
+def test_import_validates_elements(journal_db, tmp_path):
+    path = tmp_path / "legacy.json"
+    path.write_text(json.dumps([
+        {"timestamp": 1700000000, "text": "Unix seconds"},
+        {"timestamp": "2023-05-01T10:00:00+00:00", "text": "Too happy", "summary": "s",
+         "mood": 42},
+        {"timestamp": "someday", "text": "Bad timestamp"},
+        {"text": ["not", "text"]},
+        "just a string",
+    ]), encoding="utf-8")
+    report = legacy.import_legacy(path)
+    assert (report.read, report.added, report.invalid) == (5, 1, 4)
+    assert [e["text"] for e in storage.query_entries()] == ["Unix seconds"]
@@ -0,0 +1,53 @@
+from journal import ai, reanalyze, storage
+from journal.worker import run_worker
+
+
+def test_plan_and_run(entries):
+    run_worker(once=True)
+    assert reanalyze.plan().entries == 0
+
+    storage.update_text(2, "Deadline met, relieved.")
+    db = storage._db()
+    with db:
+        db.execute("UPDATE entries SET analysis_model = 'other' WHERE id = 4")
+        db.execute("UPDATE entries SET analysis_version = NULL WHERE id = 5")
+
+    stale = reanalyze.plan()
+    assert (stale.entries, stale.changed_text, stale.other_analyser) == (2, 1, 1)
+    assert stale.unknown == 1 and stale.cost == 0
+    assert reanalyze.plan(include_unknown=True).entries == 3
+
+    report = reanalyze.run(stale)
+    assert (report.analysed, report.failed) == (2, 0)
+    assert reanalyze.plan().entries == 0
+    model, _ = ai.fingerprint()
+    assert storage._db().execute(
+        "SELECT analysis_model FROM entries WHERE id = 4").fetchone()[0] == model
+
+
+def test_fallbacks_stay_stale(entries, monkeypatch):
+    from journal import batch
+
+    backend = ai.get_provider()
+    honest = backend.analyse
+
+    def malformed_for_work(text):
+        return (text, 5, False) if "work" in text.lower() else honest(text)
+
+    monkeypatch.setattr(backend, "analyse", malformed_for_work)
+    run_worker(once=True)                       # entry 2 through the worker
+    storage.update_text(2, "Stressed about work again.")
+    storage.add_entry("Work was fine.")
+    pending = list(storage.query_entries(unanalyzed=True, columns=["id", "text"]))
+    pending += [{"id": 2, "text": "Stressed about work again."}]
+    batch.analyse_entries(pending, batch_size=2)  # and through batch
+
+    stale = reanalyze.plan()
+    assert (stale.entries, stale.fallback) == (2, 2)
+    assert storage._db().execute(
+        "SELECT count(*) FROM entries WHERE analysis_version = ?",
+        [storage.FALLBACK_VERSION]).fetchone()[0] == 2
+
+    monkeypatch.setattr(backend, "analyse", honest)
+    assert reanalyze.run(stale).analysed == 2
+    assert reanalyze.plan().entries == 0
@@ -0,0 +1,24 @@
+from journal import db, shards, storage
+
+
+def test_journals_are_separate_files(journal_db):
+    storage.add_entry("Default journal.")
+    work = shards.use("work")
+    assert work == db.journal_path("work") and work.exists()
+    assert storage.count_entries() == 0
+    storage.add_entry("Work journal, about the office.")
+    shards.use(db.DEFAULT_JOURNAL)
+    assert storage.count_entries() == 1
+    assert list(shards.journals()) == [db.DEFAULT_JOURNAL, "work"]
+
+
+def test_fan_out_merges(journal_db):
+    storage.add_entries(["Calm office day.", "Another office meeting."])
+    shards.use("home")
+    storage.add_entry("Garden and office chairs.")
+    shards.use(db.DEFAULT_JOURNAL)
+
+    hits = shards.search("office", workers=2)
+    assert sorted(hit["journal"] for hit in hits) == [db.DEFAULT_JOURNAL] * 2 + ["home"]
+    assert shards.stats(workers=2)["journals"] == 2
+    assert shards.current() == db.DEFAULT_JOURNAL
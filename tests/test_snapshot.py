@@ -0,0 +1,25 @@
+import pytest
+
+from journal import storage
+from journal.worker import run_worker
+
+pytest.importorskip("pyarrow")
+
+from journal import snapshot  # noqa: E402
+
+
+@pytest.mark.parametrize("fmt", snapshot.FORMATS)
+def test_round_trip(entries, tmp_path, fmt):
+    run_worker(once=True)
+    path = snapshot.export_snapshot(tmp_path / "journal", fmt=fmt)
+    assert path.suffix == snapshot.SUFFIXES[fmt]
+    table = snapshot.read_table(path)
+    assert table.num_rows == 5
+    assert table.column("text").to_pylist() == entries
+
+    db = storage._db()
+    with db:
+        db.execute("DELETE FROM entries WHERE id IN (2, 4)")
+    report = snapshot.import_snapshot(path, batch_rows=2)
+    assert (report.read, report.added, report.renumbered) == (5, 2, 0)
+    assert storage.get_entry(2)["summary"]
@@ -0,0 +1,76 @@
+from journal import db, jobs, storage
+
+
+def test_schema_is_current(journal_db):
+    assert db.schema_version(storage._db()) == db.SCHEMA_VERSION
+
+
+def test_add_and_query(entries):
+    new_id = storage.add_entry("Written just now")
+    assert storage.get_entry(new_id)["text"] == "Written just now"
+    assert storage.count_entries() == 6
+    assert [e["id"] for e in storage.query_entries(start="2024-01-02", end="2024-01-03")] == [2, 3]
+    # Every new entry is queued for analysis.
+    assert jobs.status_counts()["queued"] == 6
+
+
+def test_duplicate_timestamps_are_skipped(entries):
+    again = [{"timestamp": "2024-01-01T09:00:00+00:00", "text": "same moment"}]
+    assert storage.add_entries(again) == 0
+
+
+def test_entry_writer_flushes_on_close(journal_db):
+    with storage.EntryWriter(max_rows=100, max_delay=60) as writer:
+        for i in range(3):
+            writer.add(f"line {i}")
+        assert storage.count_entries() == 0
+    assert writer.added == storage.count_entries() == 3
+
+
+def test_keyset_pagination(entries):
+    first = list(storage.query_entries(order_by="id desc", limit=2))
+    second = list(storage.query_entries(order_by="id desc", limit=2, before_id=first[-1]["id"]))
+    assert [e["id"] for e in first + second] == [5, 4, 3, 2]
+    assert [e["id"] for e in storage.query_entries(limit=2, after_id=3)] == [4, 5]
+
+
+def test_search_ranks_and_marks(entries):
+    hits = storage.search("walk park")
+    assert [h["id"] for h in hits] == [1]
+    start, end = storage.SNIPPET_MARK
+    assert f"{start}walk{end}" in hits[0]["snippet"]
+
+
+def test_search_filters_before_limiting(entries):
+    assert [h["id"] for h in storage.search("with", limit=1, start="2024-01-05")] == [5]
+    assert [h["id"] for h in storage.search("with", end="2024-01-04")] == [4]
+    storage.update_entries([(4, "Argument", 3)])
+    assert [h["id"] for h in storage.search("with", unanalyzed=True)] == [5]
+
+
+def test_update_text_requeues_and_reindexes(entries):
+    storage.update_entries([(3, "Reading", 6)])
+    storage.update_text(3, "Went sailing instead")
+    assert storage.search("sailing")[0]["id"] == 3
+    assert storage.search("book") == []
+    assert jobs.entry_status(storage._db(), [3])[3] == "queued"
+
+
+def test_rollups_follow_updates(entries):
+    storage.update_entries([(1, "Good", 8), (2, "Bad", 2)])
+    totals = storage.mood_totals()
+    assert (totals["entries"], totals["moods"], totals["avg"]) == (5, 2, 5.0)
+    months = storage.mood_rollup("month")
+    assert months == [{"period": "2024-01", "entries": 5, "moods": 2, "avg": 5.0,
+                       "min": 2, "max": 8}]
+
+
+def test_meta_roundtrip(journal_db):
+    assert storage.get_meta("missing", "x") == "x"
+    storage.set_meta("k", 42)
+    assert storage.get_meta("k") == "42"
+
+
+def test_search_without_terms(entries):
+    for query in ("", "  ", '"', '""', '"""', '" "', "-"):
+        assert storage.search(query) == []
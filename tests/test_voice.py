@@ -0,0 +1,70 @@
+import io
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+
+from journal import trace, voice  # noqa: E402  (no PortAudio or API key needed)
+
+
+class StubTranscriber:
+    """Stands in for the Whisper client: 'transcribes' a segment as its length."""
+
+    def __init__(self):
+        self.audio = SimpleNamespace(transcriptions=self)
+        self.calls = 0
+
+    def create(self, model, file, response_format):
+        self.calls += 1
+        data = file[1] if isinstance(file, tuple) else file.read()
+        audio, rate = sf.read(io.BytesIO(data))
+        return f" {len(audio) / rate:.1f}s \n"
+
+
+def _speech(seconds, rate, freq=220.0):
+    t = np.arange(int(seconds * rate)) / rate
+    return 0.3 * np.sin(2 * np.pi * freq * t)
+
+
+def test_wav_through_the_pipeline(tmp_path, monkeypatch):
+    rate = 8_000
+    silence = np.zeros(rate)  # 1 s: longer than SILENCE_SECONDS
+    audio = np.concatenate([silence, _speech(1.0, rate), silence,
+                            _speech(2.0, rate), silence, silence])
+    path = tmp_path / "note.wav"
+    sf.write(path, audio, rate, subtype="PCM_16")
+
+    stub = StubTranscriber()
+    monkeypatch.setattr(voice, "_client", stub)
+    sample_rate, blocks = voice.wav_blocks(path)
+    text = voice.transcribe_stream(blocks, sample_rate=sample_rate, workers=2)
+
+    assert stub.calls == 2
+    first, second = (float(part.rstrip("s")) for part in text.split())
+    # Each segment is its speech plus some of the pause around it.
+    assert 1.0 <= first <= 2.1 and 2.0 <= second <= 3.1 and first < second
+
+
+def test_file_transcription_is_traced(tmp_path, monkeypatch):
+    rate = 8_000
+    path = tmp_path / "note.wav"
+    sf.write(path, _speech(1.5, rate), rate, subtype="PCM_16")
+    monkeypatch.setattr(voice, "_client", StubTranscriber())
+    trace.enable()
+    try:
+        assert voice.transcribe(path) == "1.5s"
+    finally:
+        trace.disable()
+    assert trace.counters()["voice.audio_seconds"] == pytest.approx(1.5)
+    assert [row["name"] for row in trace.summary()] == ["voice.transcribe"]
+
+
+def test_segmenter_caps_long_segments():
+    rate = 1_000
+    segmenter = voice.Segmenter(rate)
+    block = _speech(voice.BLOCK_SECONDS, rate)
+    cut = [segmenter.feed(block) for _ in range(int(voice.MAX_SEGMENT_SECONDS / 0.1) + 5)]
+    segments = [s for s in cut if s is not None]
+    assert len(segments) == 1 and len(segments[0]) == voice.MAX_SEGMENT_SECONDS * rate
@@ -0,0 +1,58 @@
+import pytest
+
+from journal import jobs, storage
+from journal.db import connect
+from journal.worker import run_worker
+
+
+def test_worker_drains_the_queue(entries):
+    report = run_worker(concurrency=2, once=True)
+    assert report.done == 5
+    assert storage.count_entries(unanalyzed=True) == 0
+    counts = jobs.status_counts()
+    assert counts["queued"] == counts["running"] == counts["dead"] == 0
+
+
+def test_worker_skips_deleted_entries(entries):
+    db = connect()
+    with db:
+        db.execute("DELETE FROM entries WHERE id = 2")
+    report = run_worker(concurrency=2, once=True)
+    assert report.done == 4
+    assert jobs.status_counts(db)["queued"] == 0
+    db.close()
+
+
+def test_failed_jobs_are_retried(entries, monkeypatch):
+    from journal import ai
+
+    def broken(text, provider=None):
+        raise RuntimeError("API down")
+
+    monkeypatch.setattr(ai, "analyse_checked", broken)
+    report = run_worker(concurrency=2, once=True)
+    assert report.done == 0 and report.retried == 5
+    assert storage.count_entries(unanalyzed=True) == 5
+
+
+def test_write_back_and_completion_are_one_transaction(entries, monkeypatch):
+    def crash(db, job_ids):
+        raise RuntimeError("killed between write-back and completion")
+
+    monkeypatch.setattr(jobs, "complete", crash)
+    with pytest.raises(RuntimeError):
+        run_worker(concurrency=2, once=True)
+    # Neither half happened: no summaries written, every job handed back.
+    assert storage.count_entries(unanalyzed=True) == 5
+    assert jobs.status_counts()["queued"] == 5
+
+
+def test_released_job_yields_to_a_newer_one(entries):
+    db = connect()
+    [job] = jobs.claim(db, 1)
+    with db:  # the entry is edited while the job is claimed
+        jobs.enqueue(db, [job["entry_id"]])
+    jobs.release(db, [job["id"]])
+    counts = jobs.status_counts(db)
+    assert (counts["queued"], counts["running"], counts["done"]) == (5, 0, 1)
+    db.close()